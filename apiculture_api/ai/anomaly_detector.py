@@ -1,7 +1,11 @@
-from datetime import datetime
+from datetime import datetime, timezone
+
+import numpy as np
 
 from apiculture_api.alerts_api import enqueue_sse
-from apiculture_api.util.config import DATA_COLLECTION_METRICS
+from apiculture_api.ai.baseline import StreamingBaselines
+from apiculture_api.util.config import DATA_COLLECTION_METRICS, ANOMALY_Z_THRESHOLD, BASELINE_STD_FLOOR
+from apiculture_api.util.metadata_cache import metadata_cache
 
 from apiculture_api.util.app_util import AppUtil
 util = AppUtil()
@@ -12,24 +16,86 @@ mongo = ApicultureMongoClient()
 class AnomalyDetector:
 
     def __init__(self):
-        pass
+        self.baselines = StreamingBaselines(mongo.baselines_collection)
 
     def check_anomaly(self, metric):
-        value = metric['value']
-        data_type_id = metric['dataTypeId']
+        self.check_anomalies([metric])
+
+    def check_anomalies(self, metrics):
+        for alert in self.detect_anomalies(metrics):
+            enqueue_sse(alert)
+
+    def detect_anomalies(self, metrics):
+        """
+        Score a batch of metrics against the per data type streaming baselines and return the alerts to raise.
+        Until a baseline has enough samples, the static base_value ± variance from config is used.
+        """
+        alerts = []
+        groups = {}
+        for metric in metrics:
+            value = metric.get('value')
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            groups.setdefault(metric['dataTypeId'], []).append((value, self._hour_of(metric.get('datetime'))))
+
+        for data_type_id, readings in groups.items():
+            data_type = metadata_cache.get(mongo.data_types_collection, data_type_id)
+            if data_type is None:
+                continue
+            unit = data_type['unit']
+            data_type_name = data_type['data_type']
+            config = DATA_COLLECTION_METRICS.get(data_type_name, {})
+            base_value = config.get('base_value')
+            variance = config.get('variance')
 
-        data_type = mongo.data_types_collection.find_one({'_id': util.str_to_objectid(data_type_id)})
-        unit = data_type['unit']
-        data_type_name = data_type['data_type']
+            values = np.fromiter((value for value, _ in readings), dtype=float, count=len(readings))
+            hours = np.fromiter((hour for _, hour in readings), dtype=np.int64, count=len(readings))
 
-        base_value = DATA_COLLECTION_METRICS[data_type_name]['base_value']
-        variance = DATA_COLLECTION_METRICS[data_type_name]['variance']
-        if value > base_value + variance:
-            self.generate_alert_message(data_type_name, 'high', value, unit)
-        elif value < base_value - variance:
-            self.generate_alert_message(data_type_name, 'low', value, unit)
+            z_scores = self.baselines.score(data_type_id, values, hours, std_floor=BASELINE_STD_FLOOR * (variance or 0))
+            high = z_scores > ANOMALY_Z_THRESHOLD
+            low = z_scores < -ANOMALY_Z_THRESHOLD
+            cold = np.isnan(z_scores)
+            if base_value is not None and variance is not None:
+                high |= cold & (values > base_value + variance)
+                low |= cold & (values < base_value - variance)
+            self.baselines.update(data_type_id, values, hours)
+
+            for index in np.flatnonzero(high | low):
+                alert = self.build_alert_message(data_type_name, 'high' if high[index] else 'low', readings[index][0], unit)
+                if alert is not None:
+                    alert['dataType'] = data_type_name
+                    # A flapping sensor raises one alert per cooldown window, not one per reading
+                    alert['_dedupKey'] = f"anomaly:{data_type_id}:{'high' if high[index] else 'low'}"
+                    alert.update(self._scope_of(data_type))
+                    alerts.append(alert)
+        return alerts
+
+    def _scope_of(self, data_type):
+        """beehiveId and farmId of the sensor a data type belongs to (cached lookups), used to route alerts."""
+        sensor = metadata_cache.get(mongo.sensors_collection, data_type['sensor_id']) if data_type.get('sensor_id') else None
+        hive = metadata_cache.get(mongo.hives_collection, sensor['beehive_id']) if sensor and sensor.get('beehive_id') else None
+        if hive is None:
+            return {}
+        return {'beehiveId': util.objectid_to_str(hive['_id']), 'farmId': hive.get('farm_id')}
+
+    def _hour_of(self, value):
+        if isinstance(value, str):
+            try:
+                value = datetime.fromisoformat(value.replace('Z', '+00:00') if value.endswith('Z') else value)
+            except ValueError:
+                value = None
+        if not isinstance(value, datetime):
+            value = datetime.now(timezone.utc)
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc)
+        return value.hour
 
     def generate_alert_message(self, data_type, quantifier, value, unit):
+        alert = self.build_alert_message(data_type, quantifier, value, unit)
+        if alert is not None:
+            enqueue_sse(alert)
+
+    def build_alert_message(self, data_type, quantifier, value, unit):
         ANOMALY_MESSAGE_TEMPLATE = {
             'temperature': {
                 'high': {
@@ -44,11 +110,11 @@ class AnomalyDetector:
         }
 
         if data_type not in ANOMALY_MESSAGE_TEMPLATE:
-            return
+            return None
 
         if quantifier not in ANOMALY_MESSAGE_TEMPLATE[data_type]:
-            return
+            return None
 
         alert = ANOMALY_MESSAGE_TEMPLATE[data_type][quantifier]
         alert['severity'] = 'warning'
-        enqueue_sse(alert)
+        return alert
@@ -0,0 +1,156 @@
+import threading
+from datetime import datetime, timezone
+
+import numpy as np
+from pymongo import ReplaceOne
+
+from apiculture_api.util.config import BASELINE_EWMA_ALPHA, BASELINE_MIN_SAMPLES, BASELINE_HOURLY_PROFILE
+
+import logging
+logger = logging.getLogger('baseline')
+logger.setLevel(logging.INFO)
+
+HOURS_PER_DAY = 24
+
+
+class StreamingBaselines:
+    """
+    Per data type streaming baselines: exponentially weighted mean and variance, plus an
+    optional hour-of-day profile. Each reading costs an O(1) update, and whole batches
+    are scored with NumPy.
+
+    Baselines are keyed by data_type_id, which is specific to one sensor and therefore one hive.
+    They live in memory, are loaded once from the baselines collection and written back by flush().
+
+    Args:
+    collection: pymongo baselines collection used for persistence.
+    alpha (float): EWMA smoothing factor; higher values adapt faster.
+    min_samples (int): Readings needed before a baseline (or an hour slot) is used for scoring.
+    hourly (bool): Keep and prefer an hour-of-day profile when it has enough samples.
+
+    Example usage:
+    baselines = StreamingBaselines(mongo.baselines_collection)
+    z_scores = baselines.score(data_type_id, values, hours, std_floor=0.5)
+    baselines.update(data_type_id, values, hours)
+    """
+
+    def __init__(self, collection, alpha=BASELINE_EWMA_ALPHA, min_samples=BASELINE_MIN_SAMPLES, hourly=BASELINE_HOURLY_PROFILE):
+        self.collection = collection
+        self.alpha = alpha
+        self.min_samples = min_samples
+        self.hourly = hourly
+        self._lock = threading.Lock()
+        self._baselines = {}
+        self._dirty = set()
+        self._loaded = False
+
+    def _new_baseline(self):
+        return {
+            'n': 0,
+            'mean': 0.0,
+            'var': 0.0,
+            'hour_n': np.zeros(HOURS_PER_DAY, dtype=np.int64),
+            'hour_mean': np.zeros(HOURS_PER_DAY),
+            'hour_var': np.zeros(HOURS_PER_DAY)
+        }
+
+    def load(self):
+        """Load every persisted baseline (one query)."""
+        docs = list(self.collection.find())
+        with self._lock:
+            for doc in docs:
+                self._baselines[str(doc['_id'])] = {
+                    'n': doc.get('n', 0),
+                    'mean': doc.get('mean', 0.0),
+                    'var': doc.get('var', 0.0),
+                    'hour_n': np.asarray(doc.get('hour_n', [0] * HOURS_PER_DAY), dtype=np.int64),
+                    'hour_mean': np.asarray(doc.get('hour_mean', [0.0] * HOURS_PER_DAY), dtype=float),
+                    'hour_var': np.asarray(doc.get('hour_var', [0.0] * HOURS_PER_DAY), dtype=float)
+                }
+            self._loaded = True
+        logger.info(f"Loaded {len(docs)} baselines")
+
+    def score(self, data_type_id, values, hours, std_floor=0.0):
+        """
+        Z-scores of a batch of readings against the current baseline.
+
+        Args:
+            data_type_id (str): Data type the readings belong to.
+            values (np.ndarray): Reading values.
+            hours (np.ndarray): UTC hour of day (0-23) of each reading.
+            std_floor (float): Lower bound for the standard deviation, so near-constant series
+                               do not turn tiny changes into huge scores.
+
+        Returns:
+            np.ndarray: Z-score per reading, NaN where the baseline is not warmed up yet.
+        """
+        if not self._loaded:
+            self.load()
+        with self._lock:
+            baseline = self._baselines.get(data_type_id)
+            if baseline is None or baseline['n'] < self.min_samples:
+                return np.full(len(values), np.nan)
+            mean = np.full(len(values), baseline['mean'])
+            var = np.full(len(values), baseline['var'])
+            if self.hourly:
+                warm = baseline['hour_n'][hours] >= self.min_samples
+                mean = np.where(warm, baseline['hour_mean'][hours], mean)
+                var = np.where(warm, baseline['hour_var'][hours], var)
+        std = np.maximum(np.sqrt(var), max(std_floor, 1e-9))
+        return (values - mean) / std
+
+    def update(self, data_type_id, values, hours):
+        """Fold a batch of readings into the baseline (O(1) per reading)."""
+        alpha = self.alpha
+        with self._lock:
+            baseline = self._baselines.get(data_type_id)
+            if baseline is None:
+                baseline = self._baselines[data_type_id] = self._new_baseline()
+            for value, hour in zip(values.tolist(), hours.tolist()):
+                baseline['n'], baseline['mean'], baseline['var'] = self._ewma(baseline['n'], baseline['mean'], baseline['var'], value, alpha)
+                if self.hourly:
+                    n, mean, var = self._ewma(int(baseline['hour_n'][hour]), float(baseline['hour_mean'][hour]), float(baseline['hour_var'][hour]), value, alpha)
+                    baseline['hour_n'][hour] = n
+                    baseline['hour_mean'][hour] = mean
+                    baseline['hour_var'][hour] = var
+            self._dirty.add(data_type_id)
+
+    @staticmethod
+    def _ewma(n, mean, var, value, alpha):
+        # Plain running mean/variance until 1/alpha samples, then exponentially weighted
+        weight = max(alpha, 1.0 / (n + 1))
+        diff = value - mean
+        increment = weight * diff
+        return n + 1, mean + increment, (1 - weight) * (var + diff * increment)
+
+    def flush(self):
+        """Persist the baselines updated since the last flush with one bulk_write."""
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+            docs = [{
+                '_id': data_type_id,
+                'n': self._baselines[data_type_id]['n'],
+                'mean': self._baselines[data_type_id]['mean'],
+                'var': self._baselines[data_type_id]['var'],
+                'hour_n': self._baselines[data_type_id]['hour_n'].tolist(),
+                'hour_mean': self._baselines[data_type_id]['hour_mean'].tolist(),
+                'hour_var': self._baselines[data_type_id]['hour_var'].tolist(),
+                'updated_at': datetime.now(timezone.utc)
+            } for data_type_id in dirty]
+        if not docs:
+            return
+        try:
+            self.collection.bulk_write([ReplaceOne({'_id': doc['_id']}, doc, upsert=True) for doc in docs], ordered=False)
+            logger.info(f"Flushed {len(docs)} baselines")
+        except Exception as e:
+            logger.error(f"Failed to flush baselines: {str(e)}")
+            with self._lock:
+                self._dirty.update(dirty)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'baselines': len(self._baselines),
+                'warm': sum(1 for baseline in self._baselines.values() if baseline['n'] >= self.min_samples),
+                'pending': len(self._dirty)
+            }
@@ -1,10 +1,18 @@
-import json
 import queue
 from datetime import datetime, timezone
 
 from bson import ObjectId
 
+from apiculture_api.util.alert_suppressor import AlertSuppressor
 from apiculture_api.util.app_util import AppUtil
+from apiculture_api.util.codec import alerts_codec
+from apiculture_api.util.json_provider import JsonDocuments
+from apiculture_api.util.config import SSE_SUBSCRIBER_BUFFER, SSE_HISTORY_SIZE, SSE_SLOW_CONSUMER_MAX_DROPS, \
+    SSE_HEARTBEAT_INTERVAL, ALERT_DEDUP_COOLDOWN, ALERT_RATE_LIMIT, ALERT_RATE_WINDOW, ALERT_WRITER_MAX_QUEUE, \
+    ALERT_WRITER_MAX_BATCH, ALERT_WRITER_FLUSH_DEADLINE_MS, ALERT_RETRY_BUFFER, ALERTS_PAGE_LIMIT, ALERTS_BULK_FIELDS
+from apiculture_api.util.alert_query import AlertQuery
+from apiculture_api.util.sse_hub import BroadcastHub, parse_filters
+from apiculture_api.util.write_buffer import GroupCommitBuffer, RetryBuffer
 util = AppUtil()
 
 from flask import jsonify, Blueprint, Response, request
@@ -26,44 +34,76 @@ logging.basicConfig(
 logger = logging.getLogger('alerts_api')
 logger.setLevel(logging.INFO)
 
+alert_query = AlertQuery(mongo.alerts_collection)
 
-sse_queue = queue.Queue()
+
+# Every /sse/alerts connection subscribes to the hub and receives every alert
+sse_hub = BroadcastHub(SSE_SUBSCRIBER_BUFFER, SSE_HISTORY_SIZE, SSE_SLOW_CONSUMER_MAX_DROPS)
 def enqueue_sse(event_data):
-    """'Callback' to enqueue a new event from tasks."""
+    """
+    'Callback' to enqueue a new event from tasks.
+    Events pass the alert suppressor first: repeats are dropped, related events summarized and the write rate bounded.
+    """
+    alert_suppressor.submit(event_data)
+
+def _publish_alert(event_data):
+    """
+    Broadcast an alert that got through the suppressor, then hand it to the write-behind alert writer.
+    The id is assigned client-side, so subscribers never wait for the Mongo write.
+    """
     logger.info(f"Enqueuing new SSE event: {event_data}")
 
+    alert_id = ObjectId()
     event_data['read'] = False
     event_data['timestampMs'] = datetime.now(timezone.utc).timestamp()
-    result = mongo.alerts_collection.insert_one(util.camel_to_snake_key(util.fix_datetime(util.remove_id_key(event_data))))
-    logger.info(f"Successfully saved alert with IDs: {result.inserted_id}")
-    event_data['id'] = util.objectid_to_str(result.inserted_id)
+    event_data['id'] = util.objectid_to_str(alert_id)
+    sse_hub.publish(event_data)
+
+    doc = alerts_codec.decode(event_data)
+    doc['_id'] = alert_id
+    try:
+        alert_writer.submit([doc], timeout=0)
+    except (queue.Full, RuntimeError) as e:
+        logger.warning(f"Alert writer is full or closed, keeping alert {alert_id} for retry: {str(e)}")
+        alert_retries.add([doc])
+
+# Alerts are written in batched insert_many flushes; failed writes are retried from app.py (ALERT_RETRY_FREQUENCY)
+alert_writer = GroupCommitBuffer(mongo.alerts_collection, ALERT_WRITER_MAX_QUEUE, ALERT_WRITER_MAX_BATCH,
+                                 ALERT_WRITER_FLUSH_DEADLINE_MS, name='alert_writer', on_error=lambda docs: alert_retries.add(docs))
+alert_retries = RetryBuffer(alert_writer, ALERT_RETRY_BUFFER)
 
-    sse_queue.put({"data": event_data})
+# Flushed periodically from app.py (ALERT_COALESCE_WINDOW)
+alert_suppressor = AlertSuppressor(_publish_alert, ALERT_DEDUP_COOLDOWN, ALERT_RATE_LIMIT, ALERT_RATE_WINDOW)
 
-def generate_alerts():
+def generate_alerts(last_event_id=None, filters=None):
     """
-    Event-driven SSE generator: Blocks on queue.get() for new events (reactive).
+    Event-driven SSE generator: waits on this connection's own buffer for new events (reactive),
+    after replaying the events missed since last_event_id. Only events matching filters are received.
     Sends heartbeats on timeout to keep connection alive.
     """
-    while True:
-        try:
-            # Block until event arrives (timeout=1s for heartbeats)
-            event = sse_queue.get(timeout=5)
-            logger.info(f"SSE event received: {event['data']}")
-            yield f"data: {json.dumps(event['data'])}\n\n"
-            sse_queue.task_done()  # Mark as processed (optional for cleanup)
-        except queue.Empty:
-            # No event; send heartbeat
-            logger.info("No events in queue; sending heartbeat")
-            yield ": heartbeat\n\n"
+    subscriber = sse_hub.subscribe(last_event_id, filters=filters)
+    try:
+        while not subscriber.closed:
+            events = subscriber.get(timeout=SSE_HEARTBEAT_INTERVAL)
+            for event in events:
+                yield event.frame
+            if not events and not subscriber.closed:
+                # No event; send heartbeat
+                yield ": heartbeat\n\n"
+        logger.warning(f"Closing slow SSE connection after {subscriber.dropped} dropped events")
+    finally:
+        sse_hub.unsubscribe(subscriber)
 
 @alerts_api.route('/sse/alerts')
 def alerts_sse_stream():
     """
     Event-driven SSE endpoint: Streams events enqueued by background tasks.
+    Reconnecting clients resume from the Last-Event-ID header (or the lastEventId query parameter).
+    Optional filters (comma-separated values): farmId, beehiveId, severity and dataType.
     """
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('lastEventId')
     response = Response(
-        generate_alerts(),
+        generate_alerts(int(last_event_id) if last_event_id and last_event_id.isdigit() else None, parse_filters(request.args)),
         mimetype='text/event-stream'
     )
     response.headers['Content-Type'] = 'text/event-stream'  # Explicit override
@@ -102,12 +142,93 @@ def update_farm(id):
         logger.error(f"Failed to update alert: {str(e)}")
         return jsonify({'error': f'Failed to update alert: {str(e)}'}), 500
 
+@alerts_api.route('/api/alerts/bulk', methods=['POST'])
+def bulk_update_alerts():
+    """
+    Update many alerts with one update_many, e.g. "mark all read" for a farm.
+    JSON body: {'ids': [...]} or {'filter': {'farmId', 'beehiveId', 'severity', 'read', 'before'}},
+    plus 'set' with the fields to change (default {'read': true}); only ALERTS_BULK_FIELDS can be set.
+    The change is broadcast as one SSE event named 'alertsUpdated', to every subscriber of the affected
+    farm or hive whatever their other filters (to every subscriber when updating by ids).
+    """
+    if not request.is_json:
+        logger.warning("Request does not contain JSON data")
+        return jsonify({'error': 'Request must be JSON'}), 400
+
+    data = request.json
+    if not data or not isinstance(data, dict):
+        logger.warning("No data provided in JSON body")
+        return jsonify({'error': 'No data provided'}), 400
+
+    try:
+        query = alert_query.bulk_filter(data)
+        changes = data.get('set', {'read': True})
+        if not isinstance(changes, dict) or not changes:
+            raise ValueError("'set' must be a non-empty object")
+        for key, value in changes.items():
+            if key not in ALERTS_BULK_FIELDS or type(value) is not ALERTS_BULK_FIELDS[key]:
+                raise ValueError(f"Field '{key}' cannot be set in bulk")
+    except ValueError as e:
+        logger.warning(f"Invalid bulk alert update: {str(e)}")
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        update = dict(util.camel_to_snake_key(changes), updated_at=datetime.now(timezone.utc))
+        result = mongo.alerts_collection.update_many(query, {'$set': update})
+        logger.info(f"Bulk updated {result.modified_count} alerts")
+
+        event = {'type': 'alertsUpdated', 'set': changes, 'modifiedCount': result.modified_count}
+        if data.get('ids') is not None:
+            event['ids'] = data['ids']
+        else:
+            event['filter'] = data['filter']
+            for key in ('farmId', 'beehiveId'):
+                if isinstance(data['filter'].get(key), str):
+                    event[key] = data['filter'][key]
+        sse_hub.publish(event, name='alertsUpdated', scope=('farmId', 'beehiveId'))
+
+        return jsonify({'message': 'Alerts updated successfully', 'data': {'modifiedCount': result.modified_count}}), 200
+    except Exception as e:
+        logger.error(f"Failed to bulk update alerts: {str(e)}")
+        return jsonify({'error': f'Failed to update alerts: {str(e)}'}), 500
+
 @alerts_api.route('/api/alerts', methods=['GET'])
 def get_alerts():
+    """
+    Alerts newest first, one page at a time.
+    Query parameters: limit (default 30), cursor (nextCursor of the previous page), severity
+    (comma-separated), read (true/false), farmId, beehiveId and fields (comma-separated, e.g. id,title,read;
+    id and timestampMs are always returned).
+    Returns the page in 'data' and the cursor of the next page in 'nextCursor' (null on the last page).
+    """
+    try:
+        limit = int(request.args.get('limit', ALERTS_PAGE_LIMIT))
+        projection = alerts_codec.projection(request.args.get('fields'))
+        alerts, next_cursor = alert_query.page(request.args, limit, request.args.get('cursor'), projection)
+    except ValueError as e:
+        logger.warning(f"Invalid alerts query: {str(e)}")
+        return jsonify({'error': str(e)}), 400
+
     try:
-        alerts = util.snake_to_camel_key(util.objectid_to_str(list(mongo.alerts_collection.find().sort({'timestamp_ms': -1}).limit(30))))
         logger.info(f'data: {alerts}')
-        return jsonify({'data': alerts}), 200
+        return jsonify({'data': JsonDocuments(alerts, alerts_codec), 'nextCursor': next_cursor}), 200
     except Exception as e:
         logger.error(f"Failed to get alerts: {str(e)}")
-        return jsonify({'error': f'Failed to get alerts: {str(e)}'}), 500
\ No newline at end of file
+        return jsonify({'error': f'Failed to get alerts: {str(e)}'}), 500
+
+@alerts_api.route('/api/alerts/unread-count', methods=['GET'])
+def get_unread_count():
+    """
+    Unread alert counts, in total and per farm.
+    Query parameters: farmId (optional, count a single farm).
+    """
+    try:
+        counts = alert_query.unread_counts(request.args.get('farmId'))
+        data = {
+            'total': sum(count['unread'] for count in counts),
+            'farms': counts
+        }
+        return jsonify({'data': util.snake_to_camel_key(data)}), 200
+    except Exception as e:
+        logger.error(f"Failed to get unread alert count: {str(e)}")
+        return jsonify({'error': f'Failed to get unread alert count: {str(e)}'}), 500
@@ -2,6 +2,9 @@ from datetime import datetime, timezone
 from bson import ObjectId
 
 from apiculture_api.util.app_util import AppUtil
+from apiculture_api.util.codec import farms_codec
+from apiculture_api.util.json_provider import JsonDocuments, stream_documents
+from apiculture_api.util.metadata_cache import metadata_cache
 util = AppUtil()
 
 from flask import request, jsonify, Blueprint
@@ -36,8 +39,10 @@ def save_farms():
     try:
         for record in data:
             record['created_at'] = datetime.now(timezone.utc)
-        result = mongo.farms_collection.insert_many(util.camel_to_snake_key(util.str_to_objectid(util.remove_id_key(data))))
+        result = mongo.farms_collection.insert_many(farms_codec.decode(data))
         logger.info(f"Successfully saved farms with IDs: {result.inserted_ids}")
+        for inserted_id in result.inserted_ids:
+            metadata_cache.invalidate(mongo.farms_collection, inserted_id)
         return jsonify({'message': 'Data saved successfully', 'data': util.objectid_to_str(result.inserted_ids)}), 201
     except Exception as e:
         logger.error(f"Failed to save farms: {str(e)}")
@@ -65,6 +70,7 @@ def update_farm(id):
         logger.info(f"farm: {str(farm)}")
 
         mongo.farms_collection.update_one({"_id": ObjectId(id)}, {'$set': util.camel_to_snake_key(farm)}, upsert=False)
+        metadata_cache.invalidate(mongo.farms_collection, id)
 
         logger.info(f"Successfully updated farm with ID: {id}")
         return jsonify({'message': 'Farm updated successfully', 'data': str(id)}), 201
@@ -74,10 +80,23 @@ def update_farm(id):
 
 @farms_api.route('/api/farms', methods=['GET'])
 def get_farms():
+    """
+    All farms. With stream=1 the list is streamed from the cursor in batches instead of built in memory.
+    fields (comma-separated, e.g. id,name) limits the fields read and returned; id is always returned.
+    """
     try:
-        farms = util.snake_to_camel_key(util.objectid_to_str(list(mongo.farms_collection.find())))
+        projection = farms_codec.projection(request.args.get('fields'))
+    except ValueError as e:
+        logger.warning(f"Invalid farms query: {str(e)}")
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        if request.args.get('stream') == '1':
+            return stream_documents(mongo.farms_collection.find({}, projection), farms_codec)
+
+        farms = list(mongo.farms_collection.find({}, projection))
         logger.info(f'data: {farms}')
-        return jsonify({'data': farms}), 200
+        return jsonify({'data': JsonDocuments(farms, farms_codec)}), 200
     except Exception as e:
         logger.error(f"Failed to get farms: {str(e)}")
         return jsonify({'error': f'Failed to get farms: {str(e)}'}), 500
@@ -86,6 +105,7 @@ def get_farms():
 def delete_farm(id):
     try:
         mongo.farms_collection.delete_one({"_id": ObjectId(id)})
+        metadata_cache.invalidate(mongo.farms_collection, id)
         logger.info(f"Successfully deleted farm with ID: {id}")
         return jsonify({'message': 'Farm deleted successfully', 'data': str(id)}), 201
     except Exception as e:
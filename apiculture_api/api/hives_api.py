@@ -3,6 +3,9 @@ from datetime import datetime, timezone
 from bson import ObjectId
 
 from apiculture_api.util.app_util import AppUtil
+from apiculture_api.util.codec import hives_codec
+from apiculture_api.util.json_provider import JsonDocuments, stream_documents
+from apiculture_api.util.metadata_cache import metadata_cache
 util = AppUtil()
 
 from flask import request, jsonify, Blueprint
@@ -38,9 +41,15 @@ def save_hives():
     try:
         for record in data:
             record['created_at'] = datetime.now(timezone.utc)
-        result = mongo.hives_collection.insert_many(util.camel_to_snake_key(util.str_to_objectid(util.remove_id_key(data))))
+        hives = hives_codec.decode(data)
+        for hive in hives:
+            # Running counter maintained with $inc on ingest (see HoneyTotals), it always starts from zero
+            hive['honey_production'] = 0
+        result = mongo.hives_collection.insert_many(hives)
         inserted_ids = util.objectid_to_str(result.inserted_ids)
         logger.info(f"Successfully saved hives with IDs: {result.inserted_ids}")
+        for inserted_id in result.inserted_ids:
+            metadata_cache.invalidate(mongo.hives_collection, inserted_id)
 
         farm_id = data[0]['farmId']
         farm = mongo.farms_collection.find_one({"_id": ObjectId(farm_id)})
@@ -50,6 +59,7 @@ def save_hives():
         farm['updated_at'] = datetime.now(timezone.utc)
         farm = util.camel_to_snake_key(farm)
         mongo.farms_collection.update_one({"_id": ObjectId(farm_id)}, {'$set': farm}, upsert=False)
+        metadata_cache.invalidate(mongo.farms_collection, farm_id)
 
         return jsonify({'message': 'Data saved successfully', 'data': inserted_ids}), 201
     except Exception as e:
@@ -74,10 +84,13 @@ def update_hive(id):
             hive[str(key)] = value
         hive['updated_at'] = datetime.now(timezone.utc)
         hive = util.camel_to_snake_key(util.remove_id_key(hive))
+        # Maintained with $inc on ingest, writing back the value read above would lose concurrent harvests
+        hive.pop('honey_production', None)
 
         logger.info(f"hive: {str(hive)}")
 
         mongo.hives_collection.update_one({"_id": ObjectId(id)}, {'$set': hive}, upsert=False)
+        metadata_cache.invalidate(mongo.hives_collection, id)
 
         logger.info(f"Successfully updated hive with ID: {id}")
         return jsonify({'message': 'Hive updated successfully', 'data': str(id)}), 201
@@ -85,39 +98,34 @@ def update_hive(id):
         logger.error(f"Failed to update hive: {str(e)}")
         return jsonify({'error': f'Failed to update hive: {str(e)}'}), 500
 
+def _with_honey_production(hives):
+    # honey_production is a running counter maintained on ingest (see HoneyTotals)
+    for hive in hives:
+        hive['honey_production'] = round(hive.get('honey_production') or 0, 2)
+
 @hives_api.route('/api/hives', methods=['GET'])
 def get_hives():
+    """
+    All hives. With stream=1 the list is streamed from the cursor in batches instead of built in memory.
+    fields (comma-separated, e.g. id,name,honeyProduction) limits the fields read and returned; id is always returned.
+    """
+    try:
+        projection = hives_codec.projection(request.args.get('fields'))
+    except ValueError as e:
+        logger.warning(f"Invalid hives query: {str(e)}")
+        return jsonify({'error': str(e)}), 400
+    enrich = _with_honey_production if projection is None or 'honey_production' in projection else None
+
     try:
-        hives = list(mongo.hives_collection.find())
-
-        honey_harvest_data_types = list(mongo.data_types_collection.find({'data_type': 'honey_harvested'}))
-        logger.info(f"get_hives honey_harvest_data_types: {honey_harvest_data_types}")
-        if honey_harvest_data_types:
-            data_type_ids = [util.objectid_to_str(dt['_id']) for dt in honey_harvest_data_types]
-
-            for hive in hives:
-                hive_id = util.objectid_to_str(hive['_id'])
-                pipeline = [
-                    {'$match': {
-                        'data_type_id': {'$in': data_type_ids},
-                        'beehive_id': hive_id,
-                    }},
-                    {'$group': {
-                        '_id': None,
-                        'total': {'$sum': '$value'}
-                    }}
-                ]
-
-                result = list(mongo.metrics_collection.aggregate(pipeline))
-                total_honey = round(result[0]['total'], 2) if result else 0
-                hive['honey_production'] = total_honey
-        else:
-            for hive in hives:
-                hive['honey_production'] = 0
-
-        hives = util.snake_to_camel_key(util.objectid_to_str(hives))
+        if request.args.get('stream') == '1':
+            return stream_documents(mongo.hives_collection.find({}, projection), hives_codec, enrich)
+
+        hives = list(mongo.hives_collection.find({}, projection))
+        if enrich is not None:
+            enrich(hives)
+
         logger.info(f'data: {hives}')
-        return jsonify({'data': hives}), 200
+        return jsonify({'data': JsonDocuments(hives, hives_codec)}), 200
     except Exception as e:
         logger.error(f"Failed to get hives: {str(e)}")
         traceback.print_exc()
@@ -127,6 +135,7 @@ def get_hives():
 def delete_hive(id):
     try:
         mongo.hives_collection.delete_one({"_id": ObjectId(id)})
+        metadata_cache.invalidate(mongo.hives_collection, id)
         logger.info(f"Successfully deleted hive with ID: {id}")
         return jsonify({'message': 'Hive deleted successfully', 'data': str(id)}), 201
     except Exception as e:
@@ -1,10 +1,24 @@
+import json
+import queue
 import traceback
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 
-from bson import ObjectId
+from pymongo.errors import BulkWriteError
 
 from apiculture_api.alerts_api import enqueue_sse
 from apiculture_api.util.app_util import AppUtil
+from apiculture_api.util.codec import codec, metrics_codec, camel_to_snake
+from apiculture_api.util.config import METRICS_INGEST_MODE, METRICS_BUFFER_MAX_QUEUE, METRICS_BUFFER_MAX_BATCH, \
+    METRICS_BUFFER_FLUSH_DEADLINE_MS, METRICS_BUFFER_ACK_TIMEOUT, METRICS_BULK_BATCH_SIZE, METRICS_BULK_MAX_REJECTS, \
+    METRICS_POST_INGEST_MODE, METRICS_PIPELINE_WORKERS, METRICS_PIPELINE_MAX_QUEUE, METRICS_DOWNSAMPLE_POINTS, METRICS_STORAGE
+from apiculture_api.util.last_seen import LastSeenTracker
+from apiculture_api.util.honey_totals import HoneyTotals
+from apiculture_api.util.latest_readings import LatestReadings
+from apiculture_api.util.metadata_cache import metadata_cache
+from apiculture_api.util.metrics_query import MetricsQuery, parse_datetime
+from apiculture_api.util.metrics_rollup import MetricsRollup
+from apiculture_api.util.pipeline import StagedPipeline
+from apiculture_api.util.write_buffer import GroupCommitBuffer
 util = AppUtil()
 
 from apiculture_api.ai.anomaly_detector import AnomalyDetector
@@ -28,6 +42,39 @@ logging.basicConfig(
 logger = logging.getLogger('metrics_api')
 logger.setLevel(logging.INFO)
 
+# Hourly count/sum/min/max per data type, upserted on ingest and read by get_metrics
+metrics_rollup = MetricsRollup(mongo.metrics_hourly_collection, mongo.metrics_collection)
+metrics_query = MetricsQuery(mongo.metrics_collection)
+# Newest reading per data type, upserted on ingest and read by get_sensors
+latest_readings = LatestReadings(mongo.latest_readings_collection, mongo.data_types_collection, mongo.metrics_collection)
+# Running honey_production counters on the hive documents, read by get_hives
+honey_totals = HoneyTotals(mongo.hives_collection, mongo.data_types_collection, mongo.metrics_collection)
+
+def _on_metrics_persisted(docs):
+    """Maintain the stores derived from raw metrics, once per persisted batch."""
+    try:
+        metrics_rollup.record(docs)
+    except Exception as e:
+        logger.error(f"Failed to update metrics rollups: {str(e)}")
+    try:
+        latest_readings.record(docs)
+    except Exception as e:
+        logger.error(f"Failed to update latest readings: {str(e)}")
+    try:
+        honey_totals.record(docs)
+    except Exception as e:
+        logger.error(f"Failed to update honey production: {str(e)}")
+
+# Opt-in group commit: readings from concurrent requests are flushed together as unordered insert_many batches
+metrics_buffer = None
+if METRICS_INGEST_MODE == 'buffered':
+    metrics_buffer = GroupCommitBuffer(mongo.metrics_collection, METRICS_BUFFER_MAX_QUEUE, METRICS_BUFFER_MAX_BATCH,
+                                       METRICS_BUFFER_FLUSH_DEADLINE_MS, name='metrics_buffer', on_flush=_on_metrics_persisted,
+                                       unique_ids=METRICS_STORAGE != 'timeseries')
+
+# Coalesced data_types.updated_at: ingest only updates memory, app.py flushes it periodically
+last_seen = LastSeenTracker(mongo.data_types_collection)
+
 @metrics_api.route('/api/metrics', methods=['POST'])
 def _save_metrics():
     if not request.is_json:
@@ -44,123 +91,362 @@ def save_metrics(data):
         return jsonify({'error': 'No data provided'}), 400
 
     try:
-        result = mongo.metrics_collection.insert_many(util.camel_to_snake_key(util.fix_datetime(util.remove_id_key(data))))
-        inserted_ids = util.objectid_to_str(result.inserted_ids)
-        logger.info(f"Successfully saved metrics with IDs: {result.inserted_ids}")
-
-        data_type_id = data[0]['dataTypeId']
-
-        data_type = mongo.data_types_collection.find_one({"_id": ObjectId(data_type_id)})
-        if data_type and data_type.get('data_type') == 'honey_harvested':
-            honey_value = data[0].get('value', 0)
-            honey_unit = data_type.get('unit', 'g')
-            beehiveId = data[0].get('beehiveId')
-
-            message = f'New honey harvest recorded: {honey_value}{honey_unit}'
-            if beehiveId:
-                hive = mongo.hives_collection.find_one({"_id": ObjectId(beehiveId)})
-                if hive:
-                    hive_name = hive.get('name', 'Unknown Hive')
-                    message = f'New honey harvest from {hive_name}: {honey_value}{honey_unit}'
-
-            alert_event = {
-                'title': 'Honey Harvested',
-                'message': message,
-                'severity': 'info',
-                'beehiveId': beehiveId,
-                'dataType': "honey_harvested",
-                'sensorValue': 300
-            }
-            enqueue_sse(alert_event)
-            logger.info(f"Enqueued honey harvest alert: {message}")
-
-        mongo.data_types_collection.update_one({"_id": ObjectId(data_type_id)}, {'$set': {'updated_at': datetime.now(timezone.utc)}})
-
-        for metric in data:
-            anomaly_detector.check_anomaly(metric)
+        docs = metrics_codec.decode(data)
+        status = 201
+        if metrics_buffer is not None:
+            # Ack only once the group commit holding these readings is durable
+            ticket = metrics_buffer.submit(docs, timeout=METRICS_BUFFER_ACK_TIMEOUT)
+            try:
+                inserted_ids = util.objectid_to_str(ticket.wait(timeout=METRICS_BUFFER_ACK_TIMEOUT))
+            except TimeoutError:
+                # Still queued and written later: a failure response would invite a duplicate resend
+                inserted_ids = util.objectid_to_str(ticket.inserted_ids)
+                status = 202
+                logger.warning(f"Metrics {inserted_ids} accepted, write still pending")
+        else:
+            result = mongo.metrics_collection.insert_many(docs)
+            inserted_ids = util.objectid_to_str(result.inserted_ids)
+            _on_metrics_persisted(docs)
+        if status == 201:
+            logger.info(f"Successfully saved metrics with IDs: {inserted_ids}")
 
+        batch = {'data': data}
+        if post_ingest_pipeline is None:
+            _raise_alerts(_detect_anomalies(_enrich_metrics(batch)))
+        else:
+            try:
+                post_ingest_pipeline.submit(batch, timeout=0)
+            except queue.Full:
+                logger.warning("Post-ingest pipeline is full, processing metrics inline")
+                _raise_alerts(_detect_anomalies(_enrich_metrics(batch)))
+
+        if status == 202:
+            return jsonify({'message': 'Data accepted, write pending', 'data': inserted_ids}), 202
         return jsonify({'message': 'Data saved successfully', 'data': inserted_ids}), 201
+    except queue.Full as e:
+        logger.error(f"Failed to save metrics: {str(e)}")
+        return jsonify({'error': f'Failed to save data: {str(e)}'}), 503
     except Exception as e:
         logger.error(f"Failed to save metrics: {str(e)}")
         traceback.print_exc()
         return jsonify({'error': f'Failed to save data: {str(e)}'}), 500
 
+def _enrich_metrics(batch):
+    """Post-ingest stage 1: resolve the data type and record the sensor as seen."""
+    data_type_id = batch['data'][0]['dataTypeId']
+    data_type = metadata_cache.get(mongo.data_types_collection, data_type_id)
+    if data_type is not None:
+        last_seen.touch(data_type_id, data_type=data_type)
+    batch['data_type'] = data_type
+    return batch
+
+def _detect_anomalies(batch):
+    """Post-ingest stage 2: score the readings against their baselines."""
+    batch['alerts'] = anomaly_detector.detect_anomalies(batch['data'])
+    return batch
+
+def _raise_alerts(batch):
+    """Post-ingest stage 3: emit honey harvest and anomaly alerts."""
+    data = batch['data']
+    data_type = batch['data_type']
+    if data_type and data_type.get('data_type') == 'honey_harvested':
+        honey_value = data[0].get('value', 0)
+        honey_unit = data_type.get('unit', 'g')
+        beehiveId = data[0].get('beehiveId')
+
+        message = f'New honey harvest recorded: {honey_value}{honey_unit}'
+        farm_id = None
+        if beehiveId:
+            hive = metadata_cache.get(mongo.hives_collection, beehiveId)
+            if hive:
+                hive_name = hive.get('name', 'Unknown Hive')
+                farm_id = hive.get('farm_id')
+                message = f'New honey harvest from {hive_name}: {honey_value}{honey_unit}'
+
+        alert_event = {
+            'title': 'Honey Harvested',
+            'message': message,
+            'severity': 'info',
+            'beehiveId': beehiveId,
+            'farmId': farm_id,
+            'dataType': "honey_harvested",
+            'sensorValue': 300
+        }
+        enqueue_sse(alert_event)
+        logger.info(f"Enqueued honey harvest alert: {message}")
+
+    for alert in batch['alerts']:
+        enqueue_sse(alert)
+
+# Opt-in asynchronous side effects: the request returns once the metrics are persisted
+post_ingest_pipeline = None
+if METRICS_POST_INGEST_MODE == 'async':
+    post_ingest_pipeline = StagedPipeline([
+        ('enrich', _enrich_metrics, METRICS_PIPELINE_WORKERS),
+        ('detect', _detect_anomalies, METRICS_PIPELINE_WORKERS),
+        ('alert', _raise_alerts, METRICS_PIPELINE_WORKERS)
+    ], METRICS_PIPELINE_MAX_QUEUE, name='post_ingest')
+
+@metrics_api.route('/api/metrics/bulk', methods=['POST'])
+def save_metrics_bulk():
+    """
+    Bulk ingest endpoint for gateways replaying buffered readings.
+    Expects newline-delimited JSON (one metric object per line, plain or chunked upload).
+    Lines are parsed as they are read and written in fixed-size unordered batches, so memory
+    stays flat regardless of upload size. Invalid lines are reported back instead of failing
+    the whole payload. Backlogged readings are historical, so no anomaly or harvest alerts are raised.
+    """
+    logger.info(f"Received POST request to /api/metrics/bulk from {request.remote_addr}")
+
+    accepted = 0
+    rejected = 0
+    rejects = []
+    last_readings = {}  # data_type_id -> datetime of its newest accepted reading
+    batch = []
+    batch_lines = []
+
+    def reject(line_number, error):
+        nonlocal rejected
+        rejected += 1
+        if len(rejects) < METRICS_BULK_MAX_REJECTS:
+            rejects.append({'line': line_number, 'error': error})
+
+    def flush():
+        nonlocal accepted
+        if not batch:
+            return
+        failed = set()
+        try:
+            mongo.metrics_collection.insert_many(batch, ordered=False)
+        except BulkWriteError as e:
+            for write_error in e.details.get('writeErrors', []):
+                failed.add(write_error['index'])
+                reject(batch_lines[write_error['index']], write_error.get('errmsg', 'Write failed'))
+        persisted = [doc for index, doc in enumerate(batch) if index not in failed]
+        for doc in persisted:
+            newest = last_readings.get(doc['data_type_id'])
+            if newest is None or _as_utc(newest) < _as_utc(doc['datetime']):
+                last_readings[doc['data_type_id']] = doc['datetime']
+        accepted += len(persisted)
+        _on_metrics_persisted(persisted)
+        batch.clear()
+        batch_lines.clear()
+
+    try:
+        line_number = 0
+        while True:
+            line = request.stream.readline()
+            if not line:
+                break
+            line_number += 1
+            if not line.strip():
+                continue
+            try:
+                batch.append(_parse_metric_line(line))
+                batch_lines.append(line_number)
+            except ValueError as e:
+                reject(line_number, str(e))
+                continue
+            if len(batch) >= METRICS_BULK_BATCH_SIZE:
+                flush()
+        flush()
+
+        if accepted == 0 and rejected == 0:
+            logger.warning("No data provided in request body")
+            return jsonify({'error': 'No data provided'}), 400
+
+        # Seen when their newest replayed reading was taken, so replaying an old backlog doesn't bring dead sensors back online
+        for data_type_id, at in last_readings.items():
+            last_seen.touch(data_type_id, at=at)
+
+        logger.info(f"Bulk ingest finished: {accepted} accepted, {rejected} rejected")
+        return jsonify({
+            'message': 'Data saved successfully' if accepted else 'No valid metrics in payload',
+            'accepted': accepted,
+            'rejected': rejected,
+            'rejects': rejects
+        }), 201 if accepted else 400
+    except Exception as e:
+        logger.error(f"Failed to save bulk metrics: {str(e)}")
+        traceback.print_exc()
+        return jsonify({'error': f'Failed to save data: {str(e)}', 'accepted': accepted, 'rejected': rejected}), 500
+
+def _as_utc(value):
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
+def _parse_metric_line(line):
+    """
+    Parse one NDJSON line into a metrics document in a single pass
+    (equivalent of remove_id_key + fix_datetime + camel_to_snake_key for a flat reading).
+
+    Raises:
+        ValueError: If the line is not a valid metric reading.
+    """
+    try:
+        record = json.loads(line)
+    except (UnicodeDecodeError, json.JSONDecodeError) as e:
+        raise ValueError(f'Invalid JSON: {str(e)}')
+    if not isinstance(record, dict):
+        raise ValueError('Expected a JSON object')
+    if not isinstance(record.get('dataTypeId'), str):
+        raise ValueError('Missing dataTypeId')
+    if isinstance(record.get('value'), bool) or not isinstance(record.get('value'), (int, float)):
+        raise ValueError('Missing or non-numeric value')
+    if not isinstance(record.get('datetime'), str):
+        raise ValueError('Missing datetime')
+
+    doc = {}
+    for key, value in record.items():
+        if key == 'id':
+            continue
+        if key == 'datetime':
+            try:
+                value = datetime.fromisoformat(value.replace('Z', '+00:00') if value.endswith('Z') else value)
+            except ValueError:
+                raise ValueError(f'Invalid datetime: {value}')
+        elif isinstance(value, (dict, list)):
+            value = codec.decode(value)
+        doc[camel_to_snake(key)] = value
+    return doc
+
 @metrics_api.route('/api/metrics/<beehive_id>/<data_capture>', methods=['GET'])
 def get_metrics(beehive_id, data_capture):
+    """
+    Hourly averages of the last 24 hours (25 buckets, '24hr' oldest to '0hr' newest),
+    answered from the metrics_hourly rollups instead of scanning raw metrics. Hours that
+    have no rollup yet fall back to the raw metrics (see MetricsRollup.hourly()).
+    """
     try:
-        sensors = list(mongo.sensors_collection.find({ "beehive_id": beehive_id, "data_capture": data_capture}))
-        data_type = mongo.data_types_collection.find_one({"sensor_id": util.objectid_to_str(sensors[0]["_id"]), "data_type": data_capture})
-        data_type_id = util.objectid_to_str(data_type["_id"])
-
-        pipeline = [
-            # Start with a single document to generate buckets from
-            {"$limit": 1},
-            {"$addFields": {"now": {"$toDate": "$$NOW"}}},
-            # Create array of hour indices (0 to 24)
-            {"$addFields": {"hour_indices": {"$range": [0, 25]}}},
-            # Unwind the array to create one doc per hour bucket
-            {"$unwind": {"path": "$hour_indices"}},
-            {"$addFields": {
-                "hour_bucket": {
-                    "$dateTrunc": {  # Truncate to start of hour for consistent bucketing
-                        "date": {
-                            "$dateSubtract": {
-                                "startDate": "$now",
-                                "unit": "hour",
-                                "amount": "$hour_indices"
-                            }
-                        },
-                        "unit": "hour",
-                        "timezone": "UTC"
-                    }
-                },
-                "time_num": "$hour_indices"
-            }},
-            {"$sort": {"time_num": -1}},  # Descending: 24hr (oldest) to 0hr (newest)
-            # Lookup hourly average value data for each bucket
-            {"$lookup": {
-                "from": "metrics",
-                "let": {"hb": "$hour_bucket", "now": "$now"},
-                "pipeline": [
-                    {"$match": {
-                        "$expr": {
-                            "$and": [
-                                {"$eq": [data_type_id, "$data_type_id"]},  # Exact match on string data_type_id
-                                {"$gte": ["$datetime",
-                                          {"$dateSubtract": {"startDate": "$$now", "unit": "hour", "amount": 24}}]},
-                                {"$eq": [{"$dateTrunc": {"date": "$datetime", "unit": "hour", "timezone": "UTC"}},
-                                         "$$hb"]}
-                            ]
-                        }
-                    }},
-                    # No parsing needed: Use direct 'value' field (numeric)
-                    {"$group": {
-                        "_id": None,
-                        "avg_value": {"$avg": "$value"}  # Direct average on 'value' field
-                    }}
-                ],
-                "as": "avg_data"
-            }},
-            # Extract average (default to null if no data)
-            {"$addFields": {
-                "avg_value": {"$ifNull": [{"$arrayElemAt": ["$avg_data.avg_value", 0]}, None]}
-            }},
-            # Format output
-            {"$addFields": {
-                "value": {"$round": ["$avg_value", 1]},
-                "time": {"$concat": [{"$toString": "$time_num"}, "hr"]}
-            }},
-            # Final projection: Use only inclusions to avoid mix of 0/1
-            {"$project": {
-                "_id": 0,
-                "time": 1,
-                "value": 1
-            }}
-        ]
-
-        metrics = util.snake_to_camel_key(util.objectid_to_str(list(mongo.metrics_collection.aggregate(pipeline))))
+        data_type_id = _resolve_data_type_id(beehive_id, data_capture)
+        if data_type_id is None:
+            return jsonify({'error': f'No {data_capture} sensor found for hive {beehive_id}'}), 404
+
+        current_hour = MetricsRollup.truncate_hour(datetime.now(timezone.utc))
+        start = current_hour - timedelta(hours=24)
+        rollups = {rollup['hour']: rollup for rollup in metrics_rollup.hourly(data_type_id, start, current_hour)}
+
+        metrics = []
+        for time_num in range(24, -1, -1):
+            rollup = rollups.get(current_hour - timedelta(hours=time_num))
+            value = round(rollup['sum'] / rollup['count'], 1) if rollup and rollup['count'] else None
+            metrics.append({'time': f'{time_num}hr', 'value': value})
+
         logger.info(f'data: {metrics}')
         return jsonify({'data': metrics}), 200
     except Exception as e:
         logger.error(f"Failed to get metrics: {str(e)}")
-        return jsonify({'error': f'Failed to get metrics: {str(e)}'}), 500
\ No newline at end of file
+        return jsonify({'error': f'Failed to get metrics: {str(e)}'}), 500
+
+@metrics_api.route('/api/metrics/<beehive_id>/<data_capture>/range', methods=['GET'])
+def get_metrics_range(beehive_id, data_capture):
+    """
+    Aggregated metrics over an arbitrary window and resolution.
+    Query parameters: from, to (ISO-8601, default the last 24 hours) and step (1m, 5m, 1h or 1d, default 1h).
+    Returns one point per bucket with the average, min, max and count; empty buckets have a null value.
+    With downsample (lttb or minmax) and points (default 500) the raw readings are returned instead,
+    reduced to at most that many points; step is ignored.
+    """
+    try:
+        end = parse_datetime(request.args.get('to'), datetime.now(timezone.utc))
+        start = parse_datetime(request.args.get('from'), end - timedelta(hours=24))
+        step = request.args.get('step', '1h')
+        downsample = request.args.get('downsample')
+        points = int(request.args.get('points', METRICS_DOWNSAMPLE_POINTS))
+        if downsample:
+            metrics_query.validate_downsample(start, end, points, downsample)
+        else:
+            metrics_query.validate(start, end, step)
+    except ValueError as e:
+        logger.warning(f"Invalid metrics range query: {str(e)}")
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        data_type_id = _resolve_data_type_id(beehive_id, data_capture)
+        if data_type_id is None:
+            return jsonify({'error': f'No {data_capture} sensor found for hive {beehive_id}'}), 404
+
+        if downsample:
+            metrics = metrics_query.downsampled_series([data_type_id], start, end, points, downsample)[data_type_id]
+        else:
+            metrics = metrics_query.range_series([data_type_id], start, end, step)[data_type_id]
+        return jsonify({'data': metrics}), 200
+    except Exception as e:
+        logger.error(f"Failed to get metrics range: {str(e)}")
+        traceback.print_exc()
+        return jsonify({'error': f'Failed to get metrics: {str(e)}'}), 500
+
+@metrics_api.route('/api/metrics/<beehive_id>', methods=['GET'])
+def get_hive_metrics(beehive_id):
+    """
+    Every requested series of a hive in one request.
+    Query parameters: captures (comma-separated data captures, default all captures of the hive),
+    plus from, to, step, downsample and points as for the range endpoint.
+    Data types are resolved with one aggregation and all series come from a single metrics aggregation.
+    """
+    try:
+        end = parse_datetime(request.args.get('to'), datetime.now(timezone.utc))
+        start = parse_datetime(request.args.get('from'), end - timedelta(hours=24))
+        step = request.args.get('step', '1h')
+        downsample = request.args.get('downsample')
+        points = int(request.args.get('points', METRICS_DOWNSAMPLE_POINTS))
+        if downsample:
+            metrics_query.validate_downsample(start, end, points, downsample)
+        else:
+            metrics_query.validate(start, end, step)
+    except ValueError as e:
+        logger.warning(f"Invalid metrics range query: {str(e)}")
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        captures = [capture for capture in request.args.get('captures', '').split(',') if capture]
+        data_type_ids = _resolve_data_type_ids(beehive_id, captures or None)
+        if not data_type_ids:
+            series = {}
+        elif downsample:
+            series = metrics_query.downsampled_series(list(data_type_ids.values()), start, end, points, downsample)
+        else:
+            series = metrics_query.range_series(list(data_type_ids.values()), start, end, step)
+        metrics = {capture: series[data_type_id] for capture, data_type_id in data_type_ids.items()}
+        return jsonify({'data': metrics}), 200
+    except Exception as e:
+        logger.error(f"Failed to get hive metrics: {str(e)}")
+        traceback.print_exc()
+        return jsonify({'error': f'Failed to get metrics: {str(e)}'}), 500
+
+def _resolve_data_type_id(beehive_id, data_capture):
+    """Id of the data type capturing data_capture on the hive's first matching sensor, or None."""
+    return _resolve_data_type_ids(beehive_id, [data_capture]).get(data_capture)
+
+def _resolve_data_type_ids(beehive_id, captures=None):
+    """
+    Map each data capture of a hive to the data type id of the first sensor capturing it, in one aggregation.
+
+    Args:
+        beehive_id (str): Hive id.
+        captures (list, optional): Data captures to resolve. All captures of the hive when None.
+
+    Returns:
+        dict: data_capture -> data_type_id for the captures that have a sensor and data type.
+    """
+    match = {"beehive_id": beehive_id}
+    if captures is not None:
+        match["data_capture"] = {"$in": captures}
+    pipeline = [
+        {"$match": match},
+        {"$sort": {"_id": 1}},
+        {"$project": {"sensor_id": {"$toString": "$_id"}, "data_capture": 1}},
+        {"$lookup": {
+            "from": mongo.data_types_collection.name,
+            "localField": "sensor_id",
+            "foreignField": "sensor_id",
+            "as": "data_types"
+        }},
+        {"$unwind": "$data_types"},
+        {"$project": {"_id": 0, "data_capture": 1, "data_type": "$data_types.data_type", "data_type_id": "$data_types._id"}}
+    ]
+    data_type_ids = {}
+    for row in mongo.sensors_collection.aggregate(pipeline):
+        data_type = row['data_type']
+        if data_type in row['data_capture'] and (captures is None or data_type in captures) and data_type not in data_type_ids:
+            data_type_ids[data_type] = util.objectid_to_str(row['data_type_id'])
+    return data_type_ids
@@ -2,8 +2,12 @@ import traceback
 from datetime import datetime, timezone
 from bson import ObjectId
 
+from apiculture_api.api.metrics_api import latest_readings
 from apiculture_api.util.app_util import AppUtil
+from apiculture_api.util.codec import sensors_codec
+from apiculture_api.util.json_provider import JsonDocuments, stream_documents
 from apiculture_api.util.config import DATA_COLLECTION_METRICS
+from apiculture_api.util.metadata_cache import metadata_cache
 
 util = AppUtil()
 
@@ -40,9 +44,11 @@ def save_sensors():
     try:
         for record in data:
             record['created_at'] = datetime.now(timezone.utc)
-        result = mongo.sensors_collection.insert_many(util.camel_to_snake_key(util.str_to_objectid(util.remove_id_key(data))))
+        result = mongo.sensors_collection.insert_many(sensors_codec.decode(data))
         inserted_ids = util.objectid_to_str(result.inserted_ids)
         logger.info(f"Successfully saved sensors with IDs: {result.inserted_ids}")
+        for inserted_id in result.inserted_ids:
+            metadata_cache.invalidate(mongo.sensors_collection, inserted_id)
 
         beehive_id = data[0]['beehiveId']
         beehive = None
@@ -62,12 +68,14 @@ def save_sensors():
                     "unit": DATA_COLLECTION_METRICS[data_type]['unit'],
                     "updated_at": datetime.now(timezone.utc)
                 })
+                metadata_cache.invalidate(mongo.data_types_collection, result.inserted_id)
                 logger.info(f"Successfully saved data type {data_type} with ID: {result.inserted_id}")
 
         if beehive is not None:
             beehive['updated_at'] = datetime.now(timezone.utc)
             beehive = util.camel_to_snake_key(beehive)
             mongo.hives_collection.update_one({"_id": ObjectId(beehive_id)}, {'$set': beehive}, upsert=False)
+            metadata_cache.invalidate(mongo.hives_collection, beehive_id)
 
         return jsonify({'message': 'Data saved successfully', 'data': inserted_ids}), 201
     except Exception as e:
@@ -96,6 +104,7 @@ def update_sensor(id):
         logger.info(f"sensor: {str(sensor)}")
 
         mongo.sensors_collection.update_one({"_id": ObjectId(id)}, {'$set': sensor}, upsert=False)
+        metadata_cache.invalidate(mongo.sensors_collection, id)
 
         for data_type in data['dataCapture']:
             sensor_data_type = mongo.data_types_collection.find_one({"sensor_id": id, "data_type": data_type})
@@ -106,6 +115,7 @@ def update_sensor(id):
                     'data_type': data_type,
                     'unit': unit
                 })
+                metadata_cache.invalidate(mongo.data_types_collection, result.inserted_id)
                 logger.info(f"Successfully saved data type {data_type} with ID: {result.inserted_id}")
 
         logger.info(f"Successfully updated sensor with ID: {id}")
@@ -114,36 +124,69 @@ def update_sensor(id):
         logger.error(f"Failed to update sensor: {str(e)}")
         return jsonify({'error': f'Failed to update sensor: {str(e)}'}), 500
 
+def _with_latest_readings(sensors):
+    # One latest_readings query per list of sensors (per batch when streaming)
+    readings = latest_readings.for_sensors([util.objectid_to_str(sensor["_id"]) for sensor in sensors])
+
+    for sensor in sensors:
+        sensor_readings = readings.get(util.objectid_to_str(sensor["_id"]), {})
+        latest = [sensor_readings[data_capture] for data_capture in sensor['data_capture'] if data_capture in sensor_readings]
+        if len(latest) > 0:
+            last_updated = max(reading['datetime'] for reading in latest)
+            sensor['currentValue'] = ', '.join(f"{reading['value']}{reading['unit']}" for reading in latest)
+            sensor['lastUpdated'] = util.time_ago(int(last_updated.replace(tzinfo=timezone.utc).timestamp()))
+
+def _sensors_enrichment(projection):
+    """
+    Enrichment of sensors read with projection (None for every field): the latest readings, only
+    when currentValue or lastUpdated are requested. data_capture, which they are computed from,
+    is then added to the projection; it and the computed field that was not requested are removed
+    again after the enrichment.
+    """
+    if projection is None:
+        return _with_latest_readings
+    if 'current_value' not in projection and 'last_updated' not in projection:
+        return None
+
+    unrequested = [key for field, key in (('current_value', 'currentValue'), ('last_updated', 'lastUpdated'))
+                   if field not in projection]
+    if 'data_capture' not in projection:
+        projection['data_capture'] = 1
+        unrequested.append('data_capture')
+    if not unrequested:
+        return _with_latest_readings
+
+    def enrich(sensors):
+        _with_latest_readings(sensors)
+        for sensor in sensors:
+            for key in unrequested:
+                sensor.pop(key, None)
+    return enrich
+
 @sensors_api.route('/api/sensors', methods=['GET'])
 def get_sensors():
+    """
+    Active sensors with their latest readings. With stream=1 the list is streamed from the cursor
+    in batches instead of built in memory.
+    fields (comma-separated, e.g. id,name,status) limits the fields read and returned; id is always returned.
+    """
     try:
-        sensors = list(mongo.sensors_collection.find({"active": True}))
+        projection = sensors_codec.projection(request.args.get('fields'))
+    except ValueError as e:
+        logger.warning(f"Invalid sensors query: {str(e)}")
+        return jsonify({'error': str(e)}), 400
+    enrich = _sensors_enrichment(projection)
+
+    try:
+        if request.args.get('stream') == '1':
+            return stream_documents(mongo.sensors_collection.find({"active": True}, projection), sensors_codec, enrich)
+
+        sensors = list(mongo.sensors_collection.find({"active": True}, projection))
+        if enrich is not None:
+            enrich(sensors)
 
-        for sensor in sensors:
-            latest_readings = []
-            last_updated = None
-            for data_capture in sensor['data_capture']:
-                data_type = mongo.data_types_collection.find_one({"sensor_id": util.objectid_to_str(sensor["_id"]), "data_type": data_capture})
-                # logger.info(f"data_type: {data_type}")
-                if data_type is None:
-                    continue
-
-                data_type_id = util.objectid_to_str(data_type["_id"])
-                unit = data_type['unit']
-                metrics = mongo.metrics_collection.find({"data_type_id": data_type_id}).sort("datetime", -1).limit(1)
-                for metric in metrics:
-                    latest_readings.append(f"{metric['value']}{unit}")
-                    last_updated = metric['datetime'] if last_updated is None or last_updated < metric['datetime'] else last_updated
-                    logger.info(f"last_updated: {last_updated}")
-                    break
-
-            if len(latest_readings) > 0:
-                sensor['currentValue'] = ', '.join(latest_readings)
-                sensor['lastUpdated'] = util.time_ago(int(last_updated.replace(tzinfo=timezone.utc).timestamp()))
-
-        sensors = util.snake_to_camel_key(util.objectid_to_str(sensors))
         logger.info(f'data: {sensors}')
-        return jsonify({'data': sensors}), 200
+        return jsonify({'data': JsonDocuments(sensors, sensors_codec)}), 200
     except Exception as e:
         logger.error(f"Failed to get sensors: {str(e)}")
         traceback.print_exc()
@@ -153,6 +196,7 @@ def get_sensors():
 def delete_sensor(id):
     try:
         mongo.sensors_collection.delete_one({"_id": ObjectId(id)})
+        metadata_cache.invalidate(mongo.sensors_collection, id)
         logger.info(f"Successfully deleted sensor with ID: {id}")
         return jsonify({'message': 'Sensor deleted successfully', 'data': str(id)}), 201
     except Exception as e:
@@ -2,17 +2,25 @@ import traceback
 
 from flask import Flask, request, jsonify
 from flask_cors import CORS
+from werkzeug.serving import is_running_from_reloader
 from datetime import datetime, timezone
+from pymongo import UpdateOne
 
 from apiculture_api.api.farms_api import farms_api
 from apiculture_api.api.hives_api import hives_api
 from apiculture_api.api.sensors_api import sensors_api
-from apiculture_api.api.metrics_api import metrics_api
+from apiculture_api.api.metrics_api import metrics_api, metrics_buffer, last_seen, anomaly_detector, post_ingest_pipeline, \
+    honey_totals
 from apiculture_api.api.harvest_api import harvest_api
-from apiculture_api.alerts_api import alerts_api, enqueue_sse
+from apiculture_api.alerts_api import alerts_api, enqueue_sse, sse_hub, alert_suppressor, alert_writer, alert_retries
 
 from apiculture_api.util.app_util import AppUtil
-from apiculture_api.util.config import SENSOR_HEARTBEAT_FREQUENCY, IDLE_TIME_TO_MARK_SENSOR_AS_OFFLINE, API_PORT
+from apiculture_api.util.json_provider import BsonJSONProvider
+from apiculture_api.util.metadata_cache import metadata_cache
+from apiculture_api.util.config import SENSOR_HEARTBEAT_FREQUENCY, IDLE_TIME_TO_MARK_SENSOR_AS_OFFLINE, API_PORT, \
+    LAST_SEEN_FLUSH_FREQUENCY, BASELINE_FLUSH_FREQUENCY, HONEY_RECONCILE_FREQUENCY, SSE_SERVING_MODE, SSE_ASYNC_PORT, \
+    SSE_HEARTBEAT_INTERVAL, SSE_SHUTDOWN_TIMEOUT, ALERT_COALESCE_WINDOW, ALERT_RETRY_FREQUENCY
+from apiculture_api.util.sse_server import SseServer
 from apiculture_api.util.task_runner import TaskRunner
 
 util = AppUtil()
@@ -31,6 +39,7 @@ logger.setLevel(logging.INFO)
 
 # Create the Flask application
 app = Flask(__name__)
+app.json = BsonJSONProvider(app)
 app.register_blueprint(farms_api)
 app.register_blueprint(hives_api)
 app.register_blueprint(sensors_api)
@@ -146,72 +155,140 @@ def upload_image():
         return jsonify({'error': f'Failed to save image: {str(e)}'}), 500
 
 
+@app.route('/api/stats', methods=['GET'])
+def get_stats():
+    """
+    Endpoint exposing in-process ingestion counters (queue depth, batch sizes, flush latency).
+    """
+    try:
+        stats = {
+            'metrics_buffer': metrics_buffer.stats() if metrics_buffer is not None else None,
+            'last_seen': last_seen.stats(),
+            'metadata_cache': metadata_cache.stats(),
+            'baselines': anomaly_detector.baselines.stats(),
+            'post_ingest_pipeline': post_ingest_pipeline.stats() if post_ingest_pipeline is not None else None,
+            'honey_totals': honey_totals.stats(),
+            'sse_hub': sse_hub.stats(),
+            'alert_suppressor': alert_suppressor.stats(),
+            'alert_writer': alert_writer.stats(),
+            'alert_retries': alert_retries.stats(),
+            'sse_server': sse_server.stats() if sse_server is not None else None
+        }
+        return jsonify({'data': util.snake_to_camel_key(stats)}), 200
+    except Exception as e:
+        logger.error(f"Failed to get stats: {str(e)}")
+        return jsonify({'error': f'Failed to get stats: {str(e)}'}), 500
+
+
 def monitor_sensor_heartbeat():
-    sensors = list(mongo.sensors_collection.find({ "active": True}))
+    """
+    Flip sensors between online and offline based on their last-seen time.
+
+    Each tick costs one projected sensors query and at most one bulk_write: last-seen times
+    come from the in-memory tracker that ingest keeps up to date, hive and farm names from
+    the metadata cache.
+    """
+    sensors = list(mongo.sensors_collection.find({"active": True}, {'name': 1, 'status': 1, 'beehive_id': 1}))
+    last_seen.ensure_sensors([util.objectid_to_str(sensor["_id"]) for sensor in sensors])
+
+    now = datetime.now(timezone.utc)
+    flips = []
+    events = []
     for sensor in sensors:
-        data_types = (mongo.data_types_collection.find({"sensor_id": util.objectid_to_str(sensor["_id"])})
-                     .sort("updated_at", -1)
-                     .limit(1))
-        data_type = next(data_types, None)
-        if data_type and 'updated_at' in data_type and not data_type.get('data_type', '').startswith('honey_harvested'):
-            try:
-                last_sensor_update = datetime.fromtimestamp(int(data_type['updated_at'].replace(tzinfo=timezone.utc).timestamp()), timezone.utc)
-                delta = datetime.now(timezone.utc) - last_sensor_update
-                if delta.total_seconds() > IDLE_TIME_TO_MARK_SENSOR_AS_OFFLINE and sensor['status'] == 'online':
-                    logger.warning(f"Sensor {sensor['_id']} has not been updated in the last 5 minutes")
-                    mongo.sensors_collection.update_one({"_id": sensor['_id']}, {'$set': {'status': 'offline', 'updated_at': datetime.now(timezone.utc)}})
-                    hive = mongo.hives_collection.find_one({"_id": util.str_to_objectid(sensor['beehive_id'])})
-                    if hive is None:
-                        event = {
-                          "severity": "critical",
-                          "title": "Sensor Non-Responsive",
-                          "message": f"Sensor {sensor['name']} has been offline for more than 5 minutes.",
-                          "timestampMs": datetime.now()
-                        }
-                    else:
-                        farm = mongo.farms_collection.find_one({"_id": util.str_to_objectid(hive['farm_id'])})
-                        event = {
-                          "severity": "critical",
-                          "title": "Sensor Non-Responsive",
-                          "message": f"Sensor {sensor['name']} has been offline for more than 5 minutes.",
-                          "beehiveName": hive['name'],
-                          "farmName": farm['name']
-                        }
-                    enqueue_sse(event)
-                    continue # alert once per sensor
-                elif delta.total_seconds() <= IDLE_TIME_TO_MARK_SENSOR_AS_OFFLINE and sensor['status'] == 'offline':
-                    logger.info(f"Sensor {sensor['_id']} is now active")
-                    mongo.sensors_collection.update_one({"_id": sensor['_id']}, {'$set': {'status': 'online', 'updated_at': datetime.now(timezone.utc)}})
-                    hive = mongo.hives_collection.find_one({"_id": util.str_to_objectid(sensor['beehive_id'])})
-                    if hive is None:
-                        event = {
-                          "severity": "info",
-                          "title": "Sensor is back online",
-                          "message": f"Sensor {sensor['name']} is back online"
-                        }
-                    else:
-                        farm = mongo.farms_collection.find_one({"_id": util.str_to_objectid(hive['farm_id'])})
-                        event = {
-                          "severity": "info",
-                          "title": "Sensor is back online",
-                          "message": f"Sensor {sensor['name']} is back online",
-                          "beehiveName": hive['name'],
-                          "farmName": farm['name']
-                        }
-                    enqueue_sse(event)
-                    continue # alert once per sensor
-            except Exception as e:
-                logger.error(f"Failed to update sensor status: {str(e)}")
-                logger.error(f'data_type: {data_type}')
-                logger.error(f"Doc type: {type(data_type)}")
-                logger.error(f"Doc keys: {list(data_type.keys())}")
-                traceback.print_exc()
-
-runner = TaskRunner([(monitor_sensor_heartbeat, None, SENSOR_HEARTBEAT_FREQUENCY)])
+        data_type = last_seen.latest_for_sensor(util.objectid_to_str(sensor["_id"]))
+        if not data_type or 'updated_at' not in data_type or (data_type.get('data_type') or '').startswith('honey_harvested'):
+            continue
+        try:
+            last_sensor_update = data_type['updated_at'].replace(tzinfo=timezone.utc)
+            idle = (now - last_sensor_update).total_seconds() > IDLE_TIME_TO_MARK_SENSOR_AS_OFFLINE
+            if idle and sensor.get('status') == 'online':
+                logger.warning(f"Sensor {sensor['_id']} has not been updated in the last 5 minutes")
+                flips.append(UpdateOne({"_id": sensor['_id']}, {'$set': {'status': 'offline', 'updated_at': now}}))
+                events.append(_sensor_status_event(sensor, {
+                    "severity": "critical",
+                    "title": "Sensor Non-Responsive",
+                    "message": f"Sensor {sensor['name']} has been offline for more than 5 minutes.",
+                    "_dedupKey": f"sensor-offline:{sensor['_id']}",
+                    "_coalesceKey": f"sensor-offline:{sensor.get('beehive_id')}"
+                }, 'Sensors Non-Responsive', '{count} sensors offline'))
+            elif not idle and sensor.get('status') == 'offline':
+                logger.info(f"Sensor {sensor['_id']} is now active")
+                flips.append(UpdateOne({"_id": sensor['_id']}, {'$set': {'status': 'online', 'updated_at': now}}))
+                events.append(_sensor_status_event(sensor, {
+                    "severity": "info",
+                    "title": "Sensor is back online",
+                    "message": f"Sensor {sensor['name']} is back online",
+                    "_dedupKey": f"sensor-online:{sensor['_id']}",
+                    "_coalesceKey": f"sensor-online:{sensor.get('beehive_id')}"
+                }, 'Sensors are back online', '{count} sensors back online'))
+        except Exception as e:
+            logger.error(f"Failed to update sensor status: {str(e)}")
+            logger.error(f'data_type: {data_type}')
+            traceback.print_exc()
+
+    if flips:
+        mongo.sensors_collection.bulk_write(flips, ordered=False)
+        logger.info(f"Updated status of {len(flips)} sensors")
+    for event in events:
+        enqueue_sse(event) # alert once per sensor
+
+def _sensor_status_event(sensor, event, summary_title, summary_message):
+    """
+    Add the hive and farm of a sensor to a status event (cached lookups), and the summary
+    the alert suppressor uses when several sensors of the hive change status together.
+    """
+    hive = metadata_cache.get(mongo.hives_collection, sensor['beehive_id']) if sensor.get('beehive_id') else None
+    event['_summary'] = {'title': summary_title, 'message': summary_message}
+    if hive is None:
+        return event
+    event['_summary']['message'] = summary_message + ' in {beehiveName}'
+
+    farm = metadata_cache.get(mongo.farms_collection, hive.get('farm_id'))
+    event['beehiveId'] = util.objectid_to_str(hive['_id'])
+    event['farmId'] = hive.get('farm_id')
+    event['beehiveName'] = hive['name']
+    event['farmName'] = farm['name'] if farm else None
+    return event
+
+runner = TaskRunner([
+    (monitor_sensor_heartbeat, None, SENSOR_HEARTBEAT_FREQUENCY),
+    (last_seen.flush, None, LAST_SEEN_FLUSH_FREQUENCY),
+    (anomaly_detector.baselines.flush, None, BASELINE_FLUSH_FREQUENCY),
+    (honey_totals.reconcile, None, HONEY_RECONCILE_FREQUENCY),
+    (alert_suppressor.flush, None, ALERT_COALESCE_WINDOW),
+    (alert_retries.retry, None, ALERT_RETRY_FREQUENCY)
+])
+
+# With the reloader, `python -m apiculture_api.app` starts a parent process that only restarts the child serving requests
+USE_RELOADER = True
+
+# Opt-in cooperative SSE serving: all /sse/alerts connections on one event loop instead of a thread each.
+# Started in every process that serves requests (including WSGI servers importing app), except the reloader's parent.
+sse_server = None
+if SSE_SERVING_MODE == 'async':
+    sse_server = SseServer(sse_hub, '0.0.0.0', SSE_ASYNC_PORT, SSE_HEARTBEAT_INTERVAL)
+    if __name__ != '__main__' or not USE_RELOADER or is_running_from_reloader():
+        sse_server.start()
 
 if __name__ == '__main__':
     try:
         logger.info(f"Starting Apiculture API on http://0.0.0.0:{API_PORT}")
-        app.run(debug=True, host='0.0.0.0', port=API_PORT)
+        app.run(debug=True, use_reloader=USE_RELOADER, host='0.0.0.0', port=API_PORT)
     finally:
+        if sse_server is not None:
+            sse_server.stop(timeout=SSE_SHUTDOWN_TIMEOUT)
         runner.shutdown(wait=True)
+        # Readings acked as queued are flushed (with their rollup and latest reading updates) before the rest
+        if metrics_buffer is not None:
+            metrics_buffer.close(wait=True)
+        if post_ingest_pipeline is not None:
+            post_ingest_pipeline.shutdown(wait=True)
+        last_seen.flush()
+        anomaly_detector.baselines.flush()
+        alert_suppressor.flush()
+        alert_retries.retry()
+        alert_writer.close()
+        # Alerts whose last write failed are not persisted by anything after this
+        pending_alerts = alert_retries.stats()['pending']
+        if pending_alerts:
+            logger.error(f"Shutting down with {pending_alerts} alerts that could not be written")
@@ -0,0 +1,169 @@
+import base64
+import binascii
+
+from bson import ObjectId
+from bson.errors import InvalidId
+
+from apiculture_api.util.config import ALERTS_PAGE_MAX_LIMIT
+
+# Query parameter -> alert document field
+FILTER_FIELDS = {
+    'farmId': 'farm_id',
+    'beehiveId': 'beehive_id'
+}
+
+
+class AlertQuery:
+    """
+    Keyset pagination over alerts, newest first, on (timestamp_ms, _id).
+
+    A page is a range scan on an index that starts where the previous page stopped, so
+    browsing older history costs the same per page however far back it goes (unlike skip).
+    The cursor is the opaque, url-safe encoding of the last alert's (timestamp_ms, _id).
+
+    Args:
+    collection: pymongo alerts collection.
+
+    Example usage:
+    query = AlertQuery(mongo.alerts_collection)
+    alerts, next_cursor = query.page({'severity': 'critical', 'read': 'false'}, limit=30)
+    alerts, next_cursor = query.page({}, limit=30, cursor=next_cursor)
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.collection.create_index([('timestamp_ms', -1), ('_id', -1)])
+        self.collection.create_index([('farm_id', 1), ('timestamp_ms', -1), ('_id', -1)])
+        self.collection.create_index([('beehive_id', 1), ('timestamp_ms', -1), ('_id', -1)])
+        self.collection.create_index([('read', 1), ('farm_id', 1)])
+
+    @staticmethod
+    def encode_cursor(alert):
+        raw = f"{alert['timestamp_ms']!r}_{alert['_id']}"
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+    @staticmethod
+    def decode_cursor(cursor):
+        """
+        Raises:
+            ValueError: If the cursor was not produced by encode_cursor().
+        """
+        try:
+            raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+            timestamp, alert_id = raw.rsplit('_', 1)
+            return float(timestamp), ObjectId(alert_id)
+        except (binascii.Error, UnicodeDecodeError, ValueError, InvalidId):
+            raise ValueError('Invalid cursor')
+
+    @staticmethod
+    def build_filter(args):
+        """
+        Mongo filter from query parameters: severity (comma-separated), read (true/false), farmId and beehiveId.
+
+        Raises:
+            ValueError: On an invalid read value.
+        """
+        query = {}
+        severities = [severity for severity in (args.get('severity') or '').split(',') if severity]
+        if severities:
+            query['severity'] = {'$in': severities}
+        read = args.get('read')
+        if read:
+            if read not in ('true', 'false'):
+                raise ValueError("'read' must be true or false")
+            query['read'] = read == 'true'
+        for param, field in FILTER_FIELDS.items():
+            if args.get(param):
+                query[field] = args.get(param)
+        return query
+
+    def bulk_filter(self, body):
+        """
+        Mongo filter of a bulk update request: {'ids': [...]} or {'filter': {...}} with the
+        farmId, beehiveId, severity (string or list), read and before (timestamp_ms, exclusive) keys.
+
+        Raises:
+            ValueError: If neither ids nor filter is given, or on invalid values.
+        """
+        if body.get('ids') is not None:
+            ids = body['ids']
+            if not isinstance(ids, list) or not ids:
+                raise ValueError("'ids' must be a non-empty list")
+            try:
+                return {'_id': {'$in': [ObjectId(alert_id) for alert_id in ids]}}
+            except (InvalidId, TypeError):
+                raise ValueError("'ids' must be alert ids")
+
+        criteria = body.get('filter')
+        if not isinstance(criteria, dict):
+            raise ValueError("Either 'ids' or 'filter' is required")
+        args = {}
+        for key, value in criteria.items():
+            if isinstance(value, bool):
+                args[key] = 'true' if value else 'false'
+            elif isinstance(value, list):
+                args[key] = ','.join(str(item) for item in value)
+            else:
+                args[key] = value
+        query = self.build_filter(args)
+        if criteria.get('before') is not None:
+            if isinstance(criteria['before'], bool) or not isinstance(criteria['before'], (int, float)):
+                raise ValueError("'before' must be a timestamp")
+            query['timestamp_ms'] = {'$lt': criteria['before']}
+        return query
+
+    def page(self, args, limit, cursor=None, projection=None):
+        """
+        One page of alerts matching the filters in args, newest first.
+
+        Args:
+            args: Mapping of filter query parameters, see build_filter().
+            limit (int): Page size, at most ALERTS_PAGE_MAX_LIMIT.
+            cursor (str, optional): next_cursor of the previous page.
+            projection (dict, optional): Fields to return; timestamp_ms is always included for the cursor.
+
+        Returns:
+            tuple: (list of alert documents, next_cursor or None on the last page)
+
+        Raises:
+            ValueError: On invalid filters, limit or cursor.
+        """
+        if not 1 <= limit <= ALERTS_PAGE_MAX_LIMIT:
+            raise ValueError(f"'limit' must be between 1 and {ALERTS_PAGE_MAX_LIMIT}")
+        query = self.build_filter(args)
+        if cursor:
+            timestamp, alert_id = self.decode_cursor(cursor)
+            query = {'$and': [query, {'$or': [
+                {'timestamp_ms': {'$lt': timestamp}},
+                {'timestamp_ms': timestamp, '_id': {'$lt': alert_id}}
+            ]}]}
+        if projection is not None:
+            projection = dict(projection, timestamp_ms=1)
+
+        alerts = list(self.collection.find(query, projection).sort([('timestamp_ms', -1), ('_id', -1)]).limit(limit + 1))
+        if len(alerts) > limit:
+            alerts = alerts[:limit]
+            return alerts, self.encode_cursor(alerts[-1])
+        return alerts, None
+
+    def unread_counts(self, farm_id=None):
+        """
+        Unread alert counts per farm. Each farm is one count_documents on the (read, farm_id)
+        index and the farms come from a distinct over the same index, so the cost grows with
+        the number of farms, not with the unread backlog.
+
+        Returns:
+            list: {'farm_id', 'unread'} per farm with unread alerts (farm_id is None for alerts without a farm).
+        """
+        if farm_id:
+            farm_ids = [farm_id]
+        else:
+            farm_ids = self.collection.distinct('farm_id', {'read': False})
+            if None not in farm_ids:
+                farm_ids.append(None)
+        counts = []
+        for farm in farm_ids:
+            unread = self.collection.count_documents({'read': False, 'farm_id': farm})
+            if unread:
+                counts.append({'farm_id': farm, 'unread': unread})
+        return counts
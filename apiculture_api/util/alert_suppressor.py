@@ -0,0 +1,167 @@
+import threading
+import time
+from collections import deque
+
+import logging
+logger = logging.getLogger('alert_suppressor')
+logger.setLevel(logging.INFO)
+
+# Producer hints, removed before an alert is emitted
+DEDUP_KEY = '_dedupKey'
+COALESCE_KEY = '_coalesceKey'
+SUMMARY = '_summary'
+
+# Event keys copied from the first coalesced alert onto the summary
+SUMMARY_KEYS = ('severity', 'dataType', 'beehiveId', 'farmId', 'beehiveName', 'farmName')
+
+
+class AlertSuppressor:
+    """
+    Suppression layer in front of alert emission: deduplication, coalescing and a rate bound.
+
+    - Deduplication: an alert whose '_dedupKey' was emitted less than cooldown seconds ago is
+      dropped. The producer sets the key to identify a condition (e.g. one data type out of
+      range); alerts without one are never deduplicated, however similar their text.
+    - Coalescing: alerts with a '_coalesceKey' are held until the next flush(). A group of one
+      is emitted unchanged, larger groups as one summary built from the '_summary' template
+      ({'title': ..., 'message': ...}, formatted with 'count' and the first alert's fields),
+      e.g. "12 sensors offline in Gamma Hive".
+    - Rate bound: at most rate_limit alerts are emitted per rate_window seconds. Alerts over the
+      limit are dropped and reported by flush() as a single "alerts suppressed" alert.
+
+    Args:
+    emit (callable): Called with each alert that gets through (persists and publishes it).
+    cooldown (float): Seconds during which repeats of a dedup key are dropped.
+    rate_limit (int): Maximum number of alerts emitted per rate_window.
+    rate_window (float): Length of the rate window in seconds.
+
+    Example usage:
+    suppressor = AlertSuppressor(publish_alert, 300, 60, 60)
+    suppressor.submit({'title': 'Sensor Non-Responsive', ..., '_coalesceKey': 'offline:<beehive_id>',
+                       '_summary': {'title': 'Sensors Non-Responsive', 'message': '{count} sensors offline in {beehiveName}'}})
+    suppressor.flush()  # periodically, e.g. from TaskRunner
+    """
+
+    def __init__(self, emit, cooldown, rate_limit, rate_window):
+        self.emit = emit
+        self.cooldown = cooldown
+        self.rate_limit = rate_limit
+        self.rate_window = rate_window
+
+        self._lock = threading.Lock()
+        self._last_emitted = {}  # dedup key -> monotonic time
+        self._groups = {}  # coalesce key -> list of held alerts
+        self._emit_times = deque()
+        self._rate_limited_since_flush = 0
+
+        self._received = 0
+        self._emitted = 0
+        self._deduplicated = 0
+        self._coalesced = 0
+        self._rate_limited = 0
+
+    @staticmethod
+    def _strip(event):
+        for key in (DEDUP_KEY, COALESCE_KEY, SUMMARY):
+            event.pop(key, None)
+        return event
+
+    def _admit(self, now):
+        """Take a slot in the rate window. Called with the lock held."""
+        while self._emit_times and self._emit_times[0] <= now - self.rate_window:
+            self._emit_times.popleft()
+        if len(self._emit_times) >= self.rate_limit:
+            self._rate_limited += 1
+            self._rate_limited_since_flush += 1
+            return False
+        self._emit_times.append(now)
+        return True
+
+    def _emit(self, event):
+        try:
+            self.emit(self._strip(event))
+        except Exception as e:
+            logger.error(f"Failed to emit alert: {str(e)}")
+
+    def submit(self, event):
+        """
+        Emit, hold or drop an alert.
+
+        Args:
+            event (dict): Alert, optionally with '_dedupKey', '_coalesceKey' and '_summary' hints.
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._received += 1
+            key = event.get(DEDUP_KEY)
+            if key is not None:
+                last = self._last_emitted.get(key)
+                if last is not None and now - last < self.cooldown:
+                    self._deduplicated += 1
+                    return
+                self._last_emitted[key] = now
+
+            if event.get(COALESCE_KEY) is not None:
+                self._groups.setdefault(event[COALESCE_KEY], []).append(event)
+                return
+            if not self._admit(now):
+                return
+            self._emitted += 1
+        self._emit(event)
+
+    def flush(self):
+        """Emit the held coalescing groups and report alerts dropped by the rate bound."""
+        now = time.monotonic()
+        emitting = []
+        with self._lock:
+            groups, self._groups = self._groups, {}
+            for events in groups.values():
+                if len(events) > 1 and events[0].get(SUMMARY):
+                    template = events[0][SUMMARY]
+                    fields = dict(events[0], count=len(events))
+                    summary = {key: events[0][key] for key in SUMMARY_KEYS if key in events[0]}
+                    try:
+                        summary['title'] = template['title'].format_map(fields)
+                        summary['message'] = template['message'].format_map(fields)
+                    except KeyError as e:
+                        logger.error(f"Invalid alert summary template {template}: missing {str(e)}")
+                        summary['title'] = events[0].get('title')
+                        summary['message'] = f"{events[0].get('message')} ({len(events)} alerts)"
+                    self._coalesced += len(events) - 1
+                    events = [summary]
+                for event in events:
+                    if self._admit(now):
+                        self._emitted += 1
+                        emitting.append(event)
+
+            if self._rate_limited_since_flush:
+                emitting.append({
+                    'severity': 'warning',
+                    'title': 'Alerts suppressed',
+                    'message': f'{self._rate_limited_since_flush} alerts were suppressed during an alert storm'
+                })
+                self._emitted += 1
+                self._rate_limited_since_flush = 0
+
+            expired = [key for key, emitted_at in self._last_emitted.items() if now - emitted_at >= self.cooldown]
+            for key in expired:
+                del self._last_emitted[key]
+
+        for event in emitting:
+            self._emit(event)
+        if emitting:
+            logger.info(f"Flushed {len(emitting)} alerts")
+
+    def stats(self):
+        """Snapshot of received, emitted and suppressed alert counters."""
+        with self._lock:
+            return {
+                'received': self._received,
+                'emitted': self._emitted,
+                'deduplicated': self._deduplicated,
+                'coalesced': self._coalesced,
+                'rate_limited': self._rate_limited,
+                'suppressed': self._deduplicated + self._coalesced + self._rate_limited,
+                'pending': sum(len(events) for events in self._groups.values()),
+                'tracked_keys': len(self._last_emitted)
+            }
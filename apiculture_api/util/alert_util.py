@@ -1,7 +1,6 @@
 import time
 
-from apiculture_api.util.app_util import AppUtil
-util = AppUtil()
+from apiculture_api.util.codec import alerts_codec
 
 from apiculture_api.util.mongo_client import ApicultureMongoClient
 mongo = ApicultureMongoClient()
@@ -77,7 +76,7 @@ class AlertUtil:
             'timestampMs': int(time.time()) - 5 * 60 * 1000
           }
         ]
-        mongo.alerts_collection.insert_many(util.camel_to_snake_key(util.fix_datetime(util.remove_id_key(data))))
+        mongo.alerts_collection.insert_many(alerts_codec.decode(data))
 
 if __name__ == '__main__':
     AlertUtil().generate_dummy_alert()
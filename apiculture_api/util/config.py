@@ -11,8 +11,72 @@ IOT_SIMULATE_MODE = False # Enable simulation mode (No actual IoT connection req
 TASK_RUNNER_RANDOM_DELAY_CEILING = 10
 SENSOR_HEARTBEAT_FREQUENCY = 10
 IDLE_TIME_TO_MARK_SENSOR_AS_OFFLINE = 40
+LAST_SEEN_FLUSH_FREQUENCY = 30 # Seconds between bulk writes of in-memory last-seen times to data_types
+HONEY_RECONCILE_FREQUENCY = 3600 # Seconds between recomputations of the hives' honey_production counters
 DATA_COLLECTION_SIMULATION_FREQUENCY = 30
 
+# Server-sent alert events
+SSE_SUBSCRIBER_BUFFER = 256 # Events buffered per connection before the oldest are dropped
+SSE_SLOW_CONSUMER_MAX_DROPS = 256 # Dropped events after which a connection is closed (the client resumes via Last-Event-ID)
+SSE_HISTORY_SIZE = 1000 # Recent events kept for Last-Event-ID replay
+SSE_HEARTBEAT_INTERVAL = 5
+SSE_SERVING_MODE = 'threaded' # 'threaded' (Flask route only) or 'async' (also serve /sse/alerts from one asyncio loop on SSE_ASYNC_PORT)
+SSE_ASYNC_PORT = 8082
+SSE_SHUTDOWN_TIMEOUT = 5 # Seconds the async SSE server waits for its connections to close on shutdown
+
+# Alert suppression in front of enqueue_sse
+ALERT_DEDUP_COOLDOWN = 300 # Seconds during which repeats of the same alert are dropped
+ALERT_COALESCE_WINDOW = 10 # Seconds related alerts (e.g. sensors going offline) are held to be summarized
+ALERT_RATE_LIMIT = 60 # Maximum number of alerts written per ALERT_RATE_WINDOW
+ALERT_RATE_WINDOW = 60
+
+# Alert persistence (write-behind, alerts are published before they are written)
+ALERT_WRITER_MAX_QUEUE = 5000
+ALERT_WRITER_MAX_BATCH = 200
+ALERT_WRITER_FLUSH_DEADLINE_MS = 200
+ALERT_RETRY_BUFFER = 5000 # Failed alert writes kept for retry, the oldest are dropped beyond this
+ALERT_RETRY_FREQUENCY = 30 # Seconds between retries of failed alert writes
+ALERTS_PAGE_LIMIT = 30 # Default page size of GET /api/alerts
+ALERTS_PAGE_MAX_LIMIT = 200
+ALERTS_BULK_FIELDS = {'read': bool} # Fields POST /api/alerts/bulk may set, with their type
+
+# Metadata cache (farms, hives, sensors, data types)
+METADATA_CACHE_MAX_ENTRIES = 10000
+METADATA_CACHE_TTL = 300 # Seconds before a cached document is re-read from MongoDB
+
+# Document codec (camelCase payloads <-> snake_case documents)
+CODEC_KEY_CACHE_SIZE = 4096 # Memoized key name translations per direction
+STREAM_BATCH_SIZE = 500 # Documents per cursor batch and per chunk of a streamed list response (?stream=1)
+
+# Anomaly detection baselines
+ANOMALY_Z_THRESHOLD = 3.0 # Readings further than this many standard deviations from the baseline raise an alert
+BASELINE_EWMA_ALPHA = 0.05
+BASELINE_MIN_SAMPLES = 30 # Until then the static base_value ± variance from DATA_COLLECTION_METRICS is used
+BASELINE_HOURLY_PROFILE = True # Keep an hour-of-day profile per data type
+BASELINE_STD_FLOOR = 0.25 # Minimum standard deviation, as a fraction of the configured variance
+BASELINE_FLUSH_FREQUENCY = 300
+
+# Metrics storage
+METRICS_STORAGE = 'documents' # 'documents' (one document per reading in 'metrics') or 'timeseries'
+METRICS_TIMESERIES_COLLECTION = 'metrics_ts' # Time-series collection, bucketed per data_type_id and hour
+METRICS_MIGRATION_BATCH_SIZE = 5000
+METRICS_QUERY_MAX_POINTS = 10000 # Maximum number of buckets a range query may return
+METRICS_DOWNSAMPLE_POINTS = 500 # Default number of points of a downsampled series
+METRICS_DOWNSAMPLE_MAX_POINTS = 5000
+METRICS_DOWNSAMPLE_BATCH_SIZE = 10000 # Cursor batch size when streaming raw readings for downsampling
+
+# Metrics ingestion
+METRICS_INGEST_MODE = 'direct' # 'direct' (insert per request) or 'buffered' (group commit through GroupCommitBuffer)
+METRICS_BUFFER_MAX_QUEUE = 10000
+METRICS_BUFFER_MAX_BATCH = 500
+METRICS_BUFFER_FLUSH_DEADLINE_MS = 50
+METRICS_BUFFER_ACK_TIMEOUT = 5
+METRICS_BULK_BATCH_SIZE = 1000 # Documents per insert_many when streaming NDJSON uploads
+METRICS_BULK_MAX_REJECTS = 1000 # Maximum number of per-line rejects reported back to the gateway
+METRICS_POST_INGEST_MODE = 'inline' # 'inline' or 'async' (anomaly checks and alerts run in a StagedPipeline)
+METRICS_PIPELINE_WORKERS = 2 # Worker threads per post-ingest stage
+METRICS_PIPELINE_MAX_QUEUE = 1000 # Capacity of each post-ingest stage queue
+
 DATA_COLLECTION_METRICS = {
     'temperature': { 'base_value': 34.5, 'variance': 2, 'unit': '°C', 'anomaly_rate': 3 },
     'humidity': { 'base_value': 58, 'variance': 5, 'unit': '%', 'anomaly_rate': 1 },
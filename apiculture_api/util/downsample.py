@@ -0,0 +1,74 @@
+import numpy as np
+
+
+def lttb(x, y, threshold):
+    """
+    Largest-Triangle-Three-Buckets downsampling.
+
+    Keeps the first and last points and, for each of the threshold - 2 buckets in between, the point
+    forming the largest triangle with the previously selected point and the average of the next bucket,
+    which preserves the visual shape of the series.
+
+    Args:
+        x (np.ndarray): Sorted x values (e.g. epoch seconds).
+        y (np.ndarray): y values.
+        threshold (int): Number of points to keep.
+
+    Returns:
+        np.ndarray: Indices of the selected points, in ascending order.
+    """
+    n = len(x)
+    if threshold >= n:
+        return np.arange(n)
+    if threshold < 3:
+        return np.array([0, n - 1], dtype=np.int64)[:max(threshold, 0)]
+
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+
+    previous = 0
+    for bucket in range(threshold - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        next_start, next_end = end, edges[bucket + 2] if bucket + 2 < len(edges) else n
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+
+        area = np.abs((x[previous] - avg_x) * (y[start:end] - y[previous]) - (x[previous] - x[start:end]) * (avg_y - y[previous]))
+        previous = start + int(np.argmax(area))
+        selected[bucket + 1] = previous
+    return selected
+
+
+def min_max(x, y, threshold):
+    """
+    Min/max-per-bucket downsampling: splits the series into threshold / 2 buckets and keeps the
+    lowest and highest point of each, so spikes survive at any zoom level.
+
+    Returns:
+        np.ndarray: Indices of the selected points, in ascending order.
+    """
+    n = len(x)
+    if threshold >= n:
+        return np.arange(n)
+    buckets = max(threshold // 2, 1)
+    edges = np.linspace(0, n, buckets + 1).astype(np.int64)
+    starts = edges[:-1]
+    lows = np.minimum.reduceat(y, starts)
+    highs = np.maximum.reduceat(y, starts)
+
+    # Position of each bucket's min and max: first index in the bucket matching the reduced value
+    bucket_of = np.repeat(np.arange(buckets), np.diff(edges))
+    positions = np.arange(n)
+    low_index = np.full(buckets, n, dtype=np.int64)
+    high_index = np.full(buckets, n, dtype=np.int64)
+    np.minimum.at(low_index, bucket_of[y == lows[bucket_of]], positions[y == lows[bucket_of]])
+    np.minimum.at(high_index, bucket_of[y == highs[bucket_of]], positions[y == highs[bucket_of]])
+    return np.unique(np.concatenate([low_index, high_index]))
+
+
+DOWNSAMPLERS = {
+    'lttb': lttb,
+    'minmax': min_max
+}
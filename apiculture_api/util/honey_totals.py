@@ -0,0 +1,131 @@
+from bson import ObjectId
+from pymongo import UpdateOne
+
+from apiculture_api.util.app_util import AppUtil
+from apiculture_api.util.metadata_cache import metadata_cache
+from apiculture_api.util.mongo_client import ApicultureMongoClient
+util = AppUtil()
+
+import logging
+logger = logging.getLogger('honey_totals')
+logger.setLevel(logging.INFO)
+
+HONEY_DATA_TYPE = 'honey_harvested'
+
+
+class HoneyTotals:
+    """
+    Running honey production total on each hive document ('honey_production').
+
+    Ingest increments the counter atomically with $inc for every persisted honey_harvested
+    reading, so GET /api/hives reads the totals straight from the hive documents. reconcile()
+    recomputes all totals with a single $group by beehive_id and corrects hives that drifted.
+
+    Args:
+    hives: pymongo hives collection holding the counters.
+    data_types: pymongo data_types collection, used to recognise honey_harvested readings.
+    source: pymongo metrics collection, used by reconcile().
+
+    Usage (reconcile once, it also runs periodically from the TaskRunner):
+    python -m apiculture_api.util.honey_totals
+    """
+
+    def __init__(self, hives, data_types, source):
+        self.hives = hives
+        self.data_types = data_types
+        self.source = source
+        self._reconciles = 0
+        self._corrected = 0
+
+    def record(self, docs):
+        """
+        Add the honey_harvested readings of a batch of persisted metrics to their hives' counters.
+
+        Args:
+            docs (list): Metric documents as stored (snake_case keys).
+        """
+        totals = {}
+        for doc in docs:
+            value = doc.get('value')
+            beehive_id = doc.get('beehive_id')
+            if isinstance(value, bool) or not isinstance(value, (int, float)) or not beehive_id or not ObjectId.is_valid(beehive_id):
+                continue
+            data_type = metadata_cache.get(self.data_types, doc.get('data_type_id'))
+            if data_type is None or data_type.get('data_type') != HONEY_DATA_TYPE:
+                continue
+            totals[beehive_id] = totals.get(beehive_id, 0) + value
+        if not totals:
+            return
+
+        self.hives.bulk_write([
+            UpdateOne({'_id': ObjectId(beehive_id)}, {'$inc': {'honey_production': total}})
+            for beehive_id, total in totals.items()
+        ], ordered=False)
+        for beehive_id in totals:
+            metadata_cache.invalidate(self.hives, beehive_id)
+
+    def snapshot(self):
+        """
+        Honey production of every hive from raw metrics together with its counter, read by one
+        aggregation: the honey readings grouped by beehive_id, unioned with the hives' counters.
+
+        Returns:
+            dict: beehive_id -> (total, counter or None), for every hive
+        """
+        data_type_ids = [util.objectid_to_str(doc['_id']) for doc in self.data_types.find({'data_type': HONEY_DATA_TYPE}, {'_id': 1})]
+        pipeline = [
+            {'$match': {'data_type_id': {'$in': data_type_ids}, 'beehive_id': {'$ne': None}}},
+            {'$project': {'_id': 0, 'beehive_id': 1, 'value': 1}},
+            {'$unionWith': {'coll': self.hives.name, 'pipeline': [
+                {'$project': {'_id': 0, 'beehive_id': {'$toString': '$_id'}, 'counter': '$honey_production', 'hive': {'$literal': True}}}
+            ]}},
+            {'$group': {'_id': '$beehive_id', 'total': {'$sum': '$value'}, 'counter': {'$max': '$counter'}, 'hive': {'$max': '$hive'}}},
+            {'$match': {'hive': True}}
+        ]
+        return {row['_id']: (row['total'], row.get('counter')) for row in self.source.aggregate(pipeline)}
+
+    def reconcile(self):
+        """
+        Correct counters that drifted from the raw metrics.
+
+        The counters and totals are read together (see snapshot()) and each drifted counter is
+        moved by the difference with $inc instead of being overwritten, so harvests counted by
+        ingest after the snapshot are kept. A reading persisted before the snapshot but counted
+        after it is counted twice until the next run corrects it. A non-numeric counter, which
+        ingest cannot $inc, is replaced by the total.
+
+        Returns:
+            int: Number of hives corrected.
+        """
+        drifted = []
+        requests = []
+        for beehive_id, (total, counter) in self.snapshot().items():
+            if counter is not None and (isinstance(counter, bool) or not isinstance(counter, (int, float))):
+                # $inc fails on a non-numeric counter, so ingest cannot have moved it: replace it if it is unchanged
+                logger.warning(f"Replacing non-numeric honey production {counter!r} of hive {beehive_id}")
+                drifted.append(beehive_id)
+                requests.append(UpdateOne({'_id': ObjectId(beehive_id), 'honey_production': counter},
+                                          {'$set': {'honey_production': total}}))
+            elif counter is None or abs(counter - total) > 1e-6:
+                drifted.append(beehive_id)
+                requests.append(UpdateOne({'_id': ObjectId(beehive_id)}, {'$inc': {'honey_production': total - (counter or 0)}}))
+        corrected = self.hives.bulk_write(requests, ordered=False).modified_count if requests else 0
+        for beehive_id in drifted:
+            metadata_cache.invalidate(self.hives, beehive_id)
+
+        self._reconciles += 1
+        self._corrected += corrected
+        if corrected:
+            logger.warning(f"Corrected honey production of {corrected} hives")
+        return corrected
+
+    def stats(self):
+        """Snapshot of reconcile counters."""
+        return {
+            'reconciles': self._reconciles,
+            'corrected': self._corrected
+        }
+
+if __name__ == '__main__':
+    mongo = ApicultureMongoClient()
+    HoneyTotals(mongo.hives_collection, mongo.data_types_collection, mongo.metrics_collection).reconcile()
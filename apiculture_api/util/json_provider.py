@@ -0,0 +1,125 @@
+from bson import ObjectId
+from bson.decimal128 import Decimal128
+from flask import Response, current_app
+from flask.json.provider import DefaultJSONProvider
+
+from apiculture_api.util.codec import codec
+from apiculture_api.util.config import STREAM_BATCH_SIZE
+
+import logging
+logger = logging.getLogger('json_provider')
+logger.setLevel(logging.INFO)
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class JsonDocuments:
+    """
+    MongoDB documents to be rendered as API payloads while the response is encoded: the
+    top-level '_id' becomes a string 'id' and keys are converted to camelCase (see Codec.encode()).
+
+    Args:
+    docs: Document or list of documents, as read from MongoDB.
+    codec (Codec, optional): Codec of the documents' collection.
+
+    Example usage:
+    return jsonify({'data': JsonDocuments(farms, farms_codec)}), 200
+    """
+
+    __slots__ = ('docs', 'codec')
+
+    def __init__(self, docs, codec=codec):
+        self.docs = docs
+        self.codec = codec
+
+
+class BsonJSONProvider(DefaultJSONProvider):
+    """
+    Flask JSON provider that serializes ObjectId, Decimal128 and JsonDocuments natively,
+    with orjson when it is installed and the standard library encoder otherwise.
+
+    The wire format stays that of Flask's default provider: datetimes as HTTP dates, Decimal
+    and Decimal128 as strings, sorted keys and, in debug mode, an indent of 2. orjson writes
+    non-ASCII characters as UTF-8 instead of \\u escapes.
+
+    Example usage:
+    app.json = BsonJSONProvider(app)
+    """
+
+    @staticmethod
+    def default(o):
+        if isinstance(o, JsonDocuments):
+            return o.codec.encode(o.docs)
+        if isinstance(o, ObjectId):
+            return str(o)
+        if isinstance(o, Decimal128):
+            return str(o.to_decimal())
+        return DefaultJSONProvider.default(o)
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None or set(kwargs) - {'indent', 'separators'}:
+            return super().dumps(obj, **kwargs)
+
+        # Datetimes go through default() too, which keeps Flask's http_date format
+        option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if kwargs.get('indent'):
+            option |= orjson.OPT_INDENT_2
+        try:
+            return orjson.dumps(obj, default=self.default, option=option).decode()
+        except orjson.JSONEncodeError:
+            # e.g. integers beyond 64 bits, which the standard library encoder handles
+            return super().dumps(obj, **kwargs)
+
+
+def stream_documents(cursor, codec=codec, enrich=None, batch_size=STREAM_BATCH_SIZE):
+    """
+    Streams {"data": [...]} from a MongoDB cursor, one cursor batch at a time, so the
+    time to first byte and the memory of a request do not grow with the collection.
+
+    Each batch of documents is passed to enrich (if given), encoded as JsonDocuments and
+    written as one chunk. A failure after the first chunk can no longer change the status
+    code; it is logged and the array is left unterminated, so clients see invalid JSON.
+
+    Args:
+        cursor: pymongo cursor of the documents.
+        codec (Codec, optional): Codec of the documents' collection.
+        enrich (callable, optional): Called with each batch (list of documents), modifying them in place.
+        batch_size (int): Documents per cursor batch and per chunk.
+
+    Returns:
+        Response: Streamed application/json response.
+    """
+    provider = current_app.json
+
+    def chunk(batch):
+        if enrich is not None:
+            enrich(batch)
+        # Strip the brackets of the encoded list
+        return provider.dumps(JsonDocuments(batch, codec))[1:-1]
+
+    def generate():
+        yield '{"data":['
+        try:
+            batch = []
+            separator = ''
+            for doc in cursor.batch_size(batch_size):
+                batch.append(doc)
+                if len(batch) == batch_size:
+                    yield separator + chunk(batch)
+                    batch = []
+                    separator = ','
+            if batch:
+                yield separator + chunk(batch)
+        except Exception as e:
+            logger.error(f"Failed to stream {cursor.collection.name}: {str(e)}")
+            return
+        finally:
+            cursor.close()
+        yield ']}\n'
+
+    return Response(generate(), mimetype=provider.mimetype)
@@ -0,0 +1,179 @@
+import threading
+from datetime import datetime, timezone
+
+from pymongo import UpdateOne
+
+from apiculture_api.util.app_util import AppUtil
+from apiculture_api.util.metadata_cache import metadata_cache
+util = AppUtil()
+
+import logging
+logger = logging.getLogger('last_seen')
+logger.setLevel(logging.INFO)
+
+
+class LastSeenTracker:
+    """
+    In-memory last-seen table for data types, keyed by data_type_id and indexed by sensor_id.
+
+    Ingest calls touch() for every saved reading, which only updates memory. flush() writes the
+    coalesced 'updated_at' values back to the data_types collection with a single bulk_write,
+    and the heartbeat monitor reads latest_for_sensor() instead of querying data_types.
+
+    Args:
+    collection: pymongo data_types collection used to seed the table and persist it.
+
+    Example usage:
+    tracker = LastSeenTracker(mongo.data_types_collection)
+    tracker.touch('694c91391738025ccfceb447', data_type=data_type_doc)
+    tracker.flush()  # periodically, e.g. from TaskRunner
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+        self._lock = threading.Lock()
+        self._entries = {}  # data_type_id -> {'sensor_id', 'data_type', 'updated_at'}
+        self._by_sensor = {}  # sensor_id -> set of data_type_ids
+        self._dirty = {}  # data_type_id -> updated_at not yet written to Mongo
+        self._unresolved = set()  # touched data_type_ids whose sensor is not known yet
+        self._without_data_types = {}  # sensor_id -> metadata_cache generation it was found to have no data types at
+        self._loaded = False
+        self._flushes = 0
+        self._flushed = 0
+
+    def load(self):
+        """Seed the table from the data_types collection (one query)."""
+        docs = list(self.collection.find({}, {'sensor_id': 1, 'data_type': 1, 'updated_at': 1}))
+        with self._lock:
+            for doc in docs:
+                self._remember(doc)
+            self._loaded = True
+        logger.info(f"Loaded last-seen times for {len(docs)} data types")
+
+    def ensure_sensors(self, sensor_ids):
+        """
+        Make sure the data types of the given sensors are known, loading missing ones in one query.
+        Sensors found without data types are not queried again until the metadata cache is
+        invalidated (data types are created together with an invalidation).
+        """
+        if not self._loaded:
+            self.load()
+        generation = metadata_cache.generation()
+        with self._lock:
+            missing = [sensor_id for sensor_id in sensor_ids
+                       if sensor_id not in self._by_sensor and self._without_data_types.get(sensor_id) != generation]
+        if not missing:
+            return
+        docs = list(self.collection.find({'sensor_id': {'$in': missing}}, {'sensor_id': 1, 'data_type': 1, 'updated_at': 1}))
+        with self._lock:
+            for doc in docs:
+                self._remember(doc)
+            for sensor_id in missing:
+                if sensor_id in self._by_sensor:
+                    self._without_data_types.pop(sensor_id, None)
+                else:
+                    self._without_data_types[sensor_id] = generation
+
+    def touch(self, data_type_id, data_type=None, at=None):
+        """
+        Record that a reading for a data type was received. Only ever moves last-seen times forward.
+
+        Args:
+            data_type_id (str): Id of the data type the reading belongs to.
+            data_type (dict, optional): The data type document, if the caller already has it.
+            at (datetime, optional): Time the sensor was seen, e.g. the reading's own datetime for replayed
+                                     readings (naive datetimes are taken as UTC, future ones as now). Defaults to now.
+        """
+        now = datetime.now(timezone.utc)
+        if at is None:
+            at = now
+        else:
+            at = min(at.replace(tzinfo=timezone.utc) if at.tzinfo is None else at.astimezone(timezone.utc), now)
+        with self._lock:
+            entry = self._entries.get(data_type_id)
+            if entry is None and data_type is not None:
+                entry = self._remember(data_type)
+            if entry is None:
+                entry = self._entries[data_type_id] = {'sensor_id': None, 'data_type': None, 'updated_at': None}
+                self._unresolved.add(data_type_id)
+            if entry['updated_at'] is None or entry['updated_at'] < at:
+                entry['updated_at'] = at
+            if data_type_id not in self._dirty or self._dirty[data_type_id] < at:
+                self._dirty[data_type_id] = at
+
+    def latest_for_sensor(self, sensor_id):
+        """
+        Most recently updated data type of a sensor, shaped like a data_types document.
+
+        Returns:
+            dict: {'_id', 'sensor_id', 'data_type', 'updated_at'} or None if the sensor has no data types.
+        """
+        with self._lock:
+            latest = None
+            for data_type_id in self._by_sensor.get(sensor_id, ()):
+                entry = self._entries[data_type_id]
+                if entry['updated_at'] is None:
+                    continue
+                if latest is None or latest[1]['updated_at'] < entry['updated_at']:
+                    latest = (data_type_id, entry)
+            if latest is None:
+                return None
+            return {'_id': latest[0], **latest[1]}
+
+    def flush(self):
+        """Persist the coalesced last-seen times with one bulk_write."""
+        with self._lock:
+            dirty, self._dirty = self._dirty, {}
+            unresolved, self._unresolved = self._unresolved, set()
+        if unresolved:
+            docs = list(self.collection.find({'_id': {'$in': [util.str_to_objectid(i) for i in unresolved]}},
+                                             {'sensor_id': 1, 'data_type': 1}))
+            with self._lock:
+                for doc in docs:
+                    self._remember(doc)
+        if not dirty:
+            return
+
+        requests = [UpdateOne({'_id': util.str_to_objectid(data_type_id)}, {'$max': {'updated_at': updated_at}})
+                    for data_type_id, updated_at in dirty.items()]
+        try:
+            self.collection.bulk_write(requests, ordered=False)
+        except Exception as e:
+            logger.error(f"Failed to flush last-seen times: {str(e)}")
+            with self._lock:
+                for data_type_id, updated_at in dirty.items():
+                    if data_type_id not in self._dirty or self._dirty[data_type_id] < updated_at:
+                        self._dirty[data_type_id] = updated_at
+            return
+        with self._lock:
+            self._flushes += 1
+            self._flushed += len(requests)
+        logger.info(f"Flushed last-seen times for {len(requests)} data types")
+
+    def stats(self):
+        with self._lock:
+            return {
+                'tracked': len(self._entries),
+                'pending': len(self._dirty),
+                'flushes': self._flushes,
+                'flushed': self._flushed
+            }
+
+    def _remember(self, doc):
+        """Add or refresh an entry from a data_types document. Called with the lock held."""
+        data_type_id = util.objectid_to_str(doc['_id'])
+        updated_at = doc.get('updated_at')
+        if updated_at is not None and updated_at.tzinfo is None:
+            updated_at = updated_at.replace(tzinfo=timezone.utc)
+
+        entry = self._entries.get(data_type_id)
+        if entry is None:
+            entry = self._entries[data_type_id] = {'sensor_id': None, 'data_type': None, 'updated_at': None}
+        entry['sensor_id'] = doc.get('sensor_id')
+        entry['data_type'] = doc.get('data_type')
+        if updated_at is not None and (entry['updated_at'] is None or entry['updated_at'] < updated_at):
+            entry['updated_at'] = updated_at
+        if entry['sensor_id'] is not None:
+            self._by_sensor.setdefault(entry['sensor_id'], set()).add(data_type_id)
+        self._unresolved.discard(data_type_id)
+        return entry
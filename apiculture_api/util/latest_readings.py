@@ -0,0 +1,138 @@
+from datetime import datetime, timezone
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from apiculture_api.util.metadata_cache import metadata_cache
+from apiculture_api.util.mongo_client import ApicultureMongoClient
+
+import logging
+logger = logging.getLogger('latest_readings')
+logger.setLevel(logging.INFO)
+
+DUPLICATE_KEY_ERROR = 11000
+
+
+class LatestReadings:
+    """
+    Materialized latest reading per data type, keyed by data_type_id and upserted on ingest,
+    so the latest values of any number of sensors can be read with one query.
+
+    Each document holds the sensor_id, data_type and unit of the data type together with the
+    value and datetime of its newest reading. Readings older than the stored one are ignored,
+    so out-of-order or backfilled batches never move a reading back in time.
+
+    Args:
+    collection: pymongo latest_readings collection.
+    data_types: pymongo data_types collection, used to resolve sensor_id, data_type and unit.
+    source: pymongo metrics collection, used by rebuild().
+
+    Usage (rebuild from raw metrics, e.g. after a backfill or on first deployment):
+    python -m apiculture_api.util.latest_readings
+    """
+
+    def __init__(self, collection, data_types, source):
+        self.collection = collection
+        self.data_types = data_types
+        self.source = source
+        self.collection.create_index('sensor_id')
+
+    @staticmethod
+    def _utc(value):
+        """Naive UTC datetime, the way MongoDB returns dates."""
+        if value.tzinfo is not None:
+            return value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value
+
+    def record(self, docs):
+        """
+        Upsert the newest reading of every data type in a batch of persisted metrics with one bulk_write.
+
+        Args:
+            docs (list): Metric documents as stored (snake_case keys, datetime objects).
+        """
+        newest = {}
+        for doc in docs:
+            if not isinstance(doc.get('datetime'), datetime) or 'value' not in doc:
+                continue
+            reading_time = self._utc(doc['datetime'])
+            current = newest.get(doc['data_type_id'])
+            if current is None or current[0] < reading_time:
+                newest[doc['data_type_id']] = (reading_time, doc['value'])
+        if not newest:
+            return
+
+        requests = []
+        for data_type_id, (reading_time, value) in newest.items():
+            data_type = metadata_cache.get(self.data_types, data_type_id)
+            if data_type is None:
+                continue
+            # Only replaces an older reading; when a newer one is stored the upsert hits a duplicate _id
+            requests.append(UpdateOne(
+                {'_id': data_type_id, 'datetime': {'$lt': reading_time}},
+                {'$set': {
+                    'sensor_id': data_type.get('sensor_id'),
+                    'data_type': data_type.get('data_type'),
+                    'unit': data_type.get('unit', ''),
+                    'value': value,
+                    'datetime': reading_time
+                }},
+                upsert=True
+            ))
+        if not requests:
+            return
+        try:
+            self.collection.bulk_write(requests, ordered=False)
+        except BulkWriteError as e:
+            errors = [error for error in e.details.get('writeErrors', []) if error.get('code') != DUPLICATE_KEY_ERROR]
+            if errors:
+                raise
+
+    def for_sensors(self, sensor_ids):
+        """
+        Latest readings of the given sensors.
+
+        Returns:
+            dict: sensor_id -> {data_type: latest reading document}
+        """
+        readings = {}
+        for doc in self.collection.find({'sensor_id': {'$in': list(sensor_ids)}}):
+            readings.setdefault(doc['sensor_id'], {})[doc['data_type']] = doc
+        return readings
+
+    def rebuild(self):
+        """Recompute the latest reading of every data type from raw metrics, replacing the stored ones."""
+        pipeline = [
+            {'$sort': {'data_type_id': 1, 'datetime': -1}},
+            {'$group': {
+                '_id': '$data_type_id',
+                'value': {'$first': '$value'},
+                'datetime': {'$first': '$datetime'}
+            }},
+            {'$lookup': {
+                'from': self.data_types.name,
+                'let': {'data_type_id': '$_id'},
+                'pipeline': [{'$match': {'$expr': {'$eq': [{'$toString': '$_id'}, '$$data_type_id']}}}],
+                'as': 'data_type'
+            }},
+            {'$unwind': '$data_type'},
+            {'$project': {
+                'sensor_id': '$data_type.sensor_id',
+                'data_type': '$data_type.data_type',
+                'unit': {'$ifNull': ['$data_type.unit', '']},
+                'value': 1,
+                'datetime': 1
+            }},
+            {'$merge': {
+                'into': self.collection.name,
+                'on': '_id',
+                'whenMatched': 'replace',
+                'whenNotMatched': 'insert'
+            }}
+        ]
+        self.source.aggregate(pipeline, allowDiskUse=True)
+        logger.info("Rebuilt latest readings")
+
+if __name__ == '__main__':
+    mongo = ApicultureMongoClient()
+    LatestReadings(mongo.latest_readings_collection, mongo.data_types_collection, mongo.metrics_collection).rebuild()
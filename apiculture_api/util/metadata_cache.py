@@ -0,0 +1,106 @@
+import threading
+import time
+from collections import OrderedDict
+
+from apiculture_api.util.app_util import AppUtil
+from apiculture_api.util.config import METADATA_CACHE_MAX_ENTRIES, METADATA_CACHE_TTL
+util = AppUtil()
+
+
+class MetadataCache:
+    """
+    Process-wide read-through cache for nearly static documents (farms, hives, sensors, data types),
+    with TTL expiry, LRU eviction and hit/miss counters.
+
+    Entries are keyed by collection name and document id. Write endpoints call invalidate()
+    so readers never see stale metadata for longer than the request that changed it.
+    Cached documents are shared between callers and must be treated as read-only.
+
+    Args:
+    max_entries (int): Maximum number of cached documents before the least recently used is evicted.
+    ttl (int): Seconds a cached document stays valid.
+
+    Example usage:
+    hive = metadata_cache.get(mongo.hives_collection, beehive_id)
+    metadata_cache.invalidate(mongo.hives_collection, beehive_id)
+    """
+
+    def __init__(self, max_entries=METADATA_CACHE_MAX_ENTRIES, ttl=METADATA_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # (collection_name, id) -> (expires_at, doc)
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._generation = 0  # bumped by invalidate() so loads racing with a write are not cached
+
+    def get(self, collection, id):
+        """
+        Get a document by id, loading it with find_one on a miss.
+        Missing documents are cached as None as well.
+
+        Args:
+            collection: pymongo collection the document lives in.
+            id (str or ObjectId): Document id.
+
+        Returns:
+            dict: The document, or None if it does not exist.
+        """
+        key = (collection.name, util.objectid_to_str(id))
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return entry[1]
+            self._misses += 1
+            generation = self._generation
+
+        doc = collection.find_one({'_id': util.str_to_objectid(key[1])})
+
+        with self._lock:
+            if generation != self._generation:
+                return doc
+            self._entries[key] = (now + self.ttl, doc)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+        return doc
+
+    def invalidate(self, collection, id=None):
+        """
+        Drop one cached document, or every cached document of the collection when id is None.
+        """
+        with self._lock:
+            self._generation += 1
+            if id is not None:
+                self._entries.pop((collection.name, util.objectid_to_str(id)), None)
+                return
+            for key in [key for key in self._entries if key[0] == collection.name]:
+                del self._entries[key]
+
+    def generation(self):
+        """Counter bumped by every invalidate() and clear(), for callers caching derived results."""
+        return self._generation
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'size': len(self._entries),
+                'hits': self._hits,
+                'misses': self._misses,
+                'evictions': self._evictions,
+                'hit_rate': round(self._hits / lookups, 3) if lookups else 0
+            }
+
+
+metadata_cache = MetadataCache()
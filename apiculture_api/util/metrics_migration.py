@@ -0,0 +1,96 @@
+import sys
+from datetime import datetime
+
+from pymongo.errors import BulkWriteError
+
+from apiculture_api.util.config import METRICS_TIMESERIES_COLLECTION, METRICS_MIGRATION_BATCH_SIZE
+
+from apiculture_api.util.mongo_client import ApicultureMongoClient
+
+import logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s:%(lineno)d - %(levelname)s - %(message)s',
+    handlers=[
+        logging.FileHandler('apiculture-api.log'),
+        logging.StreamHandler()
+    ]
+)
+logger = logging.getLogger('metrics_migration')
+logger.setLevel(logging.INFO)
+
+CHECKPOINT_ID = 'metrics_timeseries'
+
+
+class MetricsMigration:
+    """
+    Copies the per-reading 'metrics' collection into the bucketed time-series collection.
+
+    Documents are copied in _id order and batches of batch_size. The last copied _id is
+    checkpointed in the 'migrations' collection, so an interrupted run resumes where it
+    stopped. Readings without a proper datetime cannot be stored in a time-series
+    collection and are skipped.
+
+    Time-series collections have no unique _id index, so copying a document twice would
+    duplicate the reading. The _id range of each batch is therefore checkpointed as pending
+    before it is inserted; a run resuming after a crash inside a batch first deletes that
+    range from the target (any delete filter on a time-series collection needs MongoDB 7.0).
+
+    Args:
+    source: pymongo collection the metrics are copied from.
+    target: pymongo time-series collection the metrics are copied to.
+    checkpoints: pymongo collection holding the checkpoint.
+    batch_size (int): Documents copied per batch.
+
+    Usage:
+    python -m apiculture_api.util.metrics_migration [batch_size]
+    """
+
+    def __init__(self, source, target, checkpoints, batch_size=METRICS_MIGRATION_BATCH_SIZE):
+        self.batch_size = batch_size
+        self.source = source
+        self.target = target
+        self.checkpoints = checkpoints
+
+    def run(self):
+        checkpoint = self.checkpoints.find_one({'_id': CHECKPOINT_ID})
+        last_id = checkpoint.get('last_id') if checkpoint else None
+        copied = 0
+        skipped = 0
+
+        if checkpoint and checkpoint.get('pending'):
+            first, last = checkpoint['pending']
+            result = self.target.delete_many({'_id': {'$gte': first, '$lte': last}})
+            logger.info(f"Removed {result.deleted_count} documents of the interrupted batch {first}..{last}")
+
+        while True:
+            query = {'_id': {'$gt': last_id}} if last_id is not None else {}
+            batch = list(self.source.find(query).sort('_id', 1).limit(self.batch_size))
+            if not batch:
+                break
+
+            docs = [doc for doc in batch if isinstance(doc.get('datetime'), datetime)]
+            skipped += len(batch) - len(docs)
+            if docs:
+                self.checkpoints.update_one({'_id': CHECKPOINT_ID}, {'$set': {'pending': [batch[0]['_id'], batch[-1]['_id']]}},
+                                            upsert=True)
+                failed = 0
+                try:
+                    self.target.insert_many(docs, ordered=False)
+                except BulkWriteError as e:
+                    failed = len(e.details.get('writeErrors', []))
+                    logger.warning(f"Skipped {failed} documents: {e.details.get('writeErrors', [])[:1]}")
+                copied += len(docs) - failed
+                skipped += failed
+
+            last_id = batch[-1]['_id']
+            self.checkpoints.update_one({'_id': CHECKPOINT_ID}, {'$set': {'last_id': last_id}, '$unset': {'pending': ''}}, upsert=True)
+            logger.info(f"Migrated {copied} metrics ({skipped} skipped), last _id {last_id}")
+
+        logger.info(f"Migration to {METRICS_TIMESERIES_COLLECTION} finished: {copied} copied, {skipped} skipped")
+        return copied, skipped
+
+if __name__ == '__main__':
+    mongo = ApicultureMongoClient()
+    MetricsMigration(mongo.db['metrics'], mongo._timeseries_metrics_collection(), mongo.db['migrations'],
+                     int(sys.argv[1]) if len(sys.argv) > 1 else METRICS_MIGRATION_BATCH_SIZE).run()
@@ -0,0 +1,178 @@
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from apiculture_api.util.config import METRICS_QUERY_MAX_POINTS, METRICS_DOWNSAMPLE_MAX_POINTS, METRICS_DOWNSAMPLE_BATCH_SIZE
+from apiculture_api.util.downsample import DOWNSAMPLERS
+
+# step -> ($dateTrunc unit, binSize, bucket width)
+STEPS = {
+    '1m': ('minute', 1, timedelta(minutes=1)),
+    '5m': ('minute', 5, timedelta(minutes=5)),
+    '1h': ('hour', 1, timedelta(hours=1)),
+    '1d': ('day', 1, timedelta(days=1))
+}
+
+
+def parse_datetime(value, default=None):
+    """
+    Parse an ISO-8601 query parameter into an aware UTC datetime (naive values are taken as UTC).
+
+    Raises:
+        ValueError: If the value is not a valid ISO-8601 datetime.
+    """
+    if value is None or value == '':
+        return default
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00') if value.endswith('Z') else value)
+    if parsed.tzinfo is None:
+        return parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc)
+
+
+class MetricsQuery:
+    """
+    Range queries over metrics at a fixed resolution.
+
+    Each query is a single range scan on the (data_type_id, datetime) index followed by a $group
+    on the truncated time; empty buckets are filled in afterwards, so the cost of a query does not
+    depend on the number of buckets.
+
+    Args:
+    collection: pymongo metrics collection (plain or time-series).
+
+    Example usage:
+    query = MetricsQuery(mongo.metrics_collection)
+    series = query.range_series([data_type_id], start, end, '5m')
+    shape = query.downsampled_series([data_type_id], start, end, 500, 'lttb')
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.collection.create_index([('data_type_id', 1), ('datetime', -1)])
+
+    @staticmethod
+    def bucket_times(start, end, step):
+        """Start times (aware UTC) of every bucket overlapping [start, end), aligned like $dateTrunc."""
+        width = STEPS[step][2]
+        seconds = int(width.total_seconds())
+        first = datetime.fromtimestamp(int(start.timestamp()) // seconds * seconds, timezone.utc)
+        count = -(-int((end - first).total_seconds()) // seconds)
+        return [first + width * index for index in range(count)]
+
+    def validate(self, start, end, step):
+        """
+        Raises:
+            ValueError: On an unknown step, an empty window or too many buckets.
+        """
+        if step not in STEPS:
+            raise ValueError(f"Unsupported step '{step}', expected one of {', '.join(STEPS)}")
+        if start >= end:
+            raise ValueError("'from' must be before 'to'")
+        if (end - start) / STEPS[step][2] > METRICS_QUERY_MAX_POINTS:
+            raise ValueError(f'Window too large for step {step}: more than {METRICS_QUERY_MAX_POINTS} points')
+
+    def range_series(self, data_type_ids, start, end, step):
+        """
+        Per-bucket aggregates of the given data types over [start, end).
+
+        Args:
+            data_type_ids (list): Data type ids to query.
+            start (datetime): Window start (aware UTC).
+            end (datetime): Window end (aware UTC), exclusive.
+            step (str): Bucket width, one of STEPS.
+
+        Returns:
+            dict: data_type_id -> gap-filled list of {'time', 'value', 'min', 'max', 'count'}
+                  ordered oldest first, with 'value' the bucket average (None for empty buckets).
+        """
+        self.validate(start, end, step)
+        unit, bin_size, _ = STEPS[step]
+        pipeline = [
+            {'$match': {
+                'data_type_id': {'$in': list(data_type_ids)},
+                'datetime': {'$gte': start, '$lt': end}
+            }},
+            {'$group': {
+                '_id': {
+                    'data_type_id': '$data_type_id',
+                    'time': {'$dateTrunc': {'date': '$datetime', 'unit': unit, 'binSize': bin_size, 'timezone': 'UTC'}}
+                },
+                'value': {'$avg': '$value'},
+                'min': {'$min': '$value'},
+                'max': {'$max': '$value'},
+                'count': {'$sum': 1}
+            }}
+        ]
+        buckets = {}
+        for row in self.collection.aggregate(pipeline):
+            time = row['_id']['time'].replace(tzinfo=timezone.utc)
+            buckets[(row['_id']['data_type_id'], time)] = row
+
+        times = self.bucket_times(start, end, step)
+        series = {}
+        for data_type_id in data_type_ids:
+            points = []
+            for time in times:
+                row = buckets.get((data_type_id, time))
+                points.append({
+                    'time': time.isoformat(),
+                    'value': round(row['value'], 1) if row and row['value'] is not None else None,
+                    'min': row['min'] if row else None,
+                    'max': row['max'] if row else None,
+                    'count': row['count'] if row else 0
+                })
+            series[data_type_id] = points
+        return series
+
+    def validate_downsample(self, start, end, points, method):
+        """
+        Raises:
+            ValueError: On an unknown method, an empty window or an out of range point count.
+        """
+        if method not in DOWNSAMPLERS:
+            raise ValueError(f"Unsupported downsample method '{method}', expected one of {', '.join(DOWNSAMPLERS)}")
+        if start >= end:
+            raise ValueError("'from' must be before 'to'")
+        if not 3 <= points <= METRICS_DOWNSAMPLE_MAX_POINTS:
+            raise ValueError(f"'points' must be between 3 and {METRICS_DOWNSAMPLE_MAX_POINTS}")
+
+    def _read_series(self, data_type_id, start, end):
+        """Stream the raw readings of one data type into (epoch milliseconds, values) arrays, oldest first."""
+        cursor = self.collection.find(
+            {'data_type_id': data_type_id, 'datetime': {'$gte': start, '$lt': end}, 'value': {'$type': 'number'}},
+            {'_id': 0, 'datetime': 1, 'value': 1}
+        ).sort('datetime', 1).batch_size(METRICS_DOWNSAMPLE_BATCH_SIZE)
+        readings = np.fromiter(
+            ((doc['datetime'], doc['value']) for doc in cursor),
+            dtype=[('time', 'datetime64[ms]'), ('value', 'f8')]
+        )
+        return readings['time'].astype(np.int64), readings['value']
+
+    def downsampled_series(self, data_type_ids, start, end, points, method='lttb'):
+        """
+        Raw readings of the given data types over [start, end), reduced to at most `points` points each.
+
+        The readings are streamed from the cursor straight into NumPy arrays, so the response size
+        depends on `points` and not on the number of stored readings.
+
+        Args:
+            data_type_ids (list): Data type ids to query.
+            start (datetime): Window start (aware UTC).
+            end (datetime): Window end (aware UTC), exclusive.
+            points (int): Maximum number of points per series.
+            method (str): 'lttb' (preserves the shape of the series) or 'minmax' (keeps each bucket's extremes).
+
+        Returns:
+            dict: data_type_id -> list of {'time', 'value'} ordered oldest first.
+        """
+        self.validate_downsample(start, end, points, method)
+        downsample = DOWNSAMPLERS[method]
+        series = {}
+        for data_type_id in data_type_ids:
+            times, values = self._read_series(data_type_id, start, end)
+            selected = downsample(times, values, points)
+            series[data_type_id] = [{
+                'time': datetime.fromtimestamp(int(times[index]) / 1000, timezone.utc).isoformat(),
+                'value': float(values[index])
+            } for index in selected]
+        return series
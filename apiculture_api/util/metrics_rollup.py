@@ -0,0 +1,160 @@
+import sys
+from datetime import datetime, timedelta, timezone
+
+from pymongo import UpdateOne
+
+from apiculture_api.util.mongo_client import ApicultureMongoClient
+
+import logging
+logger = logging.getLogger('metrics_rollup')
+logger.setLevel(logging.INFO)
+
+
+class MetricsRollup:
+    """
+    Hourly rollups of metrics (count, sum, min, max per data_type_id per hour), maintained
+    incrementally on ingest so hourly averages never have to be recomputed from raw readings.
+
+    Args:
+    collection: pymongo metrics_hourly collection holding the rollups.
+    source: pymongo metrics collection, used by rebuild().
+
+    Usage (rebuild rollups from raw metrics, optionally only from a given time):
+    python -m apiculture_api.util.metrics_rollup [since_iso_datetime]
+    """
+
+    def __init__(self, collection, source):
+        self.collection = collection
+        self.source = source
+        self.collection.create_index([('data_type_id', 1), ('hour', 1)], unique=True)
+
+    @staticmethod
+    def truncate_hour(value):
+        """Start of the UTC hour of a datetime, as a naive datetime (the way MongoDB returns dates)."""
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value.replace(minute=0, second=0, microsecond=0)
+
+    def record(self, docs):
+        """
+        Fold newly persisted metric documents into their hourly rollups with one bulk_write.
+
+        Args:
+            docs (list): Metric documents as stored (snake_case keys, datetime objects).
+        """
+        buckets = {}
+        for doc in docs:
+            value = doc.get('value')
+            if isinstance(value, bool) or not isinstance(value, (int, float)) or not isinstance(doc.get('datetime'), datetime):
+                continue
+            key = (doc['data_type_id'], self.truncate_hour(doc['datetime']))
+            bucket = buckets.get(key)
+            if bucket is None:
+                buckets[key] = {'count': 1, 'sum': value, 'min': value, 'max': value}
+            else:
+                bucket['count'] += 1
+                bucket['sum'] += value
+                bucket['min'] = min(bucket['min'], value)
+                bucket['max'] = max(bucket['max'], value)
+        if not buckets:
+            return
+
+        requests = [UpdateOne(
+            {'data_type_id': data_type_id, 'hour': hour},
+            {
+                '$inc': {'count': bucket['count'], 'sum': bucket['sum']},
+                '$min': {'min': bucket['min']},
+                '$max': {'max': bucket['max']}
+            },
+            upsert=True
+        ) for (data_type_id, hour), bucket in buckets.items()]
+        self.collection.bulk_write(requests, ordered=False)
+
+    def hourly(self, data_type_ids, start, end):
+        """
+        Rollups of the given data types for the hours in [start, end].
+
+        Hours without a rollup (e.g. history from before rollups were maintained, until rebuild()
+        has run) are aggregated from the raw metrics instead, without being stored.
+
+        Returns:
+            list: Rollup documents with data_type_id, hour, count, sum, min and max.
+        """
+        if isinstance(data_type_ids, str):
+            data_type_ids = [data_type_ids]
+        first_hour, last_hour = self.truncate_hour(start), self.truncate_hour(end)
+        rollups = list(self.collection.find(
+            {'data_type_id': {'$in': data_type_ids}, 'hour': {'$gte': first_hour, '$lte': last_hour}},
+            {'_id': 0}
+        ))
+
+        hours = (last_hour - first_hour) // timedelta(hours=1) + 1
+        covered = {(rollup['data_type_id'], rollup['hour']) for rollup in rollups}
+        missing = {(data_type_id, first_hour + timedelta(hours=i)) for data_type_id in data_type_ids for i in range(hours)} - covered
+        if missing:
+            missing_from = min(hour for _, hour in missing)
+            missing_to = max(hour for _, hour in missing) + timedelta(hours=1)
+            for rollup in self.source.aggregate(self._pipeline({
+                'data_type_id': {'$in': sorted({data_type_id for data_type_id, _ in missing})},
+                'datetime': {'$gte': missing_from, '$lt': missing_to},
+                'value': {'$type': 'number'}
+            })):
+                if (rollup['data_type_id'], rollup['hour']) in missing:
+                    rollups.append(rollup)
+        return rollups
+
+    @staticmethod
+    def _pipeline(match):
+        """Aggregation of the raw metrics matching match into rollup documents."""
+        return [
+            {'$match': match},
+            {'$group': {
+                '_id': {
+                    'data_type_id': '$data_type_id',
+                    'hour': {'$dateTrunc': {'date': '$datetime', 'unit': 'hour', 'timezone': 'UTC'}}
+                },
+                'count': {'$sum': 1},
+                'sum': {'$sum': '$value'},
+                'min': {'$min': '$value'},
+                'max': {'$max': '$value'}
+            }},
+            {'$project': {
+                '_id': 0,
+                'data_type_id': '$_id.data_type_id',
+                'hour': '$_id.hour',
+                'count': 1,
+                'sum': 1,
+                'min': 1,
+                'max': 1
+            }}
+        ]
+
+    def rebuild(self, since=None):
+        """
+        Recompute rollups from raw metrics (e.g. after a backfill), replacing the affected hours.
+
+        The current hour is left to ingest, whose $inc it would otherwise overwrite. Readings for
+        earlier hours that are ingested while the rebuild runs (e.g. a concurrent backfill) can
+        be lost the same way, so stop backfills before rebuilding the hours they write to.
+
+        Args:
+            since (datetime, optional): Only rebuild hours from this time on. Rebuilds everything by default.
+        """
+        match = {'value': {'$type': 'number'}, 'datetime': {'$lt': self.truncate_hour(datetime.now(timezone.utc))}}
+        if since is not None:
+            match['datetime']['$gte'] = self.truncate_hour(since)
+        pipeline = self._pipeline(match) + [
+            {'$merge': {
+                'into': self.collection.name,
+                'on': ['data_type_id', 'hour'],
+                'whenMatched': 'replace',
+                'whenNotMatched': 'insert'
+            }}
+        ]
+        self.source.aggregate(pipeline)
+        logger.info(f"Rebuilt hourly rollups{' since ' + since.isoformat() if since else ''}")
+
+if __name__ == '__main__':
+    mongo = ApicultureMongoClient()
+    since = datetime.fromisoformat(sys.argv[1]) if len(sys.argv) > 1 else None
+    MetricsRollup(mongo.metrics_hourly_collection, mongo.metrics_collection).rebuild(since)
@@ -1,7 +1,7 @@
 import logging
 from pymongo import MongoClient
 
-from apiculture_api.util.config import MONGODB_URL
+from apiculture_api.util.config import MONGODB_URL, METRICS_STORAGE, METRICS_TIMESERIES_COLLECTION
 
 logging.basicConfig(
     level=logging.INFO,
@@ -24,8 +24,13 @@ class ApicultureMongoClient():
             self.sensors_collection = self.db['sensors']
             self.data_types_collection = self.db['data_types']
             self.metrics_collection = self.db['metrics']
+            if METRICS_STORAGE == 'timeseries':
+                self.metrics_collection = self._timeseries_metrics_collection()
             self.alerts_collection = self.db['alerts']
             self.image_collection = self.db['images']
+            self.baselines_collection = self.db['baselines']
+            self.metrics_hourly_collection = self.db['metrics_hourly']
+            self.latest_readings_collection = self.db['latest_readings']
 
             self.client.server_info()
             logger.info("Successfully connected to MongoDB")
@@ -33,4 +38,20 @@ class ApicultureMongoClient():
             logger.error(f"Failed to connect to MongoDB: {e}")
             exit(1)
 
+    def _timeseries_metrics_collection(self):
+        """
+        Time-series collection for metrics, created on first use. MongoDB packs the readings of
+        each data_type_id (the metaField) into hourly bucket documents with compressed
+        value/timestamp columns, instead of one document and index entry per reading.
+        """
+        if not self.db.list_collection_names(filter={'name': METRICS_TIMESERIES_COLLECTION}):
+            self.db.create_collection(METRICS_TIMESERIES_COLLECTION, timeseries={
+                'timeField': 'datetime',
+                'metaField': 'data_type_id',
+                'granularity': 'seconds'
+            })
+            self.db[METRICS_TIMESERIES_COLLECTION].create_index([('data_type_id', 1), ('datetime', -1)])
+            logger.info(f"Created time-series collection {METRICS_TIMESERIES_COLLECTION}")
+        return self.db[METRICS_TIMESERIES_COLLECTION]
+
 
@@ -0,0 +1,122 @@
+import queue
+import threading
+import time
+
+import logging
+logger = logging.getLogger('pipeline')
+logger.setLevel(logging.INFO)
+
+
+class PipelineStage:
+    """
+    One stage of a StagedPipeline: a bounded input queue served by a pool of worker threads.
+    """
+
+    def __init__(self, name, handler, workers, max_queue):
+        self.name = name
+        self.handler = handler
+        self.workers = workers
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.next_stage = None
+        self.threads = []
+
+        self._lock = threading.Lock()
+        self._processed = 0
+        self._errors = 0
+        self._dropped = 0
+        self._total_ms = 0.0
+        self._max_ms = 0.0
+        self._total_wait_ms = 0.0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'depth': self.queue.qsize(),
+                'capacity': self.queue.maxsize,
+                'workers': self.workers,
+                'processed': self._processed,
+                'errors': self._errors,
+                'dropped': self._dropped,
+                'avg_latency_ms': round(self._total_ms / self._processed, 2) if self._processed else 0,
+                'max_latency_ms': round(self._max_ms, 2),
+                'avg_queue_wait_ms': round(self._total_wait_ms / self._processed, 2) if self._processed else 0
+            }
+
+
+class StagedPipeline:
+    """
+    In-process pipeline of stages connected by bounded queues, each served by its own worker pool.
+
+    Every handler receives the item produced by the previous stage and returns the item for the next
+    one (or None to stop processing it). When a downstream queue is full the worker blocks, so
+    backpressure propagates up to submit().
+
+    Args:
+    stages (list): List of tuples (name, handler, workers) in processing order.
+    max_queue (int): Capacity of each stage's input queue.
+    name (str): Name used for worker threads and log messages.
+
+    Example usage:
+    pipeline = StagedPipeline([('enrich', enrich, 2), ('detect', detect, 2), ('alert', alert, 1)], max_queue=1000)
+    pipeline.submit({'data': data})
+    pipeline.shutdown(wait=True)
+    """
+
+    _STOP = object()
+
+    def __init__(self, stages, max_queue, name='pipeline'):
+        self.name = name
+        self.stages = [PipelineStage(stage_name, handler, workers, max_queue) for stage_name, handler, workers in stages]
+        for stage, next_stage in zip(self.stages, self.stages[1:]):
+            stage.next_stage = next_stage
+        for stage in self.stages:
+            for index in range(stage.workers):
+                thread = threading.Thread(target=self._work, args=(stage,), name=f'{name}-{stage.name}-{index}', daemon=True)
+                thread.start()
+                stage.threads.append(thread)
+
+    def submit(self, item, timeout=None):
+        """
+        Hand an item to the first stage.
+
+        Raises:
+            queue.Full: If the first stage stayed full for the whole timeout.
+        """
+        self.stages[0].queue.put((time.monotonic(), item), timeout=timeout)
+
+    def _work(self, stage):
+        while True:
+            entry = stage.queue.get()
+            if entry is self._STOP:
+                return
+            enqueued_at, item = entry
+            started = time.monotonic()
+            try:
+                result = stage.handler(item)
+            except Exception as e:
+                logger.error(f"{self.name} stage {stage.name} failed: {str(e)}")
+                result = None
+                with stage._lock:
+                    stage._errors += 1
+            finished = time.monotonic()
+            with stage._lock:
+                stage._processed += 1
+                stage._total_ms += (finished - started) * 1000
+                stage._max_ms = max(stage._max_ms, (finished - started) * 1000)
+                stage._total_wait_ms += (started - enqueued_at) * 1000
+                if result is None and stage.next_stage is not None:
+                    stage._dropped += 1
+            if result is not None and stage.next_stage is not None:
+                stage.next_stage.queue.put((finished, result))
+
+    def stats(self):
+        return {stage.name: stage.stats() for stage in self.stages}
+
+    def shutdown(self, wait=True):
+        """Stop the workers after the items already queued have been processed."""
+        for stage in self.stages:
+            for _ in stage.threads:
+                stage.queue.put(self._STOP)
+            if wait:
+                for thread in stage.threads:
+                    thread.join()
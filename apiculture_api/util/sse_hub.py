@@ -0,0 +1,272 @@
+import json
+import threading
+import time
+from collections import deque, namedtuple
+
+import logging
+logger = logging.getLogger('sse_hub')
+logger.setLevel(logging.INFO)
+
+# id: monotonically increasing event id, data: event dict, frame: the serialized SSE message,
+# scope: dimensions a scoped event is routed on (None for regular events, see BroadcastHub.publish())
+SseEvent = namedtuple('SseEvent', ['id', 'data', 'frame', 'scope'])
+
+# Event keys a subscription can filter on
+SUBSCRIPTION_DIMENSIONS = ('farmId', 'beehiveId', 'severity', 'dataType')
+
+
+def parse_filters(args):
+    """
+    Subscription filters from query parameters, e.g. ?farmId=a,b&severity=critical.
+
+    Args:
+        args: Mapping of query parameter to comma-separated values (e.g. Flask's request.args).
+
+    Returns:
+        dict: dimension -> frozenset of accepted values, for the dimensions that are filtered.
+    """
+    filters = {}
+    for dimension in SUBSCRIPTION_DIMENSIONS:
+        values = frozenset(value.strip() for value in (args.get(dimension) or '').split(',') if value.strip())
+        if values:
+            filters[dimension] = values
+    return filters
+
+
+class Subscriber:
+    """
+    One SSE connection: a bounded ring buffer of pending events with its own lock, so
+    publishing to one subscriber never waits on another.
+
+    When the buffer is full the oldest event is dropped. A subscriber that dropped more
+    than max_drops events since it last read is closed; its client reconnects with
+    Last-Event-ID and catches up from the hub's history.
+
+    Args:
+    max_events (int): Capacity of the ring buffer.
+    max_drops (int): Dropped events after which the subscriber is disconnected.
+    """
+
+    def __init__(self, max_events, max_drops):
+        self.max_drops = max_drops
+        self.filters = {}
+        self.closed = False
+        self.dropped = 0
+        self.delivered = 0
+        self._events = deque(maxlen=max_events)
+        self._drops_since_read = 0
+        self._cond = threading.Condition()
+
+    def put(self, event):
+        with self._cond:
+            if self.closed:
+                return
+            if len(self._events) == self._events.maxlen:
+                self.dropped += 1
+                self._drops_since_read += 1
+                if self._drops_since_read > self.max_drops:
+                    self.closed = True
+            self._events.append(event)
+            self._cond.notify()
+
+    def get(self, timeout=None):
+        """
+        Wait for events.
+
+        Returns:
+            list: Every buffered event, oldest first, or an empty list on timeout or when closed.
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._events or self.closed, timeout) or self.closed:
+                return []
+            events = list(self._events)
+            self._events.clear()
+            self._drops_since_read = 0
+            self.delivered += len(events)
+            return events
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._cond.notify()
+
+    def pending(self):
+        with self._cond:
+            return len(self._events)
+
+
+class BroadcastHub:
+    """
+    Fan-out hub for server-sent events: every published event reaches every subscriber.
+
+    Events get monotonically increasing ids (seeded from the clock, so they keep increasing
+    across restarts) and are serialized once, not once per subscriber. The last history_size
+    events are kept so a reconnecting client can replay what it missed via Last-Event-ID.
+    Connections only ever wait on their own subscriber's lock. The hub lock is held by
+    publishers only to number an event and pick its targets, and by (un)subscribe; the
+    subscriber list is a copy-on-write tuple. Events are then delivered outside the hub lock
+    from an outbox drained by one publisher at a time, in id order, so every subscriber sees
+    events in id order without publishers or (un)subscribe waiting on a fan-out. A publisher
+    that finds the outbox being drained leaves its event to the draining one, so publish()
+    can return before its event is delivered.
+
+    Subscribers can filter on SUBSCRIPTION_DIMENSIONS. Filtered subscribers are kept in an
+    index of dimension -> value -> subscribers; an event reaches the unfiltered subscribers
+    plus the filtered ones whose every filtered dimension matched, found by counting hits in
+    the index entries of the event's values. Dispatch cost therefore grows with the number of
+    interested subscribers, not with all subscribers. An event without a value for a
+    dimension does not reach subscribers filtering on that dimension.
+
+    Args:
+    buffer_size (int): Ring buffer capacity of each subscriber.
+    history_size (int): Number of recent events kept for Last-Event-ID replay.
+    max_drops (int): Dropped events after which a slow subscriber is disconnected.
+
+    Example usage:
+    hub = BroadcastHub(256, 1000, 256)
+    subscriber = hub.subscribe(last_event_id=1765432100042, filters={'farmId': {'693ad7c84739d5289a1e0833'}})
+    events = subscriber.get(timeout=5)
+    hub.unsubscribe(subscriber)
+    """
+
+    def __init__(self, buffer_size, history_size, max_drops):
+        self.buffer_size = buffer_size
+        self.max_drops = max_drops
+        self._lock = threading.Lock()
+        self._subscribers = ()
+        self._unfiltered = set()
+        self._index = {dimension: {} for dimension in SUBSCRIPTION_DIMENSIONS}
+        self._history = deque(maxlen=history_size)
+        self._outbox = deque()  # (event, targets), appended under the hub lock
+        self._delivering = threading.Lock()
+        self._last_id = int(time.time() * 1000)
+        self._published = 0
+        self._disconnected = 0
+
+    @staticmethod
+    def matches(filters, data, scope=None):
+        """
+        Whether an event passes a subscription's filters. For a scoped event only the filters
+        on the scope's dimensions for which the event has a value apply.
+        """
+        if scope is not None:
+            filters = {dimension: values for dimension, values in filters.items() if dimension in scope and data.get(dimension) is not None}
+        return all(data.get(dimension) is not None and str(data[dimension]) in values for dimension, values in filters.items())
+
+    def _targets(self, data):
+        """Subscribers interested in an event. Called with the hub lock held."""
+        hits = {}
+        for dimension in SUBSCRIPTION_DIMENSIONS:
+            value = data.get(dimension)
+            if value is None:
+                continue
+            for subscriber in self._index[dimension].get(str(value), ()):
+                hits[subscriber] = hits.get(subscriber, 0) + 1
+        targets = list(self._unfiltered)
+        targets.extend(subscriber for subscriber, count in hits.items() if count == len(subscriber.filters))
+        return targets
+
+    @staticmethod
+    def _frame(event_id, data, name=None):
+        event_line = f"event: {name}\n" if name else ''
+        return f"{event_line}id: {event_id}\ndata: {json.dumps(data, default=str)}\n\n"
+
+    def publish(self, data, name=None, scope=None):
+        """
+        Broadcast an event to every subscriber.
+
+        Args:
+            data (dict): JSON-serializable event.
+            name (str, optional): SSE event name, for events that are not alerts (e.g. 'alertsUpdated').
+                                  Named events are not delivered to the clients' onmessage handler.
+            scope (tuple, optional): Dimensions the event is routed on instead of every filter, e.g.
+                                     ('farmId', 'beehiveId') to reach the subscribers of a farm whatever
+                                     their severity filter. Filters on a scope dimension the event has no
+                                     value for do not apply either.
+
+        Returns:
+            int: The id of the event.
+        """
+        with self._lock:
+            self._last_id += 1
+            event = SseEvent(self._last_id, data, self._frame(self._last_id, data, name), scope)
+            self._history.append(event)
+            self._published += 1
+            if scope is None:
+                targets = self._targets(data)
+            else:
+                # Scoped events are rare (bulk changes), so they skip the index
+                targets = [subscriber for subscriber in self._subscribers if self.matches(subscriber.filters, data, scope)]
+            self._outbox.append((event, targets))
+        self._deliver()
+        return event.id
+
+    def _deliver(self):
+        """Drain the outbox unless another publisher is draining it, re-checking after releasing so no event is left behind."""
+        while self._outbox and self._delivering.acquire(blocking=False):
+            try:
+                while self._outbox:
+                    event, targets = self._outbox.popleft()
+                    for subscriber in targets:
+                        subscriber.put(event)
+            finally:
+                self._delivering.release()
+
+    def subscribe(self, last_event_id=None, subscriber=None, filters=None):
+        """
+        Register a new subscriber.
+
+        Args:
+            last_event_id (int, optional): Id of the last event the client received. Newer
+                                           events still in the history are replayed first.
+            subscriber (optional): Subscriber to register, e.g. an AsyncSubscriber. A new
+                                   Subscriber is created by default.
+            filters (dict, optional): dimension -> set of accepted values, see parse_filters().
+
+        Returns:
+            Subscriber: The registered subscriber.
+        """
+        if subscriber is None:
+            subscriber = Subscriber(self.buffer_size, self.max_drops)
+        subscriber.filters = {dimension: frozenset(str(value) for value in values) for dimension, values in (filters or {}).items() if values}
+        with self._lock:
+            if last_event_id is not None:
+                missed = [event for event in self._history if event.id > last_event_id and self.matches(subscriber.filters, event.data, event.scope)]
+                for event in missed[-self.buffer_size:]:
+                    subscriber.put(event)
+            self._subscribers = self._subscribers + (subscriber,)
+            if not subscriber.filters:
+                self._unfiltered.add(subscriber)
+            for dimension, values in subscriber.filters.items():
+                for value in values:
+                    self._index[dimension].setdefault(value, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        subscriber.close()
+        with self._lock:
+            self._subscribers = tuple(s for s in self._subscribers if s is not subscriber)
+            self._unfiltered.discard(subscriber)
+            for dimension, values in subscriber.filters.items():
+                for value in values:
+                    entry = self._index[dimension].get(value)
+                    if entry is not None:
+                        entry.discard(subscriber)
+                        if not entry:
+                            del self._index[dimension][value]
+            self._disconnected += 1
+
+    def stats(self):
+        """Snapshot of subscriber and event counters."""
+        subscribers = self._subscribers
+        return {
+            'subscribers': len(subscribers),
+            'filtered_subscribers': sum(1 for subscriber in subscribers if subscriber.filters),
+            'published': self._published,
+            'last_event_id': self._last_id,
+            'history': len(self._history),
+            'pending': sum(subscriber.pending() for subscriber in subscribers),
+            'dropped': sum(subscriber.dropped for subscriber in subscribers),
+            'slow_subscribers': sum(1 for subscriber in subscribers if subscriber.closed),
+            'disconnected': self._disconnected
+        }
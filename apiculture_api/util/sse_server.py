@@ -0,0 +1,258 @@
+import asyncio
+import threading
+from collections import deque
+from urllib.parse import urlsplit, parse_qs
+
+from apiculture_api.util.sse_hub import parse_filters
+
+import logging
+logger = logging.getLogger('sse_server')
+logger.setLevel(logging.INFO)
+
+MAX_REQUEST_HEAD = 16 * 1024
+RESPONSE_HEAD = (
+    'HTTP/1.1 200 OK\r\n'
+    'Content-Type: text/event-stream\r\n'
+    'Cache-Control: no-cache\r\n'
+    'Connection: keep-alive\r\n'
+    'Access-Control-Allow-Origin: *\r\n'
+    '\r\n'
+).encode()
+
+
+class AsyncSubscriber:
+    """
+    BroadcastHub subscriber consumed from an asyncio event loop.
+
+    put() is called from publishing threads: it appends to the ring buffer and, when the
+    buffer was empty, wakes the connection with loop.call_soon_threadsafe. Same buffer and
+    slow-consumer policy as sse_hub.Subscriber.
+
+    Args:
+    loop: Event loop the connection runs on.
+    max_events (int): Capacity of the ring buffer.
+    max_drops (int): Dropped events after which the subscriber is disconnected.
+    """
+
+    def __init__(self, loop, max_events, max_drops):
+        self.loop = loop
+        self.max_drops = max_drops
+        self.filters = {}
+        self.closed = False
+        self.dropped = 0
+        self.delivered = 0
+        self._events = deque(maxlen=max_events)
+        self._drops_since_read = 0
+        self._lock = threading.Lock()
+        self._ready = asyncio.Event()
+
+    def put(self, event):
+        with self._lock:
+            if self.closed:
+                return
+            if len(self._events) == self._events.maxlen:
+                self.dropped += 1
+                self._drops_since_read += 1
+                if self._drops_since_read > self.max_drops:
+                    self.closed = True
+            wake = not self._events or self.closed
+            self._events.append(event)
+        if wake:
+            self.loop.call_soon_threadsafe(self._ready.set)
+
+    async def get(self, timeout):
+        """
+        Wait for events.
+
+        Returns:
+            list: Every buffered event, oldest first, or an empty list on timeout or when closed.
+        """
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        with self._lock:
+            self._ready.clear()
+            if self.closed:
+                return []
+            events = list(self._events)
+            self._events.clear()
+            self._drops_since_read = 0
+            self.delivered += len(events)
+            return events
+
+    def close(self):
+        with self._lock:
+            self.closed = True
+        self.loop.call_soon_threadsafe(self._ready.set)
+
+    def pending(self):
+        with self._lock:
+            return len(self._events)
+
+
+class SseServer:
+    """
+    Serves /sse/alerts from a single asyncio event loop on its own port, next to the Flask app.
+
+    An idle connection is a socket, a small ring buffer and a suspended coroutine instead of a
+    WSGI worker thread, so thousands of dashboards can stay connected without starving the
+    REST endpoints. Events come from the same BroadcastHub as the Flask SSE route.
+
+    Args:
+    hub (BroadcastHub): Hub the connections subscribe to.
+    host (str): Interface to listen on.
+    port (int): Port to listen on.
+    heartbeat_interval (float): Seconds of inactivity after which a heartbeat comment is sent.
+
+    Example usage:
+    server = SseServer(sse_hub, '0.0.0.0', 8082, 5)
+    server.start()
+    server.stop(timeout=5)
+    """
+
+    def __init__(self, hub, host, port, heartbeat_interval):
+        self.hub = hub
+        self.host = host
+        self.port = port
+        self.heartbeat_interval = heartbeat_interval
+        self.loop = None
+        self._server = None
+        self._thread = None
+        self._started = threading.Event()
+        self._handlers = {}  # task -> writer
+        self._stopping = False
+        self._connections = 0
+        self._served = 0
+
+    def start(self):
+        """Start the event loop in a daemon thread and wait until the port is bound."""
+        self._thread = threading.Thread(target=self._run, name='sse_server', daemon=True)
+        self._thread.start()
+        self._started.wait()
+        if self._server is not None:
+            logger.info(f"Serving SSE on http://{self.host}:{self.port}/sse/alerts")
+
+    def _run(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        try:
+            self._server = self.loop.run_until_complete(
+                asyncio.start_server(self._handle, self.host, self.port, limit=MAX_REQUEST_HEAD))
+        except OSError as e:
+            logger.error(f"Failed to start SSE server on port {self.port}: {str(e)}")
+            self.loop.close()
+            return
+        finally:
+            self._started.set()
+        self.loop.run_forever()
+        self.loop.run_until_complete(self.loop.shutdown_asyncgens())
+        self.loop.close()
+
+    def stop(self, timeout=None):
+        """
+        Close every connection (clients reconnect with Last-Event-ID), then stop the event loop.
+
+        Args:
+            timeout (float, optional): Seconds to wait for the connections and the loop thread. After
+                                       that the (daemon) loop thread is left behind. Waits indefinitely by default.
+        """
+        if self._server is not None:
+            asyncio.run_coroutine_threadsafe(self._shutdown(timeout), self.loop)
+        if self._thread is not None:
+            self._thread.join(timeout)
+            if self._thread.is_alive():
+                logger.warning(f"SSE server did not stop within {timeout} seconds")
+
+    async def _shutdown(self, timeout):
+        # Handlers unsubscribe from the hub when cancelled, so no subscriber outlives the loop
+        self._stopping = True
+        self._server.close()
+        handlers = list(self._handlers)
+        for task in handlers:
+            task.cancel()
+        if handlers:
+            _, stuck = await asyncio.wait(handlers, timeout=timeout)
+            if stuck:
+                logger.warning(f"Stopping the SSE server with {len(stuck)} connections still closing")
+                for task in stuck:
+                    self._handlers[task].transport.abort()
+        self.loop.stop()
+
+    async def _handle(self, reader, writer):
+        task = asyncio.current_task()
+        self._handlers[task] = writer
+        try:
+            await self._serve(reader, writer)
+        except asyncio.CancelledError:
+            # Cancelled by _shutdown(); finishing normally keeps asyncio from logging the cancelled task
+            if not self._stopping:
+                raise
+        finally:
+            self._handlers.pop(task, None)
+            if self._stopping:
+                writer.transport.abort()
+
+    async def _serve(self, reader, writer):
+        try:
+            head = await reader.readuntil(b'\r\n\r\n')
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            await self._close(writer)
+            return
+
+        lines = head.decode('latin-1').split('\r\n')
+        parts = lines[0].split(' ')
+        headers = {}
+        for line in lines[1:]:
+            if ':' in line:
+                name, value = line.split(':', 1)
+                headers[name.strip().lower()] = value.strip()
+
+        url = urlsplit(parts[1]) if len(parts) == 3 else None
+        if url is None or parts[0] != 'GET' or url.path != '/sse/alerts':
+            writer.write(b'HTTP/1.1 404 Not Found\r\nContent-Length: 0\r\nConnection: close\r\n\r\n')
+            await self._close(writer)
+            return
+
+        query = {name: values[0] for name, values in parse_qs(url.query).items()}
+        last_event_id = headers.get('last-event-id') or query.get('lastEventId')
+        subscriber = AsyncSubscriber(asyncio.get_running_loop(), self.hub.buffer_size, self.hub.max_drops)
+        self.hub.subscribe(int(last_event_id) if last_event_id and last_event_id.isdigit() else None,
+                           subscriber=subscriber, filters=parse_filters(query))
+        self._connections += 1
+        self._served += 1
+        try:
+            writer.write(RESPONSE_HEAD)
+            while not subscriber.closed:
+                events = await subscriber.get(self.heartbeat_interval)
+                if events:
+                    writer.write(''.join(event.frame for event in events).encode())
+                elif not subscriber.closed:
+                    writer.write(b': heartbeat\n\n')
+                await writer.drain()
+            if subscriber.dropped:
+                logger.warning(f"Closing slow SSE connection after {subscriber.dropped} dropped events")
+        except ConnectionError:
+            pass
+        finally:
+            self._connections -= 1
+            self.hub.unsubscribe(subscriber)
+            await self._close(writer)
+
+    async def _close(self, writer):
+        if self._stopping:
+            # Don't wait for clients that stopped reading
+            writer.transport.abort()
+            return
+        try:
+            writer.close()
+            await writer.wait_closed()
+        except ConnectionError:
+            pass
+
+    def stats(self):
+        """Snapshot of connection counters."""
+        return {
+            'connections': self._connections,
+            'served': self._served
+        }
@@ -0,0 +1,330 @@
+import queue
+import threading
+import time
+from collections import deque
+
+from bson import ObjectId
+from pymongo.errors import BulkWriteError
+
+import logging
+logger = logging.getLogger('write_buffer')
+logger.setLevel(logging.INFO)
+
+DUPLICATE_KEY_ERROR = 11000
+
+
+class WriteTicket:
+    """
+    Handle returned by GroupCommitBuffer.submit() for one batch of documents.
+
+    The inserted ids are known up front (they are assigned client-side), the ticket
+    only tells the caller when the group commit containing its documents is durable.
+    """
+
+    def __init__(self, inserted_ids):
+        self.inserted_ids = inserted_ids
+        self.error = None
+        self._done = threading.Event()
+
+    def wait(self, timeout=None):
+        """
+        Block until the documents of this ticket have been written.
+
+        Args:
+            timeout (float, optional): Seconds to wait before giving up.
+
+        Raises:
+            TimeoutError: If the batch was not flushed within the timeout.
+            Exception: The write error raised while flushing the batch.
+        """
+        if not self._done.wait(timeout):
+            raise TimeoutError('Timed out waiting for buffered write to be flushed')
+        if self.error is not None:
+            raise self.error
+        return self.inserted_ids
+
+    def _resolve(self, error=None):
+        self.error = error
+        self._done.set()
+
+
+class GroupCommitBuffer:
+    """
+    Bounded in-process write-behind buffer that group-commits documents from many
+    callers into unordered insert_many batches.
+
+    A batch is flushed as soon as it holds max_batch documents, or when the oldest
+    buffered document has waited flush_deadline_ms milliseconds, whichever comes first.
+
+    Args:
+    collection: pymongo collection the documents are inserted into.
+    max_queue (int): Maximum number of documents waiting to be flushed. submit() blocks
+                     (up to its timeout) while the buffer is full.
+    max_batch (int): Number of documents that triggers an immediate flush.
+    flush_deadline_ms (int): Maximum time in milliseconds a document waits before being flushed.
+    name (str): Name used for the flusher thread and log messages.
+    on_flush (callable, optional): Called on the flusher thread with the successfully written documents of
+                                   each batch, after the batch's tickets are resolved.
+    on_error (callable, optional): Called with the documents of each batch that failed to be written,
+                                   e.g. to retry them later (their client-side _id makes retries idempotent).
+                                   Requires unique_ids.
+    unique_ids (bool): Whether the collection has a unique _id index. Only then are duplicate key errors
+                       taken as "already written" and resubmitting documents idempotent. Time-series
+                       collections have no such index: a failed batch may be partially written, and
+                       writing it again duplicates readings.
+
+    Example usage:
+    buffer = GroupCommitBuffer(mongo.metrics_collection, 10000, 500, 50)
+    ticket = buffer.submit([{'value': 34.5}])
+    inserted_ids = ticket.wait(timeout=5)
+    """
+
+    def __init__(self, collection, max_queue, max_batch, flush_deadline_ms, name='write_buffer', on_flush=None, on_error=None,
+                 unique_ids=True):
+        if on_error is not None and not unique_ids:
+            raise ValueError('Retrying failed writes needs a unique _id index')
+        self.collection = collection
+        self.unique_ids = unique_ids
+        self.on_flush = on_flush
+        self.on_error = on_error
+        self.max_queue = max_queue
+        self.max_batch = max_batch
+        self.flush_deadline = flush_deadline_ms / 1000.0
+        self.name = name
+
+        self._cond = threading.Condition()
+        self._pending = deque()  # (enqueued_at, docs, ticket)
+        self._pending_docs = 0
+        self._closed = False
+
+        self._batches = 0
+        self._docs = 0
+        self._errors = 0
+        self._last_batch_size = 0
+        self._max_batch_size = 0
+        self._last_flush_ms = 0.0
+        self._max_flush_ms = 0.0
+        self._total_flush_ms = 0.0
+        self._last_wait_ms = 0.0
+        self._max_wait_ms = 0.0
+
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, docs, timeout=None):
+        """
+        Add documents to the buffer.
+
+        Args:
+            docs (list): Documents to insert. Documents without an '_id' get one assigned.
+            timeout (float, optional): Seconds to wait for space when the buffer is full.
+
+        Returns:
+            WriteTicket: Ticket to wait on for the group commit.
+
+        Raises:
+            queue.Full: If the buffer stayed full for the whole timeout.
+        """
+        for doc in docs:
+            if '_id' not in doc:
+                doc['_id'] = ObjectId()
+        ticket = WriteTicket([doc['_id'] for doc in docs])
+
+        with self._cond:
+            if self._closed:
+                raise RuntimeError(f'{self.name} is closed')
+            if not self._cond.wait_for(lambda: self._pending_docs == 0 or self._pending_docs + len(docs) <= self.max_queue, timeout):
+                raise queue.Full(f'{self.name} is full ({self._pending_docs} documents pending)')
+            self._pending.append((time.monotonic(), docs, ticket))
+            self._pending_docs += len(docs)
+            self._cond.notify_all()
+        return ticket
+
+    def _take_batch(self):
+        """Wait for a flush trigger and pop the next batch. Called with the condition held."""
+        while not self._pending:
+            if self._closed:
+                return None
+            self._cond.wait()
+
+        deadline = self._pending[0][0] + self.flush_deadline
+        while self._pending_docs < self.max_batch and not self._closed:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            self._cond.wait(remaining)
+
+        entries = []
+        batch_docs = 0
+        while self._pending and (not entries or batch_docs + len(self._pending[0][1]) <= self.max_batch):
+            entry = self._pending.popleft()
+            entries.append(entry)
+            batch_docs += len(entry[1])
+        self._pending_docs -= batch_docs
+        self._cond.notify_all()
+        return entries
+
+    def _run(self):
+        while True:
+            with self._cond:
+                entries = self._take_batch()
+            if entries is None:
+                return
+            self._flush(entries)
+
+    def _flush(self, entries):
+        docs = [doc for _, entry_docs, _ in entries for doc in entry_docs]
+        started = time.monotonic()
+        failed = {}
+        duplicates = set()
+        try:
+            self.collection.insert_many(docs, ordered=False)
+        except BulkWriteError as e:
+            # Retried documents keep their client-side _id, so duplicates mean "already written"
+            for write_error in e.details.get('writeErrors', []):
+                if write_error.get('code') == DUPLICATE_KEY_ERROR and self.unique_ids:
+                    duplicates.add(write_error['index'])
+                else:
+                    failed[write_error['index']] = write_error
+        except Exception as e:
+            logger.error(f"{self.name} failed to flush {len(docs)} documents: {str(e)}")
+            failed = {index: e for index in range(len(docs))}
+        finished = time.monotonic()
+
+        offset = 0
+        for _, entry_docs, ticket in entries:
+            errors = [failed[index] for index in range(offset, offset + len(entry_docs)) if index in failed]
+            offset += len(entry_docs)
+            if errors:
+                error = errors[0] if isinstance(errors[0], Exception) else RuntimeError(f"Write failed: {errors[0].get('errmsg')}")
+                ticket._resolve(error)
+            else:
+                ticket._resolve()
+
+        # Callers are acked as soon as their documents are durable, the callbacks only delay the next batch
+        if self.on_flush is not None:
+            try:
+                self.on_flush([doc for index, doc in enumerate(docs) if index not in failed and index not in duplicates])
+            except Exception as e:
+                logger.error(f"{self.name} flush callback failed: {str(e)}")
+        if self.on_error is not None and failed:
+            try:
+                self.on_error([docs[index] for index in sorted(failed)])
+            except Exception as e:
+                logger.error(f"{self.name} error callback failed: {str(e)}")
+
+        flush_ms = (finished - started) * 1000
+        wait_ms = (finished - entries[0][0]) * 1000
+        with self._cond:
+            self._batches += 1
+            self._docs += len(docs)
+            self._errors += len(failed)
+            self._last_batch_size = len(docs)
+            self._max_batch_size = max(self._max_batch_size, len(docs))
+            self._last_flush_ms = flush_ms
+            self._max_flush_ms = max(self._max_flush_ms, flush_ms)
+            self._total_flush_ms += flush_ms
+            self._last_wait_ms = wait_ms
+            self._max_wait_ms = max(self._max_wait_ms, wait_ms)
+
+    def stats(self):
+        """Snapshot of queue depth, batch size and flush latency counters."""
+        with self._cond:
+            return {
+                'queue_depth': self._pending_docs,
+                'queue_capacity': self.max_queue,
+                'batches': self._batches,
+                'documents': self._docs,
+                'errors': self._errors,
+                'last_batch_size': self._last_batch_size,
+                'max_batch_size': self._max_batch_size,
+                'avg_batch_size': round(self._docs / self._batches, 1) if self._batches else 0,
+                'last_flush_ms': round(self._last_flush_ms, 2),
+                'max_flush_ms': round(self._max_flush_ms, 2),
+                'avg_flush_ms': round(self._total_flush_ms / self._batches, 2) if self._batches else 0,
+                'last_ack_wait_ms': round(self._last_wait_ms, 2),
+                'max_ack_wait_ms': round(self._max_wait_ms, 2)
+            }
+
+    def close(self, wait=True):
+        """Flush whatever is still buffered and stop the flusher thread."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if wait:
+            self._thread.join()
+
+
+class RetryBuffer:
+    """
+    Bounded store of documents whose buffered write failed, resubmitted to a GroupCommitBuffer
+    by retry(). When full, the oldest documents are dropped. The buffer's collection must have
+    a unique _id index (not a time-series collection), which makes resubmitting idempotent.
+
+    Args:
+    buffer (GroupCommitBuffer): Buffer the documents are resubmitted to.
+    max_docs (int): Maximum number of documents kept for retry.
+
+    Example usage:
+    alert_writer = GroupCommitBuffer(mongo.alerts_collection, 5000, 200, 200, on_error=lambda docs: retries.add(docs))
+    retries = RetryBuffer(alert_writer, 5000)
+    retries.retry()  # periodically, e.g. from TaskRunner
+    """
+
+    def __init__(self, buffer, max_docs):
+        if not buffer.unique_ids:
+            raise ValueError(f"{buffer.name} cannot be retried without a unique _id index")
+        self.buffer = buffer
+        self._lock = threading.Lock()
+        self._docs = deque(maxlen=max_docs)
+        self._added = 0
+        self._retried = 0
+        self._dropped = 0
+
+    def add(self, docs):
+        with self._lock:
+            overflow = max(len(self._docs) + len(docs) - self._docs.maxlen, 0)
+            self._dropped += overflow
+            self._docs.extend(docs)
+            self._added += len(docs)
+        if overflow:
+            logger.warning(f"{self.buffer.name} retry buffer is full, dropped {overflow} documents")
+
+    def retry(self):
+        """Resubmit the stored documents, keeping them if the buffer is full, closed or fails otherwise."""
+        with self._lock:
+            docs = list(self._docs)
+            self._docs.clear()
+        if not docs:
+            return
+        try:
+            self.buffer.submit(docs, timeout=0)
+            with self._lock:
+                self._retried += len(docs)
+            logger.info(f"Resubmitted {len(docs)} documents to {self.buffer.name}")
+        except queue.Full:
+            self._restore(docs)
+        except Exception as e:
+            logger.error(f"Failed to resubmit {len(docs)} documents to {self.buffer.name}: {str(e)}")
+            self._restore(docs)
+
+    def _restore(self, docs):
+        """Put documents taken by retry() back in front of those added since, dropping the oldest when full."""
+        with self._lock:
+            kept = list(self._docs)
+            self._docs.clear()
+            self._docs.extend(docs)
+            self._docs.extend(kept)
+            overflow = max(len(docs) + len(kept) - self._docs.maxlen, 0)
+            self._dropped += overflow
+        if overflow:
+            logger.warning(f"{self.buffer.name} retry buffer is full, dropped {overflow} documents")
+
+    def stats(self):
+        with self._lock:
+            return {
+                'pending': len(self._docs),
+                'added': self._added,
+                'retried': self._retried,
+                'dropped': self._dropped
+            }
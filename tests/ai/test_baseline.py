@@ -0,0 +1,79 @@
+import unittest
+
+import numpy as np
+
+from apiculture_api.ai.baseline import StreamingBaselines
+
+
+class FakeCollection:
+    """In-memory stand-in for the baselines collection: find() and bulk_write() of ReplaceOne requests."""
+
+    def __init__(self):
+        self.docs = {}
+
+    def find(self):
+        return list(self.docs.values())
+
+    def bulk_write(self, requests, ordered=True):
+        for request in requests:
+            self.docs[request._filter['_id']] = request._doc
+
+
+class TestStreamingBaselines(unittest.TestCase):
+    def setUp(self):
+        self.collection = FakeCollection()
+        self.baselines = StreamingBaselines(self.collection, alpha=0.05, min_samples=10, hourly=False)
+        self.rng = np.random.default_rng(7)
+
+    def test_not_scored_until_warm(self):
+        self.baselines.update('dt1', np.full(9, 20.0), np.zeros(9, dtype=int))
+
+        self.assertTrue(np.isnan(self.baselines.score('dt1', np.array([20.0]), np.array([0]))).all())
+        self.assertTrue(np.isnan(self.baselines.score('dt2', np.array([20.0]), np.array([0]))).all())
+
+    def test_converges(self):
+        values = self.rng.normal(20, 2, 2000)
+        self.baselines.update('dt1', values, np.zeros(len(values), dtype=int))
+
+        baseline = self.baselines._baselines['dt1']
+        self.assertAlmostEqual(baseline['mean'], 20, delta=0.5)
+        self.assertAlmostEqual(np.sqrt(baseline['var']), 2, delta=0.5)
+
+        scores = self.baselines.score('dt1', np.array([20.0, 30.0]), np.array([0, 0]))
+        self.assertLess(abs(scores[0]), 1)
+        self.assertGreater(scores[1], 3)
+
+    def test_adapts_to_level_shift(self):
+        self.baselines.update('dt1', self.rng.normal(20, 1, 500), np.zeros(500, dtype=int))
+        self.baselines.update('dt1', self.rng.normal(30, 1, 200), np.zeros(200, dtype=int))
+
+        self.assertAlmostEqual(self.baselines._baselines['dt1']['mean'], 30, delta=0.5)
+
+    def test_std_floor(self):
+        self.baselines.update('dt1', np.full(50, 20.0), np.zeros(50, dtype=int))
+
+        self.assertAlmostEqual(self.baselines.score('dt1', np.array([20.5]), np.array([0]), std_floor=0.5)[0], 1.0)
+
+    def test_hourly_profile(self):
+        baselines = StreamingBaselines(self.collection, alpha=0.05, min_samples=10, hourly=True)
+        hours = np.array([3, 15] * 200)
+        values = np.where(hours == 3, 10.0, 30.0) + self.rng.normal(0, 1, len(hours))
+        baselines.update('dt1', values, hours)
+
+        scores = baselines.score('dt1', np.array([30.0, 30.0]), np.array([15, 3]))
+        self.assertLess(abs(scores[0]), 2)
+        self.assertGreater(scores[1], 5)
+
+    def test_flush_and_load(self):
+        self.baselines.update('dt1', np.arange(20, dtype=float), np.zeros(20, dtype=int))
+        self.baselines.flush()
+
+        restored = StreamingBaselines(self.collection, alpha=0.05, min_samples=10, hourly=False)
+        restored.load()
+        self.assertEqual(restored._baselines['dt1']['n'], 20)
+        self.assertAlmostEqual(restored._baselines['dt1']['mean'], self.baselines._baselines['dt1']['mean'])
+        self.assertEqual(self.baselines.stats()['pending'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,7 @@
 import unittest
 
 from apiculture_api.app import app
+from apiculture_api.alerts_api import sse_hub
 import json
 
 
@@ -17,5 +18,73 @@ class TestAlertsApi(unittest.TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertIn('data', data)
 
+    def test_get_alerts_paginated(self):
+        response = self.app.get('/api/alerts?limit=2&severity=critical,warning&read=false')
+        data = json.loads(response.data)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('data', data)
+        self.assertLessEqual(len(data['data']), 2)
+        self.assertIn('nextCursor', data)
+        if data['nextCursor']:
+            response = self.app.get(f"/api/alerts?limit=2&severity=critical,warning&read=false&cursor={data['nextCursor']}")
+            next_page = json.loads(response.data)
+
+            self.assertEqual(response.status_code, 200)
+            self.assertFalse({alert['id'] for alert in data['data']} & {alert['id'] for alert in next_page['data']})
+
+    def test_get_alerts_invalid_cursor(self):
+        response = self.app.get('/api/alerts?cursor=not-a-cursor')
+        data = json.loads(response.data)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('error', data)
+
+    def test_bulk_update_alerts(self):
+        response = self.app.post(
+            '/api/alerts/bulk',
+            data=json.dumps({'filter': {'severity': ['critical', 'warning'], 'read': False}, 'set': {'read': True}}),
+            content_type='application/json'
+        )
+        data = json.loads(response.data)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('modifiedCount', data['data'])
+
+    def test_bulk_update_alerts_event(self):
+        subscriber = sse_hub.subscribe(filters={'severity': {'critical'}})
+        try:
+            response = self.app.post(
+                '/api/alerts/bulk',
+                data=json.dumps({'filter': {'farmId': '693ad7c84739d5289a1e0833'}}),
+                content_type='application/json'
+            )
+            events = subscriber.get(timeout=1)
+        finally:
+            sse_hub.unsubscribe(subscriber)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(events), 1)
+        self.assertTrue(events[0].frame.startswith('event: alertsUpdated\n'))
+
+    def test_bulk_update_alerts_invalid_field(self):
+        response = self.app.post(
+            '/api/alerts/bulk',
+            data=json.dumps({'ids': ['693ad7c84739d5289a1e0833'], 'set': {'title': 'changed'}}),
+            content_type='application/json'
+        )
+        data = json.loads(response.data)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('error', data)
+
+    def test_get_unread_count(self):
+        response = self.app.get('/api/alerts/unread-count')
+        data = json.loads(response.data)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('total', data['data'])
+        self.assertIn('farms', data['data'])
+
 if __name__ == '__main__':
     unittest.main()
@@ -113,6 +113,40 @@ class TestHivesApi(unittest.TestCase):
         self.assertEqual(data['message'], 'Data saved successfully')
         self.assertIn('data', data)
 
+    def test_save_hive_honey_production(self):
+        response = self.app.post(
+            '/api/farms',
+            data=json.dumps([{'_id': '693accdec9185a87bca56b0f', 'name': "Counter Farm", 'beehiveIds': []}]),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 201)
+
+        try:
+            response = self.app.post(
+                '/api/hives',
+                data=json.dumps([
+                    {
+                        '_id': '693ad7c84739d5289a1e083f',
+                        'name': "Counter Hive",
+                        'farmId': "693accdec9185a87bca56b0f",
+                        'honeyProduction': 'plenty',
+                        'sensorIds': []
+                    }
+                ]),
+                content_type='application/json'
+            )
+            self.assertEqual(response.status_code, 201)
+
+            response = self.app.get('/api/hives?fields=id,honeyProduction')
+            data = json.loads(response.data)
+
+            self.assertEqual(response.status_code, 200)
+            hive = next(hive for hive in data['data'] if hive['id'] == '693ad7c84739d5289a1e083f')
+            self.assertEqual(hive['honeyProduction'], 0)
+        finally:
+            self.app.delete('/api/hives/693ad7c84739d5289a1e083f')
+            self.app.delete('/api/farms/693accdec9185a87bca56b0f')
+
     def test_update_hive(self):
         response = self.app.put(
             '/api/hives/693ad7c84739d5289a1e0838',
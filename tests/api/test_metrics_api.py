@@ -1,11 +1,47 @@
 import unittest
 from datetime import datetime, timezone
+from unittest.mock import patch
 
-from apiculture_api.app import app
+from bson import ObjectId
+
+from apiculture_api.app import app, mongo
+from apiculture_api.api.metrics_api import last_seen
 import json
 
+# Hive with one temperature/humidity sensor and a few readings on 2025-12-01, seeded for the range queries
+SEEDED_HIVE_ID = '693ad7c84739d5289a1e0a01'
+SEEDED_SENSOR_ID = ObjectId('693ae1c84739d5289a1e0a01')
+SEEDED_TEMPERATURE_ID = ObjectId('693d6f2dd8f5aae43d540a01')
+SEEDED_HUMIDITY_ID = ObjectId('693d6f2dd8f5aae43d540a02')
+
 
 class TestMetricsApi(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        mongo.sensors_collection.insert_one({
+            '_id': SEEDED_SENSOR_ID,
+            'name': 'Seeded Sensor',
+            'beehive_id': SEEDED_HIVE_ID,
+            'data_capture': ['temperature', 'humidity'],
+            'active': True
+        })
+        mongo.data_types_collection.insert_many([
+            {'_id': SEEDED_TEMPERATURE_ID, 'sensor_id': str(SEEDED_SENSOR_ID), 'data_type': 'temperature'},
+            {'_id': SEEDED_HUMIDITY_ID, 'sensor_id': str(SEEDED_SENSOR_ID), 'data_type': 'humidity'}
+        ])
+        mongo.metrics_collection.insert_many([
+            {'data_type_id': str(SEEDED_TEMPERATURE_ID), 'datetime': datetime(2025, 12, 1, 0, 1), 'value': 30},
+            {'data_type_id': str(SEEDED_TEMPERATURE_ID), 'datetime': datetime(2025, 12, 1, 0, 3), 'value': 32},
+            {'data_type_id': str(SEEDED_TEMPERATURE_ID), 'datetime': datetime(2025, 12, 1, 0, 7), 'value': 35},
+            {'data_type_id': str(SEEDED_HUMIDITY_ID), 'datetime': datetime(2025, 12, 1, 0, 2), 'value': 60}
+        ])
+
+    @classmethod
+    def tearDownClass(cls):
+        mongo.metrics_collection.delete_many({'data_type_id': {'$in': [str(SEEDED_TEMPERATURE_ID), str(SEEDED_HUMIDITY_ID)]}})
+        mongo.data_types_collection.delete_many({'_id': {'$in': [SEEDED_TEMPERATURE_ID, SEEDED_HUMIDITY_ID]}})
+        mongo.sensors_collection.delete_one({'_id': SEEDED_SENSOR_ID})
+
     def setUp(self):
         """Set up test client and other test variables."""
         self.app = app.test_client()
@@ -30,6 +66,39 @@ class TestMetricsApi(unittest.TestCase):
         self.assertEqual(data['message'], 'Data saved successfully')
         self.assertIn('data', data)
 
+    def test_save_metrics_bulk(self):
+        lines = [
+            json.dumps({'datetime': '2025-12-01T10:00:00.000Z', 'dataTypeId': "693d6f2dd8f5aae43d541acd", 'value': 34.1}),
+            'not json',
+            json.dumps({'datetime': '2025-12-01T10:00:30.000Z', 'dataTypeId': "693d6f2dd8f5aae43d541acd", 'value': 34.3})
+        ]
+        response = self.app.post(
+            '/api/metrics/bulk',
+            data='\n'.join(lines),
+            content_type='application/x-ndjson'
+        )
+        data = json.loads(response.data)
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(data['accepted'], 2)
+        self.assertEqual(data['rejected'], 1)
+        self.assertEqual(data['rejects'][0]['line'], 2)
+
+    def test_save_metrics_bulk_last_seen(self):
+        lines = [
+            json.dumps({'datetime': '2025-12-01T10:00:30.000Z', 'dataTypeId': "693d6f2dd8f5aae43d541acd", 'value': 34.3}),
+            json.dumps({'datetime': '2025-12-01T10:00:00.000Z', 'dataTypeId': "693d6f2dd8f5aae43d541acd", 'value': 34.1})
+        ]
+        with patch.object(last_seen, 'touch') as touch:
+            response = self.app.post(
+                '/api/metrics/bulk',
+                data='\n'.join(lines),
+                content_type='application/x-ndjson'
+            )
+
+        self.assertEqual(response.status_code, 201)
+        touch.assert_called_once_with("693d6f2dd8f5aae43d541acd", at=datetime(2025, 12, 1, 10, 0, 30, tzinfo=timezone.utc))
+
     def test_get_metrics(self):
         response = self.app.get('/api/metrics/693ad7c84739d5289a1e0833/temperature')
         data = json.loads(response.data)
@@ -37,5 +106,66 @@ class TestMetricsApi(unittest.TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertIn('data', data)
 
+    def test_get_metrics_range(self):
+        response = self.app.get('/api/metrics/693ad7c84739d5289a1e0833/temperature/range?from=2025-12-01T00:00:00Z&to=2025-12-02T00:00:00Z&step=5m')
+        data = json.loads(response.data)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('data', data)
+        self.assertEqual(len(data['data']), 288)
+
+    def test_get_metrics_range_seeded(self):
+        response = self.app.get(f'/api/metrics/{SEEDED_HIVE_ID}/temperature/range?from=2025-12-01T00:00:00Z&to=2025-12-01T00:15:00Z&step=5m')
+        data = json.loads(response.data)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(data['data'], [
+            {'time': '2025-12-01T00:00:00+00:00', 'value': 31.0, 'min': 30, 'max': 32, 'count': 2},
+            {'time': '2025-12-01T00:05:00+00:00', 'value': 35.0, 'min': 35, 'max': 35, 'count': 1},
+            {'time': '2025-12-01T00:10:00+00:00', 'value': None, 'min': None, 'max': None, 'count': 0}
+        ])
+
+    def test_get_metrics_range_invalid_step(self):
+        response = self.app.get('/api/metrics/693ad7c84739d5289a1e0833/temperature/range?step=7m')
+        data = json.loads(response.data)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('error', data)
+
+    def test_get_metrics_range_downsampled(self):
+        response = self.app.get('/api/metrics/693ad7c84739d5289a1e0833/temperature/range?from=2025-11-01T00:00:00Z&to=2025-12-01T00:00:00Z&downsample=lttb&points=100')
+        data = json.loads(response.data)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('data', data)
+        self.assertLessEqual(len(data['data']), 100)
+
+    def test_get_metrics_range_invalid_downsample(self):
+        response = self.app.get('/api/metrics/693ad7c84739d5289a1e0833/temperature/range?downsample=average')
+        data = json.loads(response.data)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('error', data)
+
+    def test_get_hive_metrics(self):
+        response = self.app.get('/api/metrics/693ad7c84739d5289a1e0833?captures=temperature,humidity')
+        data = json.loads(response.data)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('data', data)
+        self.assertIn('temperature', data['data'])
+        self.assertEqual(len(data['data']['temperature']), 25)
+
+    def test_get_hive_metrics_seeded(self):
+        response = self.app.get(f'/api/metrics/{SEEDED_HIVE_ID}?captures=temperature,humidity&from=2025-12-01T00:00:00Z&to=2025-12-01T00:10:00Z&step=5m')
+        data = json.loads(response.data)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(data['data']), {'temperature', 'humidity'})
+        self.assertEqual([point['time'] for point in data['data']['temperature']], ['2025-12-01T00:00:00+00:00', '2025-12-01T00:05:00+00:00'])
+        self.assertEqual([point['value'] for point in data['data']['temperature']], [31.0, 35.0])
+        self.assertEqual([point['value'] for point in data['data']['humidity']], [60.0, None])
+        self.assertEqual([point['count'] for point in data['data']['humidity']], [1, 0])
+
 if __name__ == '__main__':
     unittest.main()
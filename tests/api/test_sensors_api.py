@@ -460,6 +460,28 @@ class TestSensorsApi(unittest.TestCase):
         self.assertIn('data', data)
         self.assertEqual(len(data['data']), 2)
 
+    def test_get_sensors_streamed(self):
+        response = self.app.get('/api/sensors?stream=1')
+        data = json.loads(response.data)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(data, json.loads(self.app.get('/api/sensors').data))
+
+    def test_get_sensors_fields(self):
+        response = self.app.get('/api/sensors?fields=id,name,status')
+        data = json.loads(response.data)
+
+        self.assertEqual(response.status_code, 200)
+        for sensor in data['data']:
+            self.assertLessEqual(set(sensor), {'id', 'name', 'status'})
+
+    def test_get_sensors_invalid_fields(self):
+        response = self.app.get('/api/sensors?fields=data$capture')
+        data = json.loads(response.data)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('error', data)
+
     def test_delete_sensor(self):
         response = self.app.delete('/api/sensors/6938de0b4894fe4e61a531d4')
         data = json.loads(response.data)
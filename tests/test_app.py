@@ -61,6 +61,14 @@ class TestApicultureApi(unittest.TestCase):
         self.assertIn('error', data)
         self.assertEqual(data['error'], 'No data provided')
 
+    def test_get_stats(self):
+        response = self.app.get('/api/stats')
+        data = json.loads(response.data)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('data', data)
+        self.assertIn('metricsBuffer', data['data'])
+
     def _generate_random_temperature(self):
         return {
             'temperature': 25.5,
@@ -0,0 +1,107 @@
+import time
+import unittest
+
+from apiculture_api.util.alert_suppressor import AlertSuppressor
+
+
+class TestAlertSuppressor(unittest.TestCase):
+    def setUp(self):
+        self.emitted = []
+
+    def _offline(self, sensor, beehive_id='h1', summary=None):
+        return {
+            'severity': 'critical',
+            'title': 'Sensor Non-Responsive',
+            'message': f'Sensor {sensor} has been offline for more than 5 minutes.',
+            'beehiveId': beehive_id,
+            'beehiveName': 'Gamma Hive',
+            '_dedupKey': f'sensor-offline:{sensor}',
+            '_coalesceKey': f'sensor-offline:{beehive_id}',
+            '_summary': summary or {'title': 'Sensors Non-Responsive', 'message': '{count} sensors offline in {beehiveName}'}
+        }
+
+    def test_suppressor_keeps_repeated_alerts_without_dedup_key(self):
+        suppressor = AlertSuppressor(self.emitted.append, 300, 60, 60)
+        alert = {'severity': 'info', 'title': 'Honey Harvested', 'message': '250g harvested', 'beehiveId': '693ad7c84739d5289a1e0833'}
+        suppressor.submit(dict(alert))
+        suppressor.submit(dict(alert))
+        suppressor.submit(dict(alert, _dedupKey='harvest'))
+        suppressor.submit(dict(alert, _dedupKey='harvest'))
+
+        self.assertEqual(len(self.emitted), 3)
+        self.assertEqual(suppressor.stats()['deduplicated'], 1)
+
+    def test_dedup_key_repeats_after_cooldown(self):
+        suppressor = AlertSuppressor(self.emitted.append, 0.05, 60, 60)
+        suppressor.submit({'title': 'Temperature high', '_dedupKey': 'range:t1'})
+        suppressor.submit({'title': 'Temperature high', '_dedupKey': 'range:t1'})
+        time.sleep(0.06)
+        suppressor.submit({'title': 'Temperature high', '_dedupKey': 'range:t1'})
+
+        self.assertEqual(self.emitted, [{'title': 'Temperature high'}, {'title': 'Temperature high'}])
+        self.assertEqual(suppressor.stats()['deduplicated'], 1)
+
+    def test_coalesces_group_into_summary(self):
+        suppressor = AlertSuppressor(self.emitted.append, 300, 60, 60)
+        for sensor in ('s1', 's2', 's3'):
+            suppressor.submit(self._offline(sensor))
+        suppressor.submit(self._offline('s4', beehive_id='h2'))
+
+        self.assertEqual(self.emitted, [])
+        self.assertEqual(suppressor.stats()['pending'], 4)
+
+        suppressor.flush()
+
+        self.assertEqual(self.emitted, [
+            {'severity': 'critical', 'beehiveId': 'h1', 'beehiveName': 'Gamma Hive',
+             'title': 'Sensors Non-Responsive', 'message': '3 sensors offline in Gamma Hive'},
+            {'severity': 'critical', 'title': 'Sensor Non-Responsive', 'message': 'Sensor s4 has been offline for more than 5 minutes.',
+             'beehiveId': 'h2', 'beehiveName': 'Gamma Hive'}
+        ])
+        self.assertEqual(suppressor.stats()['coalesced'], 2)
+        self.assertEqual(suppressor.stats()['pending'], 0)
+
+    def test_invalid_summary_template_falls_back(self):
+        suppressor = AlertSuppressor(self.emitted.append, 300, 60, 60)
+        summary = {'title': 'Sensors Non-Responsive', 'message': '{count} sensors offline in {farmName}'}
+        suppressor.submit(self._offline('s1', summary=summary))
+        suppressor.submit(self._offline('s2', summary=summary))
+
+        with self.assertLogs('alert_suppressor', 'ERROR'):
+            suppressor.flush()
+
+        self.assertEqual(self.emitted[0]['title'], 'Sensor Non-Responsive')
+        self.assertEqual(self.emitted[0]['message'], 'Sensor s1 has been offline for more than 5 minutes. (2 alerts)')
+
+    def test_rate_limit_reports_suppressed_alerts(self):
+        suppressor = AlertSuppressor(self.emitted.append, 300, 2, 60)
+        for index in range(5):
+            suppressor.submit({'title': f'Alert {index}'})
+
+        self.assertEqual([alert['title'] for alert in self.emitted], ['Alert 0', 'Alert 1'])
+
+        suppressor.flush()
+
+        self.assertEqual(self.emitted[-1], {
+            'severity': 'warning',
+            'title': 'Alerts suppressed',
+            'message': '3 alerts were suppressed during an alert storm'
+        })
+        self.assertEqual(suppressor.stats()['rate_limited'], 3)
+
+        suppressor.flush()
+        self.assertEqual(len(self.emitted), 3)
+
+    def test_emit_error_is_logged(self):
+        def emit(event):
+            raise RuntimeError('queue closed')
+
+        suppressor = AlertSuppressor(emit, 300, 60, 60)
+
+        with self.assertLogs('alert_suppressor', 'ERROR'):
+            suppressor.submit({'title': 'Alert'})
+        self.assertEqual(suppressor.stats()['emitted'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
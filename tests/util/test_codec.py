@@ -0,0 +1,61 @@
+import unittest
+from datetime import datetime, timezone
+
+from bson import ObjectId
+
+from apiculture_api.util.app_util import AppUtil
+from apiculture_api.util.codec import Codec, alerts_codec, hives_codec, metrics_codec, sensors_codec
+util = AppUtil()
+
+
+class TestCodec(unittest.TestCase):
+    def test_round_trip(self):
+        hive_id = ObjectId()
+        payload = {'_id': str(hive_id), 'id': 'ignored', 'name': 'Gamma Hive', 'farmId': '693accdec9185a87bca56b0f',
+                   'hiveLocation': {'latitude': 1.5, 'gridRef': 'A1'}, 'sensorIds': ['s1', 's2'], 'honeyProduction': 0}
+
+        doc = hives_codec.decode(payload)
+
+        self.assertEqual(doc, {'_id': hive_id, 'name': 'Gamma Hive', 'farm_id': '693accdec9185a87bca56b0f',
+                               'hive_location': {'latitude': 1.5, 'grid_ref': 'A1'}, 'sensor_ids': ['s1', 's2'],
+                               'honey_production': 0})
+        encoded = hives_codec.encode(doc)
+        self.assertEqual(encoded, {key: value for key, value in payload.items() if key != '_id'} | {'id': str(hive_id)})
+
+    def test_decode_matches_app_util_chain(self):
+        now = datetime(2025, 12, 1, 10, 7, 30, 123000, tzinfo=timezone.utc)
+        metrics = [{'id': '1', 'datetime': now.isoformat(timespec='milliseconds'), 'dataTypeId': str(ObjectId()), 'value': 34.5},
+                   {'id': '2', 'datetime': '2025-12-01T10:08:00.000Z', 'dataTypeId': str(ObjectId()), 'value': 35}]
+        alert = {'id': str(ObjectId()), 'severity': 'warning', 'title': 'Temperature Anomaly', 'dataType': 'temperature',
+                 'beehiveId': str(ObjectId()), 'read': False, 'timestampMs': now.timestamp(), 'filter': {'farmId': 'f1'}}
+
+        self.assertEqual(metrics_codec.decode(metrics), util.camel_to_snake_key(util.fix_datetime(util.remove_id_key(metrics))))
+        self.assertEqual(alerts_codec.decode(alert), util.camel_to_snake_key(util.fix_datetime(util.remove_id_key(alert))))
+        self.assertEqual(metrics_codec.decode(metrics)[0]['datetime'], now)
+
+    def test_encode_matches_app_util_chain(self):
+        sensors = [{'_id': ObjectId(), 'name': 'Sensor 1', 'beehive_id': str(ObjectId()), 'data_capture': ['temperature'],
+                    'current_value': '34.5°C', 'updated_at': datetime(2025, 12, 1, 10, 7), 'extra_field': {'nested_key': 1}}]
+
+        self.assertEqual(sensors_codec.encode(sensors), util.snake_to_camel_key(util.objectid_to_str(sensors)))
+
+    def test_unknown_fields_fall_back_to_conversion(self):
+        codec = Codec()
+
+        self.assertEqual(codec.decode({'someNewField': 1}), {'some_new_field': 1})
+        self.assertEqual(codec.encode({'some_new_field': 1}), {'someNewField': 1})
+
+    def test_invalid_object_id_and_datetime_are_kept(self):
+        self.assertEqual(hives_codec.decode({'_id': 'not-an-id'}), {'_id': 'not-an-id'})
+        self.assertEqual(metrics_codec.decode({'datetime': 'yesterday'}), {'datetime': 'yesterday'})
+
+    def test_projection(self):
+        self.assertEqual(sensors_codec.projection('id, name,beehiveId,dataCapture'),
+                         {'_id': 1, 'name': 1, 'beehive_id': 1, 'data_capture': 1})
+        self.assertIsNone(sensors_codec.projection(''))
+        with self.assertRaises(ValueError):
+            sensors_codec.projection('name,$where')
+
+
+if __name__ == '__main__':
+    unittest.main()
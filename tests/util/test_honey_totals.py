@@ -0,0 +1,110 @@
+import unittest
+from types import SimpleNamespace
+
+from bson import ObjectId
+
+from apiculture_api.util.honey_totals import HoneyTotals, HONEY_DATA_TYPE
+from apiculture_api.util.metadata_cache import metadata_cache
+
+
+class FakeDataTypes:
+    name = 'data_types'
+
+    def __init__(self, docs):
+        self.docs = {doc['_id']: doc for doc in docs}
+
+    def find_one(self, filter):
+        return self.docs.get(filter['_id'])
+
+
+class FakeHives:
+    """In-memory stand-in for the hives collection that records bulk_write()s and reports them all as modified."""
+
+    name = 'hives'
+
+    def __init__(self):
+        self.bulk_writes = []
+
+    def bulk_write(self, requests, ordered=True):
+        self.bulk_writes.append(requests)
+        return SimpleNamespace(modified_count=len(requests))
+
+
+class SnapshotHoneyTotals(HoneyTotals):
+    """HoneyTotals reconciling against a fixed snapshot instead of the aggregation."""
+
+    def __init__(self, hives, totals):
+        super().__init__(hives, None, None)
+        self.totals = totals
+
+    def snapshot(self):
+        return self.totals
+
+
+class TestHoneyTotals(unittest.TestCase):
+    def setUp(self):
+        metadata_cache.clear()
+        self.honey_id = str(ObjectId())
+        self.temperature_id = str(ObjectId())
+        self.hive_id = str(ObjectId())
+        self.other_hive_id = str(ObjectId())
+        self.hives = FakeHives()
+        self.totals = HoneyTotals(self.hives, FakeDataTypes([
+            {'_id': ObjectId(self.honey_id), 'data_type': HONEY_DATA_TYPE},
+            {'_id': ObjectId(self.temperature_id), 'data_type': 'temperature'}
+        ]), None)
+
+    def _updates(self, requests):
+        return {request._filter['_id']: request._doc for request in requests}
+
+    def test_record_increments_per_hive(self):
+        self.totals.record([
+            {'data_type_id': self.honey_id, 'beehive_id': self.hive_id, 'value': 1.5},
+            {'data_type_id': self.honey_id, 'beehive_id': self.hive_id, 'value': 2},
+            {'data_type_id': self.honey_id, 'beehive_id': self.other_hive_id, 'value': 4},
+            {'data_type_id': self.temperature_id, 'beehive_id': self.hive_id, 'value': 35},
+            {'data_type_id': self.honey_id, 'beehive_id': self.hive_id, 'value': 'plenty'},
+            {'data_type_id': self.honey_id, 'beehive_id': self.hive_id, 'value': True},
+            {'data_type_id': self.honey_id, 'beehive_id': None, 'value': 3}
+        ])
+
+        self.assertEqual(len(self.hives.bulk_writes), 1)
+        self.assertEqual(self._updates(self.hives.bulk_writes[0]), {
+            ObjectId(self.hive_id): {'$inc': {'honey_production': 3.5}},
+            ObjectId(self.other_hive_id): {'$inc': {'honey_production': 4}}
+        })
+
+    def test_record_without_honey_writes_nothing(self):
+        self.totals.record([{'data_type_id': self.temperature_id, 'beehive_id': self.hive_id, 'value': 35}])
+
+        self.assertEqual(self.hives.bulk_writes, [])
+
+    def test_reconcile_moves_drifted_counters_by_difference(self):
+        in_sync_id = str(ObjectId())
+        totals = SnapshotHoneyTotals(self.hives, {
+            self.hive_id: (10, 7),
+            self.other_hive_id: (4, None),
+            in_sync_id: (5, 5)
+        })
+
+        self.assertEqual(totals.reconcile(), 2)
+
+        self.assertEqual(self._updates(self.hives.bulk_writes[0]), {
+            ObjectId(self.hive_id): {'$inc': {'honey_production': 3}},
+            ObjectId(self.other_hive_id): {'$inc': {'honey_production': 4}}
+        })
+        self.assertEqual(totals.stats(), {'reconciles': 1, 'corrected': 2})
+
+    def test_reconcile_replaces_non_numeric_counter(self):
+        totals = SnapshotHoneyTotals(self.hives, {self.hive_id: (10, 'plenty')})
+
+        with self.assertLogs('honey_totals', 'WARNING'):
+            totals.reconcile()
+
+        request = self.hives.bulk_writes[0][0]
+        self.assertEqual(request._filter, {'_id': ObjectId(self.hive_id), 'honey_production': 'plenty'})
+        self.assertEqual(request._doc, {'$set': {'honey_production': 10}})
+
+
+if __name__ == '__main__':
+    unittest.main()
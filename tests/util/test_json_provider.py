@@ -0,0 +1,106 @@
+import json
+import unittest
+from datetime import datetime, timezone
+from decimal import Decimal
+from unittest import mock
+
+from bson import ObjectId
+from bson.decimal128 import Decimal128
+from flask import Flask
+
+from apiculture_api.util import json_provider
+from apiculture_api.util.codec import sensors_codec
+from apiculture_api.util.json_provider import BsonJSONProvider, JsonDocuments, stream_documents
+
+
+class FakeCursor:
+    """Cursor stand-in iterating over a list of documents; failing_at raises after that many documents."""
+
+    def __init__(self, docs, failing_at=None):
+        self.docs = docs
+        self.failing_at = failing_at
+        self.closed = False
+        self.collection = mock.Mock()
+        self.collection.name = 'sensors'
+
+    def batch_size(self, size):
+        return self
+
+    def __iter__(self):
+        for index, doc in enumerate(self.docs):
+            if index == self.failing_at:
+                raise RuntimeError('cursor killed')
+            yield doc
+
+    def close(self):
+        self.closed = True
+
+
+class TestBsonJSONProvider(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.json = BsonJSONProvider(self.app)
+        self.sensor_id = ObjectId()
+        self.payload = {
+            'data': JsonDocuments([{'_id': self.sensor_id, 'name': 'Sensor Ä', 'beehive_id': ObjectId('693ad7c84739d5289a1e0833'),
+                                    'updated_at': datetime(2025, 12, 1, 10, 7, tzinfo=timezone.utc)}], sensors_codec),
+            'weight': Decimal128('12.50'),
+            'price': Decimal('3.10')
+        }
+        self.expected = {
+            'data': [{'id': str(self.sensor_id), 'name': 'Sensor Ä', 'beehiveId': '693ad7c84739d5289a1e0833',
+                      'updatedAt': 'Mon, 01 Dec 2025 10:07:00 GMT'}],
+            'price': '3.10',
+            'weight': '12.50'
+        }
+
+    def test_serializes_bson_types(self):
+        self.assertEqual(json.loads(self.app.json.dumps(self.payload)), self.expected)
+
+    def test_matches_without_orjson(self):
+        with mock.patch.object(json_provider, 'orjson', None):
+            fallback = self.app.json.dumps(self.payload)
+
+        self.assertEqual(json.loads(fallback), self.expected)
+        self.assertEqual(json.loads(self.app.json.dumps(self.payload)), json.loads(fallback))
+
+    def test_sorts_keys(self):
+        self.assertEqual(self.app.json.dumps({'b': 1, 'a': ObjectId('693ad7c84739d5289a1e0833')}),
+                         '{"a":"693ad7c84739d5289a1e0833","b":1}')
+
+    def test_big_integers_fall_back(self):
+        self.assertEqual(json.loads(self.app.json.dumps({'value': 2 ** 70})), {'value': 2 ** 70})
+
+    def test_jsonify(self):
+        with self.app.app_context():
+            response = self.app.json.response(self.payload)
+
+        self.assertEqual(response.mimetype, 'application/json')
+        self.assertEqual(json.loads(response.get_data()), self.expected)
+
+    def test_stream_documents(self):
+        docs = [{'_id': ObjectId(), 'name': f'Sensor {i}', 'beehive_id': 'h1'} for i in range(5)]
+        cursor = FakeCursor(docs)
+
+        with self.app.app_context():
+            body = ''.join(stream_documents(cursor, sensors_codec, enrich=lambda batch: [doc.update(status='online') for doc in batch],
+                                            batch_size=2).response)
+
+        self.assertEqual(json.loads(body), {'data': [
+            {'id': str(doc['_id']), 'name': doc['name'], 'beehiveId': 'h1', 'status': 'online'} for doc in docs
+        ]})
+        self.assertTrue(cursor.closed)
+
+    def test_stream_failure_leaves_invalid_json(self):
+        cursor = FakeCursor([{'_id': ObjectId(), 'name': f'Sensor {i}'} for i in range(5)], failing_at=3)
+
+        with self.app.app_context(), self.assertLogs('json_provider', 'ERROR'):
+            body = ''.join(stream_documents(cursor, sensors_codec, batch_size=2).response)
+
+        with self.assertRaises(ValueError):
+            json.loads(body)
+        self.assertTrue(cursor.closed)
+
+
+if __name__ == '__main__':
+    unittest.main()
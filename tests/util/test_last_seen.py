@@ -0,0 +1,112 @@
+import unittest
+from datetime import datetime, timedelta, timezone
+
+from bson import ObjectId
+
+from apiculture_api.util.last_seen import LastSeenTracker
+from apiculture_api.util.metadata_cache import metadata_cache
+
+
+class FakeCollection:
+    """In-memory stand-in for the data_types collection: find() on equality/$in filters, recorded bulk_write()s."""
+
+    def __init__(self, docs=()):
+        self.docs = list(docs)
+        self.finds = []
+        self.bulk_writes = []
+
+    def find(self, filter=None, projection=None):
+        self.finds.append(filter)
+        return [doc for doc in self.docs if all(
+            doc.get(key) in value['$in'] if isinstance(value, dict) else doc.get(key) == value
+            for key, value in (filter or {}).items()
+        )]
+
+    def bulk_write(self, requests, ordered=True):
+        self.bulk_writes.append(requests)
+
+
+class TestLastSeenTracker(unittest.TestCase):
+    def setUp(self):
+        self.temperature_id = ObjectId()
+        self.humidity_id = ObjectId()
+        self.collection = FakeCollection([
+            {'_id': self.temperature_id, 'sensor_id': 's1', 'data_type': 'temperature', 'updated_at': datetime(2025, 12, 1, 10, 0)},
+            {'_id': self.humidity_id, 'sensor_id': 's1', 'data_type': 'humidity', 'updated_at': datetime(2025, 12, 1, 9, 0)}
+        ])
+        self.tracker = LastSeenTracker(self.collection)
+        self.tracker.load()
+
+    def test_touch_at_reading_time(self):
+        replayed = datetime(2025, 12, 1, 11, 0, 30)
+
+        self.tracker.touch(str(self.temperature_id), at=replayed)
+
+        self.assertEqual(self.tracker.latest_for_sensor('s1')['updated_at'], replayed.replace(tzinfo=timezone.utc))
+
+    def test_touch_never_moves_back(self):
+        self.tracker.touch(str(self.temperature_id))
+        seen = self.tracker.latest_for_sensor('s1')['updated_at']
+
+        self.tracker.touch(str(self.temperature_id), at=datetime(2025, 12, 1, 10, 0, 30, tzinfo=timezone.utc))
+
+        self.assertEqual(self.tracker.latest_for_sensor('s1')['updated_at'], seen)
+
+    def test_touch_in_future_is_now(self):
+        self.tracker.touch(str(self.temperature_id), at=datetime.now(timezone.utc) + timedelta(days=1))
+
+        self.assertLessEqual(self.tracker.latest_for_sensor('s1')['updated_at'], datetime.now(timezone.utc))
+
+    def test_flush_coalesces_touches(self):
+        for minute in range(5):
+            self.tracker.touch(str(self.temperature_id), at=datetime(2025, 12, 1, 11, minute, tzinfo=timezone.utc))
+        self.tracker.touch(str(self.humidity_id), at=datetime(2025, 12, 1, 11, 0, tzinfo=timezone.utc))
+
+        self.tracker.flush()
+        self.tracker.flush()
+
+        self.assertEqual(len(self.collection.bulk_writes), 1)
+        updates = {request._filter['_id']: request._doc['$max']['updated_at'] for request in self.collection.bulk_writes[0]}
+        self.assertEqual(updates, {
+            self.temperature_id: datetime(2025, 12, 1, 11, 4, tzinfo=timezone.utc),
+            self.humidity_id: datetime(2025, 12, 1, 11, 0, tzinfo=timezone.utc)
+        })
+        self.assertEqual(self.tracker.stats()['pending'], 0)
+
+    def test_latest_for_sensor_is_most_recent_data_type(self):
+        self.assertEqual(self.tracker.latest_for_sensor('s1')['data_type'], 'temperature')
+
+        self.tracker.touch(str(self.humidity_id), at=datetime(2025, 12, 1, 11, 0, tzinfo=timezone.utc))
+
+        latest = self.tracker.latest_for_sensor('s1')
+        self.assertEqual(latest['data_type'], 'humidity')
+        self.assertEqual(latest['sensor_id'], 's1')
+        self.assertIsNone(self.tracker.latest_for_sensor('s2'))
+
+    def test_ensure_sensors_loads_missing_in_one_query(self):
+        self.collection.docs.extend([
+            {'_id': ObjectId(), 'sensor_id': 's3', 'data_type': 'weight', 'updated_at': datetime(2025, 12, 1, 8, 0)},
+            {'_id': ObjectId(), 'sensor_id': 's4', 'data_type': 'temperature', 'updated_at': datetime(2025, 12, 1, 7, 0)}
+        ])
+
+        self.tracker.ensure_sensors(['s1', 's3', 's4'])
+
+        self.assertEqual(self.collection.finds[1:], [{'sensor_id': {'$in': ['s3', 's4']}}])
+        self.assertEqual(self.tracker.latest_for_sensor('s3')['data_type'], 'weight')
+        self.assertEqual(self.tracker.latest_for_sensor('s4')['data_type'], 'temperature')
+
+        self.tracker.ensure_sensors(['s1', 's3', 's4'])
+        self.assertEqual(len(self.collection.finds), 2)
+
+    def test_sensor_without_data_types_queried_once_per_generation(self):
+        self.tracker.ensure_sensors(['s2'])
+        self.tracker.ensure_sensors(['s2'])
+        self.assertEqual(len(self.collection.finds), 2)  # load() and the one lookup of s2
+
+        metadata_cache.clear()
+        self.tracker.ensure_sensors(['s2'])
+        self.assertEqual(len(self.collection.finds), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+import unittest
+from datetime import datetime, timezone
+
+from bson import ObjectId
+from pymongo.errors import BulkWriteError
+
+from apiculture_api.util.latest_readings import LatestReadings, DUPLICATE_KEY_ERROR
+from apiculture_api.util.metadata_cache import metadata_cache
+
+
+class FakeDataTypes:
+    name = 'data_types'
+
+    def __init__(self, docs):
+        self.docs = {doc['_id']: doc for doc in docs}
+
+    def find_one(self, filter):
+        return self.docs.get(filter['_id'])
+
+
+class FakeLatestReadings:
+    """
+    In-memory stand-in for the latest_readings collection, applying the conditional upserts
+    the way MongoDB does: a filter that does not match an existing _id inserts it and hits a duplicate key.
+    """
+
+    name = 'latest_readings'
+
+    def __init__(self):
+        self.docs = {}
+
+    def create_index(self, keys):
+        pass
+
+    def bulk_write(self, requests, ordered=True):
+        errors = []
+        for index, request in enumerate(requests):
+            stored = self.docs.get(request._filter['_id'])
+            if stored is None:
+                self.docs[request._filter['_id']] = {'_id': request._filter['_id'], **request._doc['$set']}
+            elif stored['datetime'] < request._filter['datetime']['$lt']:
+                stored.update(request._doc['$set'])
+            else:
+                errors.append({'index': index, 'code': DUPLICATE_KEY_ERROR, 'errmsg': 'E11000 duplicate key error'})
+        if errors:
+            raise BulkWriteError({'writeErrors': errors})
+
+    def find(self, filter):
+        return [doc for doc in self.docs.values() if doc['sensor_id'] in filter['sensor_id']['$in']]
+
+
+class TestLatestReadings(unittest.TestCase):
+    def setUp(self):
+        metadata_cache.clear()
+        self.temperature_id = str(ObjectId())
+        self.humidity_id = str(ObjectId())
+        data_types = FakeDataTypes([
+            {'_id': ObjectId(self.temperature_id), 'sensor_id': 's1', 'data_type': 'temperature', 'unit': '°C'},
+            {'_id': ObjectId(self.humidity_id), 'sensor_id': 's1', 'data_type': 'humidity', 'unit': '%'}
+        ])
+        self.collection = FakeLatestReadings()
+        self.latest = LatestReadings(self.collection, data_types, None)
+
+    def _reading(self, data_type_id, minute, value):
+        return {'data_type_id': data_type_id, 'datetime': datetime(2025, 12, 1, 10, minute, tzinfo=timezone.utc), 'value': value}
+
+    def test_keeps_newest_reading_of_a_batch(self):
+        self.latest.record([
+            self._reading(self.temperature_id, 5, 34.5),
+            self._reading(self.temperature_id, 7, 35.0),
+            self._reading(self.temperature_id, 6, 34.8),
+            self._reading(self.humidity_id, 5, 60)
+        ])
+
+        readings = self.latest.for_sensors(['s1'])['s1']
+        self.assertEqual(readings['temperature']['value'], 35.0)
+        self.assertEqual(readings['temperature']['datetime'], datetime(2025, 12, 1, 10, 7))
+        self.assertEqual(readings['temperature']['unit'], '°C')
+        self.assertEqual(readings['humidity']['value'], 60)
+
+    def test_ignores_older_reading(self):
+        self.latest.record([self._reading(self.temperature_id, 7, 35.0)])
+
+        self.latest.record([self._reading(self.temperature_id, 2, 30.0)])
+
+        self.assertEqual(self.latest.for_sensors(['s1'])['s1']['temperature']['value'], 35.0)
+
+        self.latest.record([self._reading(self.temperature_id, 9, 36.0)])
+
+        self.assertEqual(self.latest.for_sensors(['s1'])['s1']['temperature']['value'], 36.0)
+
+    def test_skips_unknown_data_types(self):
+        self.latest.record([self._reading(str(ObjectId()), 7, 35.0)])
+
+        self.assertEqual(self.collection.docs, {})
+
+
+if __name__ == '__main__':
+    unittest.main()
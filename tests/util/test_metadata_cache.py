@@ -0,0 +1,97 @@
+import threading
+import time
+import unittest
+
+from bson import ObjectId
+
+from apiculture_api.util.metadata_cache import MetadataCache
+
+
+class FakeCollection:
+    """In-memory stand-in for a pymongo collection's find_one by _id, counting the lookups."""
+
+    def __init__(self, name, docs=()):
+        self.name = name
+        self.docs = {doc['_id']: doc for doc in docs}
+        self.lookups = 0
+
+    def find_one(self, filter):
+        self.lookups += 1
+        return self.docs.get(filter['_id'])
+
+
+class TestMetadataCache(unittest.TestCase):
+    def setUp(self):
+        self.hive_id = ObjectId()
+        self.hives = FakeCollection('hives', [{'_id': self.hive_id, 'name': 'Alpha Hive'}])
+        self.cache = MetadataCache(max_entries=2, ttl=60)
+
+    def test_read_through(self):
+        self.assertEqual(self.cache.get(self.hives, str(self.hive_id))['name'], 'Alpha Hive')
+        self.assertEqual(self.cache.get(self.hives, self.hive_id)['name'], 'Alpha Hive')
+
+        self.assertEqual(self.hives.lookups, 1)
+        self.assertEqual(self.cache.stats()['hits'], 1)
+
+    def test_missing_documents_are_cached(self):
+        self.assertIsNone(self.cache.get(self.hives, ObjectId()))
+        missing = ObjectId()
+        self.cache.get(self.hives, missing)
+        self.cache.get(self.hives, missing)
+
+        self.assertEqual(self.hives.lookups, 2)
+
+    def test_invalidate(self):
+        self.cache.get(self.hives, self.hive_id)
+        self.hives.docs[self.hive_id] = {'_id': self.hive_id, 'name': 'Renamed Hive'}
+
+        self.cache.invalidate(self.hives, str(self.hive_id))
+
+        self.assertEqual(self.cache.get(self.hives, self.hive_id)['name'], 'Renamed Hive')
+
+    def test_ttl_expiry(self):
+        cache = MetadataCache(max_entries=2, ttl=0.05)
+        cache.get(self.hives, self.hive_id)
+        time.sleep(0.06)
+        cache.get(self.hives, self.hive_id)
+
+        self.assertEqual(self.hives.lookups, 2)
+
+    def test_lru_eviction(self):
+        other_ids = [ObjectId(), ObjectId()]
+        self.cache.get(self.hives, self.hive_id)
+        self.cache.get(self.hives, other_ids[0])
+        self.cache.get(self.hives, self.hive_id)
+        self.cache.get(self.hives, other_ids[1])
+
+        self.cache.get(self.hives, self.hive_id)
+        self.assertEqual(self.hives.lookups, 3)
+        self.cache.get(self.hives, other_ids[0])
+        self.assertEqual(self.hives.lookups, 4)
+        self.assertEqual(self.cache.stats()['evictions'], 2)
+
+    def test_load_racing_invalidate_is_not_cached(self):
+        loading = threading.Event()
+        release = threading.Event()
+        hives = self.hives
+
+        class SlowCollection(FakeCollection):
+            def find_one(self, filter):
+                loading.set()
+                release.wait(2)
+                return hives.find_one(filter)
+
+        slow = SlowCollection('hives')
+        reader = threading.Thread(target=self.cache.get, args=(slow, self.hive_id))
+        reader.start()
+        loading.wait(1)
+        self.cache.invalidate(self.hives, self.hive_id)
+        release.set()
+        reader.join(2)
+
+        self.cache.get(self.hives, self.hive_id)
+        self.assertEqual(self.hives.lookups, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
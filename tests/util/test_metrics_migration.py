@@ -0,0 +1,96 @@
+import unittest
+from datetime import datetime
+
+from bson import ObjectId
+
+from apiculture_api.util.metrics_migration import MetricsMigration, CHECKPOINT_ID
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def sort(self, key, direction):
+        return FakeCursor(sorted(self.docs, key=lambda doc: doc[key], reverse=direction < 0))
+
+    def limit(self, count):
+        return FakeCursor(self.docs[:count])
+
+    def __iter__(self):
+        return iter(self.docs)
+
+
+class FakeCollection:
+    """In-memory stand-in for the few pymongo calls the migration makes, without a unique _id index."""
+
+    def __init__(self, docs=(), crash_on_insert=None):
+        self.docs = list(docs)
+        self.inserts = 0
+        self.crash_on_insert = crash_on_insert
+
+    def find(self, query):
+        last_id = query.get('_id', {}).get('$gt')
+        return FakeCursor([doc for doc in self.docs if last_id is None or doc['_id'] > last_id])
+
+    def find_one(self, query):
+        return next((doc for doc in self.docs if doc['_id'] == query['_id']), None)
+
+    def insert_many(self, docs, ordered=True):
+        self.inserts += 1
+        self.docs.extend(dict(doc) for doc in docs)
+        if self.inserts == self.crash_on_insert:
+            raise ConnectionError('connection lost after the write')
+
+    def delete_many(self, query):
+        first, last = query['_id']['$gte'], query['_id']['$lte']
+        kept = [doc for doc in self.docs if not first <= doc['_id'] <= last]
+        deleted, self.docs = len(self.docs) - len(kept), kept
+
+        class Result:
+            deleted_count = deleted
+        return Result()
+
+    def update_one(self, query, update, upsert=False):
+        doc = self.find_one(query)
+        if doc is None:
+            doc = {'_id': query['_id']}
+            self.docs.append(doc)
+        doc.update(update.get('$set', {}))
+        for key in update.get('$unset', {}):
+            doc.pop(key, None)
+
+
+class TestMetricsMigration(unittest.TestCase):
+    def setUp(self):
+        self.readings = [{'data_type_id': 'dt1', 'datetime': datetime(2025, 12, 1, 0, minute), 'value': minute} for minute in range(5)]
+        self.readings.insert(2, {'data_type_id': 'dt1', 'datetime': 'yesterday', 'value': 0})
+        for reading in self.readings:
+            reading['_id'] = ObjectId()
+        self.source = FakeCollection(self.readings)
+        self.checkpoints = FakeCollection()
+
+    def test_copies_readings_with_a_datetime(self):
+        target = FakeCollection()
+
+        copied, skipped = MetricsMigration(self.source, target, self.checkpoints, batch_size=2).run()
+
+        self.assertEqual((copied, skipped), (5, 1))
+        self.assertEqual([doc['value'] for doc in target.docs], [0, 1, 2, 3, 4])
+        checkpoint = self.checkpoints.find_one({'_id': CHECKPOINT_ID})
+        self.assertEqual(checkpoint['last_id'], self.readings[-1]['_id'])
+        self.assertNotIn('pending', checkpoint)
+
+    def test_resume_after_crash_inside_a_batch(self):
+        target = FakeCollection(crash_on_insert=2)
+        with self.assertRaises(ConnectionError):
+            MetricsMigration(self.source, target, self.checkpoints, batch_size=2).run()
+        self.assertEqual(len(target.docs), 3)
+
+        target.crash_on_insert = None
+        MetricsMigration(self.source, target, self.checkpoints, batch_size=2).run()
+
+        self.assertEqual(sorted(doc['value'] for doc in target.docs), [0, 1, 2, 3, 4])
+
+
+if __name__ == '__main__':
+    unittest.main()
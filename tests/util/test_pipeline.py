@@ -0,0 +1,57 @@
+import queue
+import threading
+import unittest
+
+from apiculture_api.util.pipeline import StagedPipeline
+
+
+class TestStagedPipeline(unittest.TestCase):
+    def test_items_pass_every_stage(self):
+        results = []
+        pipeline = StagedPipeline([
+            ('double', lambda item: item * 2, 2),
+            ('increment', lambda item: item + 1, 2),
+            ('collect', results.append, 1)
+        ], 10)
+
+        for item in range(20):
+            pipeline.submit(item)
+        pipeline.shutdown(wait=True)
+
+        self.assertEqual(sorted(results), [item * 2 + 1 for item in range(20)])
+        self.assertEqual(pipeline.stats()['collect']['processed'], 20)
+
+    def test_none_and_errors_stop_an_item(self):
+        results = []
+
+        def check(item):
+            if item == 'fail':
+                raise ValueError('invalid item')
+            return None if item == 'skip' else item
+
+        pipeline = StagedPipeline([('check', check, 1), ('collect', results.append, 1)], 10)
+        for item in ('ok', 'skip', 'fail'):
+            pipeline.submit(item)
+        pipeline.shutdown(wait=True)
+
+        self.assertEqual(results, ['ok'])
+        stats = pipeline.stats()['check']
+        self.assertEqual(stats['errors'], 1)
+        self.assertEqual(stats['dropped'], 2)
+
+    def test_backpressure(self):
+        release = threading.Event()
+        pipeline = StagedPipeline([('block', lambda item: release.wait(2), 1)], 1)
+        try:
+            pipeline.submit(1)  # taken by the worker, which blocks
+            pipeline.submit(2, timeout=1)  # fills the queue
+
+            with self.assertRaises(queue.Full):
+                pipeline.submit(3, timeout=0.05)
+        finally:
+            release.set()
+            pipeline.shutdown(wait=True)
+
+
+if __name__ == '__main__':
+    unittest.main()
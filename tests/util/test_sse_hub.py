@@ -0,0 +1,154 @@
+import threading
+import unittest
+
+from apiculture_api.util.sse_hub import BroadcastHub, Subscriber, parse_filters
+
+
+class BlockingSubscriber(Subscriber):
+    """Subscriber whose first put() blocks until released, like a fan-out to many connections."""
+
+    def __init__(self):
+        super().__init__(16, 16)
+        self.entered = threading.Event()
+        self.release = threading.Event()
+
+    def put(self, event):
+        if not self.entered.is_set():
+            self.entered.set()
+            self.release.wait(2)
+        super().put(event)
+
+
+class TestBroadcastHub(unittest.TestCase):
+    def setUp(self):
+        self.hub = BroadcastHub(16, 100, 16)
+
+    def _titles(self, subscriber):
+        return [event.data['title'] for event in subscriber.get(timeout=0)]
+
+    def test_event_ids_increase_and_frame_once(self):
+        first = self.hub.publish({'title': 'first'})
+        second = self.hub.publish({'count': 2}, name='alertsUpdated')
+
+        self.assertGreater(second, first)
+        event = self.hub._history[-1]
+        self.assertEqual(event.frame, f'event: alertsUpdated\nid: {second}\ndata: {{"count": 2}}\n\n')
+
+    def test_replay_after_last_event_id(self):
+        ids = [self.hub.publish({'title': title}) for title in ('first', 'second', 'third')]
+
+        subscriber = self.hub.subscribe(last_event_id=ids[0])
+        self.hub.publish({'title': 'fourth'})
+
+        self.assertEqual(self._titles(subscriber), ['second', 'third', 'fourth'])
+        self.assertEqual(self._titles(self.hub.subscribe(last_event_id=ids[-1] + 1)), [])
+
+    def test_replay_without_last_event_id(self):
+        self.hub.publish({'title': 'first'})
+
+        self.assertEqual(self._titles(self.hub.subscribe()), [])
+
+    def test_replay_is_bounded_by_history(self):
+        hub = BroadcastHub(16, 3, 16)
+        first = hub.publish({'title': 0})
+        for title in range(1, 6):
+            hub.publish({'title': title})
+
+        self.assertEqual([event.data['title'] for event in hub.subscribe(last_event_id=first).get(timeout=0)], [3, 4, 5])
+
+    def test_slow_subscriber_drops_oldest_then_disconnects(self):
+        hub = BroadcastHub(2, 100, 2)
+        subscriber = hub.subscribe()
+        for title in range(4):
+            hub.publish({'title': title})
+
+        self.assertFalse(subscriber.closed)
+        self.assertEqual([event.data['title'] for event in subscriber.get(timeout=0)], [2, 3])
+
+        for title in range(4, 9):
+            hub.publish({'title': title})
+
+        self.assertTrue(subscriber.closed)
+        self.assertEqual(subscriber.get(timeout=0), [])
+        self.assertEqual(hub.stats()['slow_subscribers'], 1)
+        self.assertEqual(hub.stats()['dropped'], 5)
+
+    def test_unsubscribe_stops_delivery(self):
+        subscriber = self.hub.subscribe()
+        self.hub.unsubscribe(subscriber)
+        self.hub.publish({'title': 'first'})
+
+        self.assertEqual(subscriber.pending(), 0)
+        self.assertEqual(self.hub.stats()['subscribers'], 0)
+
+    def test_parse_filters(self):
+        self.assertEqual(parse_filters({'farmId': 'a, b', 'severity': 'critical', 'beehiveId': '', 'other': 'x'}), {
+            'farmId': frozenset({'a', 'b'}),
+            'severity': frozenset({'critical'})
+        })
+
+    def test_filters_route_through_index(self):
+        everything = self.hub.subscribe()
+        farm = self.hub.subscribe(filters={'farmId': {'f1'}})
+        critical_in_farm = self.hub.subscribe(filters={'farmId': {'f1', 'f2'}, 'severity': {'critical'}})
+        other_farm = self.hub.subscribe(filters={'farmId': {'f3'}})
+
+        self.hub.publish({'title': 'info f1', 'farmId': 'f1', 'severity': 'info'})
+        self.hub.publish({'title': 'critical f2', 'farmId': 'f2', 'severity': 'critical'})
+        self.hub.publish({'title': 'critical without farm', 'severity': 'critical'})
+
+        self.assertEqual(self._titles(everything), ['info f1', 'critical f2', 'critical without farm'])
+        self.assertEqual(self._titles(farm), ['info f1'])
+        self.assertEqual(self._titles(critical_in_farm), ['critical f2'])
+        self.assertEqual(self._titles(other_farm), [])
+        self.assertEqual(self.hub.stats()['filtered_subscribers'], 3)
+
+    def test_unsubscribe_removes_from_index(self):
+        farm = self.hub.subscribe(filters={'farmId': {'f1'}})
+        self.hub.unsubscribe(farm)
+
+        self.assertEqual(self.hub._index['farmId'], {})
+
+    def test_scoped_event_ignores_other_dimensions(self):
+        critical_in_farm = self.hub.subscribe(filters={'farmId': {'f1'}, 'severity': {'critical'}})
+        other_farm = self.hub.subscribe(filters={'farmId': {'f2'}})
+        hive = self.hub.subscribe(filters={'beehiveId': {'h1'}})
+
+        self.hub.publish({'title': 'alerts updated', 'farmId': 'f1'}, name='alertsUpdated', scope=('farmId', 'beehiveId'))
+
+        self.assertEqual(self._titles(critical_in_farm), ['alerts updated'])
+        self.assertEqual(self._titles(other_farm), [])
+        self.assertEqual(self._titles(hive), ['alerts updated'])
+
+    def test_replay_applies_filters(self):
+        first = self.hub.publish({'title': 'first', 'farmId': 'f1'})
+        self.hub.publish({'title': 'f2', 'farmId': 'f2'})
+        self.hub.publish({'title': 'f1', 'farmId': 'f1'})
+
+        subscriber = self.hub.subscribe(last_event_id=first, filters={'farmId': {'f1'}})
+
+        self.assertEqual(self._titles(subscriber), ['f1'])
+
+    def test_delivery_outside_hub_lock(self):
+        blocking = self.hub.subscribe(subscriber=BlockingSubscriber())
+        other = self.hub.subscribe()
+        publisher = threading.Thread(target=self.hub.publish, args=({'title': 'first'},))
+        publisher.start()
+        try:
+            self.assertTrue(blocking.entered.wait(1))
+
+            # Neither (un)subscribe nor another publisher waits for the blocked fan-out
+            others = threading.Thread(target=lambda: (self.hub.unsubscribe(self.hub.subscribe()), self.hub.publish({'title': 'second'})))
+            others.start()
+            others.join(1)
+            self.assertFalse(others.is_alive())
+        finally:
+            blocking.release.set()
+            publisher.join(2)
+
+        self.assertEqual([event.data['title'] for event in other.get(timeout=0)], ['first', 'second'])
+        self.assertEqual([event.data['title'] for event in blocking.get(timeout=0)], ['first', 'second'])
+
+
+if __name__ == '__main__':
+    unittest.main()
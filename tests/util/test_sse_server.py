@@ -0,0 +1,109 @@
+import asyncio
+import socket
+import time
+import unittest
+
+from apiculture_api.util.sse_hub import BroadcastHub
+from apiculture_api.util.sse_server import SseServer
+
+
+class StuckSseServer(SseServer):
+    """Server whose connections ignore cancellation, like a handler stuck in a blocking call."""
+
+    async def _serve(self, reader, writer):
+        while True:
+            try:
+                await asyncio.sleep(60)
+            except asyncio.CancelledError:
+                pass
+
+
+class TestSseServer(unittest.TestCase):
+    def _connect(self, server, path):
+        port = server._server.sockets[0].getsockname()[1]
+        connection = socket.create_connection(('127.0.0.1', port), timeout=2)
+        connection.sendall(f'GET {path} HTTP/1.1\r\n\r\n'.encode())
+        return connection
+
+    def _read_until(self, connection, marker):
+        received = b''
+        while marker not in received:
+            chunk = connection.recv(4096)
+            if not chunk:
+                break
+            received += chunk
+        return received.decode()
+
+    def _wait_for_subscribers(self, hub, count):
+        deadline = time.monotonic() + 2
+        while hub.stats()['subscribers'] < count and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def test_streams_events_and_heartbeats(self):
+        hub = BroadcastHub(16, 100, 16)
+        server = SseServer(hub, '127.0.0.1', 0, 0.1)
+        server.start()
+        try:
+            connection = self._connect(server, '/sse/alerts?severity=critical')
+            self._wait_for_subscribers(hub, 1)
+            hub.publish({'title': 'info', 'severity': 'info'})
+            event_id = hub.publish({'title': 'critical', 'severity': 'critical'})
+
+            received = self._read_until(connection, b': heartbeat\n\n')
+
+            self.assertTrue(received.startswith('HTTP/1.1 200 OK\r\n'))
+            self.assertIn('Content-Type: text/event-stream', received)
+            self.assertIn(f'id: {event_id}\ndata: {{"title": "critical", "severity": "critical"}}\n\n', received)
+            self.assertNotIn('"info"', received)
+            connection.close()
+        finally:
+            server.stop(timeout=2)
+        self.assertEqual(hub.stats()['subscribers'], 0)
+
+    def test_replays_after_last_event_id_header(self):
+        hub = BroadcastHub(16, 100, 16)
+        first = hub.publish({'title': 'first'})
+        hub.publish({'title': 'second'})
+        server = SseServer(hub, '127.0.0.1', 0, 5)
+        server.start()
+        try:
+            port = server._server.sockets[0].getsockname()[1]
+            connection = socket.create_connection(('127.0.0.1', port), timeout=2)
+            connection.sendall(f'GET /sse/alerts HTTP/1.1\r\nLast-Event-ID: {first}\r\n\r\n'.encode())
+
+            received = self._read_until(connection, b'"second"')
+
+            self.assertNotIn('"first"', received)
+            self.assertIn('"second"', received)
+            connection.close()
+        finally:
+            server.stop(timeout=2)
+
+    def test_unknown_path_is_not_found(self):
+        server = SseServer(BroadcastHub(16, 100, 16), '127.0.0.1', 0, 5)
+        server.start()
+        try:
+            connection = self._connect(server, '/sse/other')
+
+            self.assertTrue(self._read_until(connection, b'\r\n\r\n').startswith('HTTP/1.1 404 Not Found'))
+            connection.close()
+        finally:
+            server.stop(timeout=2)
+
+    def test_stop_with_stuck_connection(self):
+        server = StuckSseServer(BroadcastHub(16, 100, 16), '127.0.0.1', 0, 5)
+        server.start()
+        connection = self._connect(server, '/sse/alerts')
+        try:
+            time.sleep(0.1)
+            started = time.monotonic()
+
+            server.stop(timeout=0.5)
+
+            self.assertLess(time.monotonic() - started, 2)
+        finally:
+            connection.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
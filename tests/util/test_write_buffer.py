@@ -0,0 +1,228 @@
+import queue
+import threading
+import time
+import unittest
+
+from bson import ObjectId
+from pymongo.errors import AutoReconnect, BulkWriteError
+
+from apiculture_api.util.write_buffer import GroupCommitBuffer, RetryBuffer, DUPLICATE_KEY_ERROR
+
+
+class FakeCollection:
+    """In-memory stand-in for insert_many: documents whose value is in fail or duplicate get that write error."""
+
+    def __init__(self, fail=(), duplicate=()):
+        self.docs = []
+        self.batches = []
+        self.fail = fail
+        self.duplicate = duplicate
+
+    def insert_many(self, docs, ordered=True):
+        self.batches.append(len(docs))
+        errors = []
+        for index, doc in enumerate(docs):
+            if doc.get('value') in self.fail:
+                errors.append({'index': index, 'code': 121, 'errmsg': 'Document failed validation'})
+            elif doc.get('value') in self.duplicate:
+                errors.append({'index': index, 'code': DUPLICATE_KEY_ERROR, 'errmsg': 'E11000 duplicate key error'})
+            else:
+                self.docs.append(doc)
+        if errors:
+            raise BulkWriteError({'writeErrors': errors})
+
+
+class TestGroupCommitBuffer(unittest.TestCase):
+    def test_flush_at_max_batch(self):
+        collection = FakeCollection()
+        buffer = GroupCommitBuffer(collection, 100, 4, 60000)
+        try:
+            tickets = [buffer.submit([{'value': i}, {'value': i}]) for i in range(2)]
+
+            for ticket in tickets:
+                self.assertEqual(len(ticket.wait(timeout=2)), 2)
+            self.assertEqual(collection.batches, [4])
+        finally:
+            buffer.close()
+
+    def test_flush_at_deadline(self):
+        collection = FakeCollection()
+        buffer = GroupCommitBuffer(collection, 100, 100, 50)
+        try:
+            started = time.monotonic()
+            ticket = buffer.submit([{'value': 1}])
+
+            ticket.wait(timeout=2)
+            self.assertGreaterEqual(time.monotonic() - started, 0.04)
+            self.assertEqual(collection.batches, [1])
+        finally:
+            buffer.close()
+
+    def test_close_flushes_pending(self):
+        collection = FakeCollection()
+        buffer = GroupCommitBuffer(collection, 100, 100, 60000)
+        ticket = buffer.submit([{'value': 1}, {'value': 2}])
+
+        buffer.close(wait=True)
+
+        self.assertEqual(ticket.wait(timeout=0), ticket.inserted_ids)
+        self.assertEqual(len(collection.docs), 2)
+        with self.assertRaises(RuntimeError):
+            buffer.submit([{'value': 3}])
+
+    def test_partial_bulk_write_error(self):
+        collection = FakeCollection(fail={'bad'}, duplicate={'retried'})
+        flushed = []
+        failed = []
+        buffer = GroupCommitBuffer(collection, 100, 100, 60000, on_flush=flushed.extend, on_error=failed.extend)
+        ok = buffer.submit([{'value': 1}, {'value': 'retried'}])
+        bad = buffer.submit([{'value': 2}, {'value': 'bad'}])
+        buffer.close()
+
+        self.assertEqual(len(ok.wait(timeout=0)), 2)
+        with self.assertRaises(RuntimeError):
+            bad.wait(timeout=0)
+        self.assertEqual([doc['value'] for doc in flushed], [1, 2])
+        self.assertEqual([doc['value'] for doc in failed], ['bad'])
+
+    def test_duplicates_fail_without_unique_ids(self):
+        collection = FakeCollection(duplicate={'retried'})
+        buffer = GroupCommitBuffer(collection, 100, 100, 60000, unique_ids=False)
+        ticket = buffer.submit([{'value': 'retried'}])
+        buffer.close()
+
+        with self.assertRaises(RuntimeError):
+            ticket.wait(timeout=0)
+
+    def test_ack_before_flush_callback(self):
+        release = threading.Event()
+        collection = FakeCollection()
+        buffer = GroupCommitBuffer(collection, 100, 1, 60000, on_flush=lambda docs: release.wait(2))
+        try:
+            ticket = buffer.submit([{'value': 1}])
+
+            self.assertEqual(len(ticket.wait(timeout=1)), 1)
+        finally:
+            release.set()
+            buffer.close()
+
+
+class StubBuffer:
+    """GroupCommitBuffer stand-in whose submit() raises the given error, or records the documents."""
+
+    def __init__(self, error=None):
+        self.name = 'stub'
+        self.unique_ids = True
+        self.error = error
+        self.submitted = []
+
+    def submit(self, docs, timeout=None):
+        if self.error is not None:
+            raise self.error
+        self.submitted.extend(docs)
+
+
+class OutageCollection:
+    """insert_many() that, while down, writes the first document and then loses the connection; _ids are unique."""
+
+    def __init__(self):
+        self.docs = {}
+        self.down = True
+
+    def insert_many(self, docs, ordered=True):
+        errors = []
+        for index, doc in enumerate(docs):
+            if self.down and self.docs:
+                raise AutoReconnect('connection reset')
+            if doc['_id'] in self.docs:
+                errors.append({'index': index, 'code': DUPLICATE_KEY_ERROR, 'errmsg': 'E11000 duplicate key error'})
+            else:
+                self.docs[doc['_id']] = doc
+        if errors:
+            raise BulkWriteError({'writeErrors': errors})
+
+
+class TestRetryBuffer(unittest.TestCase):
+    def test_failed_batch_is_retried_once_written(self):
+        collection = OutageCollection()
+        writer = GroupCommitBuffer(collection, 100, 3, 60000, on_error=lambda docs: retries.add(docs))
+        retries = RetryBuffer(writer, 10)
+        try:
+            ticket = writer.submit([{'_id': ObjectId(), 'value': value} for value in range(3)])
+            with self.assertRaises(AutoReconnect):
+                ticket.wait(timeout=2)
+            # Tickets are resolved before on_error runs
+            deadline = time.monotonic() + 2
+            while retries.stats()['pending'] < 3 and time.monotonic() < deadline:
+                time.sleep(0.01)
+            self.assertEqual(retries.stats()['pending'], 3)
+            self.assertEqual(len(collection.docs), 1)
+
+            collection.down = False
+            retries.retry()
+            writer.close(wait=True)
+
+            self.assertEqual(sorted(doc['value'] for doc in collection.docs.values()), [0, 1, 2])
+            self.assertEqual(retries.stats()['pending'], 0)
+            self.assertEqual(retries.stats()['retried'], 3)
+        finally:
+            writer.close()
+
+    def test_retry_resubmits(self):
+        buffer = StubBuffer()
+        retries = RetryBuffer(buffer, 10)
+        retries.add([{'_id': 1}, {'_id': 2}])
+
+        retries.retry()
+
+        self.assertEqual(buffer.submitted, [{'_id': 1}, {'_id': 2}])
+        self.assertEqual(retries.stats()['pending'], 0)
+        self.assertEqual(retries.stats()['retried'], 2)
+
+    def test_retry_keeps_documents_when_full(self):
+        retries = RetryBuffer(StubBuffer(queue.Full()), 10)
+        retries.add([{'_id': 1}, {'_id': 2}])
+
+        retries.retry()
+
+        self.assertEqual(retries.stats()['pending'], 2)
+        self.assertEqual(retries.stats()['retried'], 0)
+
+    def test_retry_keeps_documents_when_closed(self):
+        collection = FakeCollection()
+        writer = GroupCommitBuffer(collection, 10, 10, 10)
+        writer.close()
+        retries = RetryBuffer(writer, 10)
+        retries.add([{'_id': 1}, {'_id': 2}])
+
+        retries.retry()
+
+        self.assertEqual(retries.stats()['pending'], 2)
+        self.assertEqual(collection.docs, [])
+
+        retries.buffer = StubBuffer()
+        retries.retry()
+        self.assertEqual(retries.buffer.submitted, [{'_id': 1}, {'_id': 2}])
+
+    def test_add_drops_oldest_on_overflow(self):
+        buffer = StubBuffer()
+        retries = RetryBuffer(buffer, 3)
+        retries.add([{'_id': 1}, {'_id': 2}])
+        retries.add([{'_id': 3}, {'_id': 4}])
+
+        self.assertEqual(retries.stats()['pending'], 3)
+        self.assertEqual(retries.stats()['dropped'], 1)
+
+        retries.retry()
+        self.assertEqual(buffer.submitted, [{'_id': 2}, {'_id': 3}, {'_id': 4}])
+
+    def test_rejects_buffer_without_unique_ids(self):
+        buffer = StubBuffer()
+        buffer.unique_ids = False
+
+        with self.assertRaises(ValueError):
+            RetryBuffer(buffer, 10)
+
+
+if __name__ == '__main__':
+    unittest.main()